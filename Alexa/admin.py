@@ -1,25 +1,127 @@
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connection
+from django.http import HttpResponseRedirect
+from django.utils.functional import cached_property
 from .models import Product, KnowledgeBase, ChatSession, ChatMessage, ChatLog
-from django.db.models import Count
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from datetime import timedelta
+from urllib.parse import urlparse
 
-class ChatSessionAdmin(admin.ModelAdmin):
+
+# ---------------------------
+# Changelist helpers for the (large) chat tables
+# ---------------------------
+class EstimatedCountPaginator(Paginator):
+    """
+    Unfiltered changelists take the row count from the planner statistics
+    (pg_class.reltuples, summed over the partitions, which autovacuum keeps
+    current) instead of COUNT(*). Filtered, small or never-analyzed tables
+    are counted exactly.
+    """
+    exact_below = 10000
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if connection.vendor == 'postgresql' and query is not None and not query.where:
+            estimate = self.estimated_rows(self.object_list.model._meta.db_table)
+            if estimate >= self.exact_below:
+                return estimate
+        return super().count
+
+    @staticmethod
+    def estimated_rows(table: str) -> int:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT coalesce(sum(c.reltuples) FILTER (WHERE c.reltuples > 0), 0)::bigint, "
+                "bool_or(c.reltuples >= 0) "
+                "FROM pg_class c WHERE c.relkind = 'r' AND (c.oid = to_regclass(%s) "
+                "OR c.oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = to_regclass(%s)))",
+                [f'"{table}"'] * 2,
+            )
+            estimate, analyzed = cursor.fetchone()
+        return int(estimate) if analyzed else -1
+
+
+class StepListFilter(admin.SimpleListFilter):
+    """Filter on a conversation step from the known STEPS, without a DISTINCT scan."""
+    title = 'step'
+    parameter_name = 'step'
+    field = 'current_step'
+    extra_steps = ()
+
+    def lookups(self, request, model_admin):
+        from .funnel import SAVED, funnel_steps
+
+        steps = [step for step in funnel_steps() if step != SAVED] + list(self.extra_steps)
+        return [(step, step.replace('_', ' ').capitalize()) for step in steps]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(**{self.field: self.value()})
+        return queryset
+
+
+class IntentListFilter(StepListFilter):
+    title = 'intent'
+    parameter_name = 'intent'
+    field = 'intent'
+
+
+class LogIntentListFilter(IntentListFilter):
+    extra_steps = ('save_configuration',)
+
+
+class ChatTableAdmin(admin.ModelAdmin):
+    """
+    Base for the chat tables: estimated page counts, no "N total" COUNT(*),
+    and date-hierarchy navigation that opens on the current month. The
+    hierarchy's own queries (min/max, distinct years) would otherwise scan
+    the whole table; within a month they only touch that month's partition.
+    Only entering the list from elsewhere redirects: "All dates" and "Clear
+    all filters" (links from the list itself) show every row, counted by
+    EstimatedCountPaginator.
+    """
+    date_hierarchy = 'created_at'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def changelist_view(self, request, extra_context=None):
+        came_from_list = urlparse(request.META.get('HTTP_REFERER', '')).path == request.path
+        if not request.GET and not came_from_list:
+            now = timezone.localtime()
+            return HttpResponseRedirect(
+                f"{request.path}?{self.date_hierarchy}__year={now.year}&{self.date_hierarchy}__month={now.month}"
+            )
+        return super().changelist_view(request, extra_context)
+
+
+class ChatSessionAdmin(ChatTableAdmin):
     list_display = ('session_id', 'user_name', 'current_step', 'created_at', 'messages_count')
-    list_filter = ('current_step', 'created_at')
+    list_filter = (StepListFilter,)
     search_fields = ('session_id', 'user_name')
     readonly_fields = ('session_id', 'created_at')
 
     def messages_count(self, obj):
-        return obj.messages.count()
+        return obj.messages_count
     messages_count.short_description = 'Messages Count'
+    messages_count.admin_order_field = 'messages_count'
 
     def get_queryset(self, request):
-        return super().get_queryset(request).annotate(messages_count=Count('messages'))
+        # Correlated subquery: counted per row on the page, not joined over every message
+        counts = (
+            ChatMessage.objects.filter(session=OuterRef('pk'))
+            .order_by().values('session').annotate(count=Count('id')).values('count')
+        )
+        return super().get_queryset(request).annotate(messages_count=Coalesce(Subquery(counts), 0))
 
-class ChatMessageAdmin(admin.ModelAdmin):
+class ChatMessageAdmin(ChatTableAdmin):
     list_display = ('session', 'sender', 'message', 'intent', 'created_at')
-    list_filter = ('sender', 'intent', 'created_at')
+    list_filter = ('sender', IntentListFilter)
+    list_select_related = ('session',)
     search_fields = ('message', 'intent')
     readonly_fields = ('created_at',)
 
@@ -52,9 +154,10 @@ class ChatMessageAdmin(admin.ModelAdmin):
         ]
         return super().changelist_view(request, extra_context)
 
-class ChatLogAdmin(admin.ModelAdmin):
+class ChatLogAdmin(ChatTableAdmin):
     list_display = ('session', 'intent', 'message', 'selected_panel', 'purpose', 'created_at')
-    list_filter = ('intent', 'selected_panel', 'purpose', 'created_at')
+    list_filter = (LogIntentListFilter,)
+    list_select_related = ('session',)
     search_fields = ('message', 'intent', 'purpose')
     readonly_fields = ('created_at',)
 
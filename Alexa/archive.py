@@ -0,0 +1,399 @@
+"""
+Retention and archival of the chat tables (ChatMessage, ChatLog).
+
+On Postgres the tables are partitioned by month (migration 0017). Archiving
+a month detaches its partition, streams the detached table through a
+server-side cursor into ``<table>_YYYY_MM.jsonl.gz``, and drops it. The
+live table is only locked for the detach, and dropping costs the same
+however many rows the month held.
+
+Elsewhere (SQLite, or Postgres before 0017) the same monthly files are
+written by streaming the month's rows in chunks, followed by one raw
+``DELETE``; no model instances are loaded and no cascade is collected.
+
+Rows that landed in the DEFAULT partition (no partition existed for their
+month, e.g. the cron missed a month) are moved into a new month partition
+before it is attached, so creating partitions keeps working and those
+months are archived like any other.
+
+``restore_archive()`` loads a file back (re-creating the month partition
+when needed) for investigations.
+
+Rollups, the funnel and the columnar snapshot are maintained incrementally,
+so they keep the counts of archived months. Rebuilding them from the live
+tables would lose those, so their ``--rebuild`` refuses while
+``archived_months()`` finds archive files (see ``refuse_rebuild``).
+"""
+import gzip
+import json
+import os
+import re
+from datetime import date, datetime, timezone as dt_timezone
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, models, transaction
+from django.utils.dateparse import parse_datetime
+
+from .models import ChatLog, ChatMessage, ChatSession
+
+ARCHIVED_MODELS = {model._meta.db_table: model for model in (ChatMessage, ChatLog)}
+
+PARTITION_RE = re.compile(r"^(?P<table>.+)_p(?P<year>\d{4})_(?P<month>\d{2})$")
+ARCHIVE_RE = re.compile(r"^(?P<table>.+)_(?P<year>\d{4})_(?P<month>\d{2})(?:\.\d+)?\.jsonl\.gz$")
+
+
+def next_month(day: date) -> date:
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+def month_bounds(month: date):
+    """[start, end) of a UTC month as aware datetimes."""
+    start = datetime(month.year, month.month, 1, tzinfo=dt_timezone.utc)
+    end = next_month(month)
+    return start, datetime(end.year, end.month, 1, tzinfo=dt_timezone.utc)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y_%m}"
+
+
+# ---------------------------
+# Postgres partitions
+# ---------------------------
+def is_partitioned(table: str) -> bool:
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)",
+            [f'"{table}"'],
+        )
+        return cursor.fetchone() is not None
+
+
+def monthly_partitions(table: str) -> dict:
+    """month -> partition name for the partitions attached to ``table``."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(%s)",
+            [f'"{table}"'],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    partitions = {}
+    for name in names:
+        match = PARTITION_RE.match(name)
+        if match and match.group('table') == table:
+            partitions[date(int(match.group('year')), int(match.group('month')), 1)] = name
+    return partitions
+
+
+def detached_partitions(table: str) -> dict:
+    """month -> name of partitions detached by an archive run that did not finish."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_class c WHERE c.relkind = 'r' AND c.relname LIKE %s "
+            "AND c.relnamespace = current_schema()::regnamespace "
+            "AND NOT EXISTS (SELECT 1 FROM pg_inherits i WHERE i.inhrelid = c.oid)",
+            [f"{table}\\_p%"],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    detached = {}
+    for name in names:
+        match = PARTITION_RE.match(name)
+        if match and match.group('table') == table:
+            detached[date(int(match.group('year')), int(match.group('month')), 1)] = name
+    return detached
+
+
+def default_partition(table: str):
+    """Name of the DEFAULT partition attached to ``table``, or None."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(%s) AND pg_get_expr(c.relpartbound, c.oid) = 'DEFAULT'",
+            [f'"{table}"'],
+        )
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def default_months(table: str, before: date) -> list:
+    """Months strictly before ``before`` with rows in the DEFAULT partition."""
+    name = default_partition(table)
+    if name is None:
+        return []
+    start, _ = month_bounds(before)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT DISTINCT date_trunc('month', created_at AT TIME ZONE 'UTC')::date FROM \"{name}\" "
+            "WHERE created_at < %s",
+            [start],
+        )
+        return sorted(row[0] for row in cursor.fetchall())
+
+
+def ensure_partition(table: str, month: date) -> bool:
+    """
+    Create the partition for ``month`` if missing; True if it was created.
+    Postgres refuses to add a partition while DEFAULT holds rows of its
+    range, so those rows are moved over: detach DEFAULT, create the
+    partition, move the rows, re-attach DEFAULT (one transaction).
+    """
+    if month in monthly_partitions(table):
+        return False
+    start, end = month_bounds(month)
+    name = partition_name(table, month)
+    create = (
+        f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{table}" '
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    )
+    default = default_partition(table)
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            has_rows = False
+            if default:
+                cursor.execute(
+                    f'SELECT EXISTS (SELECT 1 FROM "{default}" WHERE created_at >= %s AND created_at < %s)', [start, end],
+                )
+                has_rows = cursor.fetchone()[0]
+            if not has_rows:
+                cursor.execute(create)
+                return True
+            columns = ", ".join(connection.ops.quote_name(field.column) for field in ARCHIVED_MODELS[table]._meta.concrete_fields)
+            cursor.execute(f'ALTER TABLE "{table}" DETACH PARTITION "{default}"')
+            cursor.execute(create)
+            cursor.execute(
+                f'INSERT INTO "{name}" ({columns}) SELECT {columns} FROM "{default}" '
+                "WHERE created_at >= %s AND created_at < %s",
+                [start, end],
+            )
+            cursor.execute(f'DELETE FROM "{default}" WHERE created_at >= %s AND created_at < %s', [start, end])
+            cursor.execute(f'ALTER TABLE "{table}" ATTACH PARTITION "{default}" DEFAULT')
+    return True
+
+
+def ensure_future_partitions(months_ahead: int = 3) -> list:
+    """Keep this month and the next ``months_ahead`` partitioned so rows never land in DEFAULT."""
+    created = []
+    for table in ARCHIVED_MODELS:
+        if not is_partitioned(table):
+            continue
+        month = date.today().replace(day=1)
+        for _ in range(months_ahead + 1):
+            if ensure_partition(table, month):
+                created.append(partition_name(table, month))
+            month = next_month(month)
+    return created
+
+
+# ---------------------------
+# Archive files
+# ---------------------------
+def archive_path(archive_dir: str, table: str, month: date) -> str:
+    """Never overwrite an earlier archive of the same month (e.g. after a restore)."""
+    base = os.path.join(archive_dir, f"{table}_{month:%Y_%m}")
+    path, n = f"{base}.jsonl.gz", 1
+    while os.path.exists(path):
+        path, n = f"{base}.{n}.jsonl.gz", n + 1
+    return path
+
+
+def archived_months(archive_dir: str) -> dict:
+    """table -> months with an archive file in ``archive_dir``, oldest first."""
+    months = {}
+    if os.path.isdir(archive_dir):
+        for name in os.listdir(archive_dir):
+            match = ARCHIVE_RE.match(name)
+            if match and match.group('table') in ARCHIVED_MODELS:
+                month = date(int(match.group('year')), int(match.group('month')), 1)
+                months.setdefault(match.group('table'), set()).add(month)
+    return {table: sorted(found) for table, found in months.items()}
+
+
+def write_archive(path: str, rows) -> int:
+    """Write dict rows as gzip JSONL, durably (tmp + fsync + rename); returns the count."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    count = 0
+    with open(tmp_path, 'wb') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb') as gz:
+            for row in rows:
+                gz.write(json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False).encode('utf-8') + b"\n")
+                count += 1
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(tmp_path, path)
+    return count
+
+
+def _stream_table(model, table: str, chunk_size: int):
+    """
+    Rows of ``table`` (a detached partition of ``model``'s table) shaped like
+    the ORM path's. Raw cursors return jsonb as text, so JSONField columns
+    are decoded here; otherwise they would be archived as JSON strings.
+    """
+    fields = model._meta.concrete_fields
+    columns = ", ".join(connection.ops.quote_name(field.column) for field in fields)
+    json_columns = {field.column for field in fields if isinstance(field, models.JSONField)}
+    # Server-side cursor, so a month of rows is never held in memory
+    with transaction.atomic():
+        with connection.chunked_cursor() as cursor:
+            cursor.execute(f'SELECT {columns} FROM "{table}" ORDER BY id')
+            names = [field.column for field in fields]
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                for values in rows:
+                    row = dict(zip(names, values))
+                    for column in json_columns:
+                        if isinstance(row[column], str):
+                            row[column] = json.loads(row[column])
+                    yield row
+
+
+def archive_month(table: str, month: date, archive_dir: str, chunk_size: int = 5000) -> tuple:
+    """Archive and remove one month of ``table``; returns (path, rows)."""
+    model = ARCHIVED_MODELS[table]
+    path = archive_path(archive_dir, table, month)
+
+    if is_partitioned(table):
+        name = detached_partitions(table).get(month)
+        if name is None:
+            if month in default_months(table, next_month(month)):
+                # Rows stranded in DEFAULT: give them their partition, then archive that
+                ensure_partition(table, month)
+            name = monthly_partitions(table).get(month)
+            if name is None:
+                return None, 0
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    cursor.execute(f'ALTER TABLE "{table}" DETACH PARTITION "{name}"')
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT EXISTS (SELECT 1 FROM "{name}")')
+            has_rows = cursor.fetchone()[0]
+        count = write_archive(path, _stream_table(model, name, chunk_size)) if has_rows else 0
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE "{name}"')
+        return (path if has_rows else None), count
+
+    start, end = month_bounds(month)
+    rows = model.objects.filter(created_at__gte=start, created_at__lt=end)
+    if not rows.exists():
+        return None, 0
+    columns = [field.column for field in model._meta.concrete_fields]
+    count = write_archive(path, (
+        dict(zip(columns, values))
+        for values in rows.order_by('id').values_list(*[f.attname for f in model._meta.concrete_fields]).iterator(chunk_size=chunk_size)
+    ))
+    with transaction.atomic():
+        rows._raw_delete(rows.db)
+    return path, count
+
+
+def months_to_archive(table: str, before: date) -> list:
+    """Months strictly before ``before`` that still hold rows of ``table``."""
+    if is_partitioned(table):
+        months = set(monthly_partitions(table)) | set(detached_partitions(table)) | set(default_months(table, before))
+        return sorted(month for month in months if month < before)
+
+    model = ARCHIVED_MODELS[table]
+    start, _ = month_bounds(before)
+    oldest = model.objects.filter(created_at__lt=start).aggregate(oldest=models.Min('created_at'))['oldest']
+    months = []
+    if oldest is not None:
+        month = date(oldest.astimezone(dt_timezone.utc).year, oldest.astimezone(dt_timezone.utc).month, 1)
+        while month < before:
+            months.append(month)
+            month = next_month(month)
+    return months
+
+
+def refuse_rebuild(archive_dir: str, tables) -> None:
+    """ValueError if any of ``tables`` has archived months (see module docstring)."""
+    archived = archived_months(archive_dir)
+    found = [f"{table} {month:%Y-%m}" for table in tables for month in archived.get(table, ())]
+    if found:
+        raise ValueError(
+            f"{len(found)} archived month(s) in {archive_dir} ({', '.join(found[:3])}"
+            f"{', ...' if len(found) > 3 else ''}) are no longer in the database; a rebuild would drop "
+            f"them. Restore them with restore_chat_archive and pass --include-archived, or keep "
+            f"catching up incrementally."
+        )
+
+
+# ---------------------------
+# Restore
+# ---------------------------
+def _read_archive(path: str):
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def restore_archive(path: str, batch_size: int = 1000) -> tuple:
+    """
+    Load an archive file back into its table; returns (restored, skipped).
+    Rows already present, and rows whose session no longer exists, are
+    skipped.
+    """
+    match = ARCHIVE_RE.match(os.path.basename(path))
+    if not match or match.group('table') not in ARCHIVED_MODELS:
+        raise ValueError(f"Not a chat archive file: {path}")
+    table = match.group('table')
+    model = ARCHIVED_MODELS[table]
+    if is_partitioned(table):
+        ensure_partition(table, date(int(match.group('year')), int(match.group('month')), 1))
+
+    fields = model._meta.concrete_fields
+    # Raw INSERT rather than bulk_create: auto_now_add would overwrite created_at
+    sql = (
+        f'INSERT INTO {connection.ops.quote_name(table)} '
+        f'({", ".join(connection.ops.quote_name(field.column) for field in fields)}) '
+        f'VALUES ({", ".join(["%s"] * len(fields))}) ON CONFLICT DO NOTHING'
+    )
+    restored = skipped = 0
+
+    def flush(batch):
+        nonlocal restored, skipped
+        live = set(ChatSession.objects.filter(id__in={row['session_id'] for row in batch}).values_list('id', flat=True))
+        params = []
+        for row in batch:
+            if row['session_id'] not in live:
+                skipped += 1
+                continue
+            values = []
+            for field in fields:
+                value = row.get(field.column)
+                if isinstance(field, models.DateTimeField) and isinstance(value, str):
+                    value = parse_datetime(value)
+                elif isinstance(field, models.JSONField) and isinstance(value, str):
+                    # Older archives of partitioned tables hold JSON objects as encoded strings
+                    try:
+                        decoded = json.loads(value)
+                    except ValueError:
+                        decoded = value
+                    value = decoded if isinstance(decoded, (dict, list)) else value
+                values.append(field.get_db_prep_save(value, connection))
+            params.append(values)
+        if not params:
+            return
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.executemany(sql, params)
+                # Rows already present are dropped by ON CONFLICT and not counted
+                inserted = max(cursor.rowcount, 0)
+        restored += inserted
+        skipped += len(params) - inserted
+
+    batch = []
+    for row in _read_archive(path):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+    return restored, skipped
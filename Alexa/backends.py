@@ -0,0 +1,193 @@
+"""
+Model backends for the AI knowledgebase fallback.
+
+``EnhancedChatbot`` talks to embeddings and completions through the backend
+named by ``settings.CHATBOT_MODEL_BACKEND``:
+
+• ``openai`` - OpenAI embeddings and completions (default)
+• ``local``  - deterministic NumPy hashing embedder and an extractive
+  answerer, no network access needed (CI, laptops, benchmarking)
+
+A dotted path to a ``ModelBackend`` subclass is accepted as well.
+"""
+import hashlib
+import math
+import re
+import threading
+from functools import lru_cache
+
+import numpy as np
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:\.[a-z0-9]+)*")
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+
+MODEL_BACKENDS = {
+    'openai': 'Alexa.backends.OpenAIBackend',
+    'local': 'Alexa.backends.LocalBackend',
+}
+
+_backends = {}
+_vector_stores = {}
+_lock = threading.Lock()
+
+
+def tokenize(text: str) -> list:
+    return TOKEN_RE.findall(text.lower())
+
+
+# ---------------------------
+# Local embedder / answerer
+# ---------------------------
+@lru_cache(maxsize=65536)
+def _hash_feature(feature: str, dimensions: int):
+    # blake2b rather than hash() so vectors are stable across processes
+    value = int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'little')
+    return value % dimensions, (1.0 if value >> 63 else -1.0)
+
+
+class HashingEmbeddings:
+    """
+    Feature-hashing embedder over word unigrams and bigrams.
+    Same text -> same vector on every machine; implements the LangChain
+    ``Embeddings`` interface so it can be handed straight to Chroma.
+    """
+
+    def __init__(self, dimensions: int = 512):
+        self.dimensions = dimensions
+
+    def _vector(self, text: str) -> np.ndarray:
+        tokens = tokenize(text)
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        counts = {}
+        for feature in features:
+            counts[feature] = counts.get(feature, 0) + 1
+
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for feature, count in counts.items():
+            index, sign = _hash_feature(feature, self.dimensions)
+            vector[index] += sign * (1.0 + math.log(count))
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+        return vector
+
+    def embed_documents(self, texts: list) -> list:
+        return [self._vector(text).tolist() for text in texts]
+
+    def embed_query(self, text: str) -> list:
+        return self._vector(text).tolist()
+
+
+class ExtractiveAnswerer:
+    """
+    Template answer built from the retrieved sentences that share the most
+    terms with the question.
+    """
+    no_answer = "I’m sorry, I don’t have information on that yet. Could you rephrase or ask another question?"
+
+    def __init__(self, max_sentences: int = 2):
+        self.max_sentences = max_sentences
+
+    def __call__(self, question: str, documents: list) -> str:
+        terms = set(tokenize(question))
+        scored = []
+        for rank, doc in enumerate(documents):
+            for position, sentence in enumerate(SENTENCE_RE.split(doc.page_content)):
+                sentence = sentence.strip()
+                overlap = len(terms & set(tokenize(sentence)))
+                if sentence and overlap:
+                    # Ties go to the better-ranked chunk, then to earlier sentences
+                    scored.append((-overlap, rank, position, sentence))
+        if not scored:
+            return self.no_answer
+        best = [sentence for _, _, _, sentence in sorted(scored)[:self.max_sentences]]
+        return " ".join(best)
+
+
+# ---------------------------
+# Backends
+# ---------------------------
+class ModelBackend:
+    """
+    Base class: an ``embeddings`` object for the vector store plus
+    ``answer(question, documents)`` for the final reply.
+    """
+    name = None
+    collection_name = 'langchain'
+
+    def __init__(self):
+        self.embeddings = None
+
+    def build_prompt(self, question: str, documents: list) -> str:
+        context = "\n".join([doc.page_content for doc in documents])
+        return f"Answer the question based on the context below:\nContext:\n{context}\nQuestion: {question}"
+
+    def answer(self, question: str, documents: list) -> str:
+        raise NotImplementedError
+
+
+class OpenAIBackend(ModelBackend):
+    name = 'openai'
+
+    def __init__(self):
+        from langchain.embeddings import OpenAIEmbeddings
+        from langchain.llms import OpenAI
+
+        super().__init__()
+        # Fail fast: the chatbot enforces its own per-turn budget and circuit breaker,
+        # and a call past the budget would otherwise keep holding a pool thread.
+        # The query embedding is the only network call of a Chroma search.
+        timeout = getattr(settings, 'CHATBOT_TURN_BUDGET', 4.0)
+        self.embeddings = OpenAIEmbeddings(
+            openai_api_key=settings.OPENAI_API_KEY, request_timeout=timeout, max_retries=0,
+        )
+        self.llm = OpenAI(
+            temperature=0.0,
+            openai_api_key=settings.OPENAI_API_KEY,
+            request_timeout=timeout,
+            max_retries=0,
+        )
+
+    def answer(self, question: str, documents: list) -> str:
+        return self.llm(self.build_prompt(question, documents))
+
+
+class LocalBackend(ModelBackend):
+    name = 'local'
+    # Separate collection: Chroma pins the vector dimension per collection
+    collection_name = 'kb_local'
+
+    def __init__(self):
+        super().__init__()
+        self.embeddings = HashingEmbeddings(
+            dimensions=getattr(settings, 'CHATBOT_LOCAL_EMBEDDING_DIM', 512)
+        )
+        self.answerer = ExtractiveAnswerer()
+
+    def answer(self, question: str, documents: list) -> str:
+        return self.answerer(question, documents)
+
+
+def get_model_backend(name: str = None) -> ModelBackend:
+    """Process-wide backend instance for ``name`` (defaults to the setting)."""
+    name = name or getattr(settings, 'CHATBOT_MODEL_BACKEND', 'openai')
+    with _lock:
+        if name not in _backends:
+            _backends[name] = import_string(MODEL_BACKENDS.get(name, name))()
+        return _backends[name]
+
+
+def get_vector_store(backend: ModelBackend):
+    """Process-wide Chroma store for ``backend``; opening it is not free."""
+    from langchain.vectorstores import Chroma
+
+    with _lock:
+        if backend.name not in _vector_stores:
+            _vector_stores[backend.name] = Chroma(
+                persist_directory=str(getattr(settings, 'KB_VECTORS_DIR', 'kb_vectors')),
+                collection_name=backend.collection_name,
+                embedding_function=backend.embeddings,
+            )
+        return _vector_stores[backend.name]
@@ -1,16 +1,24 @@
 import uuid
 import re
 import os
-from langchain.vectorstores import Chroma
-from langchain.embeddings import OpenAIEmbeddings
-from langchain.llms import OpenAI
+import logging
+from concurrent.futures import TimeoutError
 from django.conf import settings
+from .backends import get_model_backend, get_vector_store
+from .coalesce import KNOWLEDGE_FLIGHT, normalize_question
+from .resilience import DEGRADED_ANSWERS, LLM_BREAKER, LLM_POOL, Deadline, run_with_timeout
+from .retrieval import get_retriever
+from .search import search_knowledge
+
+logger = logging.getLogger(__name__)
 
 # ---------------------------
 # In-memory session store (prototype)
 # ---------------------------
 SESSIONS = {}
 
+NO_ANSWER = "I’m sorry, I don’t have information on that yet. Could you rephrase or ask another question?"
+
 
 class EnhancedChatbot:
     """
@@ -35,13 +43,11 @@ class EnhancedChatbot:
             }
         self.session_data = SESSIONS[self.session_id]
 
-        # Initialize AI knowledgebase
-        self.embeddings = OpenAIEmbeddings(openai_api_key=settings.OPENAI_API_KEY)
-        self.vector_db = Chroma(
-            persist_directory="kb_vectors",
-            embedding_function=self.embeddings
-        )
-        self.llm = OpenAI(temperature=0.0, openai_api_key=settings.OPENAI_API_KEY)
+        # Initialize AI knowledgebase (backend chosen by settings.CHATBOT_MODEL_BACKEND)
+        self.backend = get_model_backend()
+        self.embeddings = self.backend.embeddings
+        self.vector_db = get_vector_store(self.backend)
+        self.retriever = get_retriever(self.backend)
 
     # --------------------------------------------------------
     # MAIN MESSAGE PROCESSOR
@@ -322,14 +328,8 @@ class EnhancedChatbot:
     # AI KNOWLEDGEBASE FALLBACK
     # --------------------------------------------------------
     def _ai_knowledge_response(self, message: str) -> str:
-        try:
-            results = self.vector_db.similarity_search(message, k=3)
-            context = "\n".join([doc.page_content for doc in results])
-            prompt = f"Answer the question based on the context below:\nContext:\n{context}\nQuestion: {message}"
-            answer = self.llm(prompt)
-            return answer
-        except Exception:
-            return "I’m sorry, I don’t have information on that yet. Could you rephrase or ask another question?"
+        reply, _ = answer_knowledge_question(message)
+        return reply
 
     # --------------------------------------------------------
     # HELPERS
@@ -344,4 +344,70 @@ class EnhancedChatbot:
     def _build_buttons_response(self, reply: str, buttons: list) -> dict:
         return {"session_id": self.session_id, "reply": reply, "type": "buttons", "buttons": buttons}
   
-  
\ No newline at end of file
+  
+
+
+# ---------------------------
+# Knowledge pipeline (also the fallback of views.EnhancedChatbot)
+# ---------------------------
+def answer_knowledge_question(message: str) -> tuple:
+    """
+    (reply, answered): ``answered`` is False when nothing relevant was found
+    and the reply is the canned "no information" one.
+    """
+    # Identical questions in flight at the same time share one pipeline run
+    reply, answered = KNOWLEDGE_FLIGHT.do(
+        normalize_question(message),
+        lambda: _run_knowledge_pipeline(message),
+    )
+    return reply, answered
+
+
+def _run_knowledge_pipeline(message: str) -> tuple:
+    # Retrieval + generation share one latency budget; whatever is left
+    # when a stage runs out is answered from the best retrieved text.
+    deadline = Deadline(getattr(settings, 'CHATBOT_TURN_BUDGET', 4.0))
+    try:
+        # Inside the guard: e.g. the OpenAI backend cannot be built without an API key
+        backend = get_model_backend()
+        # Lexical + vector search fused; per-stage timings in retrieval.timings
+        retrieval = run_with_timeout(deadline.remaining(), get_retriever(backend).retrieve, message)
+    except TimeoutError:
+        logger.warning("Knowledge retrieval exceeded the turn budget for %r", message)
+        return _degraded_answer(message, [], 'retrieval_timeout')
+    except Exception:
+        logger.exception("Knowledge retrieval failed for %r", message)
+        return _degraded_answer(message, [], 'retrieval_error')
+    documents = retrieval.documents
+
+    if deadline.remaining() < getattr(settings, 'CHATBOT_MIN_GENERATION_TIME', 0.5):
+        return _degraded_answer(message, documents, 'budget_exhausted')
+    if not LLM_BREAKER.allow():
+        return _degraded_answer(message, documents, 'circuit_open')
+    try:
+        answer = run_with_timeout(deadline.remaining(), backend.answer, message, documents, pool=LLM_POOL)
+    except TimeoutError:
+        LLM_BREAKER.record_failure(timeout=True)
+        logger.warning("LLM answer exceeded the turn budget for %r", message)
+        return _degraded_answer(message, documents, 'llm_timeout')
+    except Exception:
+        LLM_BREAKER.record_failure()
+        logger.exception("LLM answer failed for %r", message)
+        return _degraded_answer(message, documents, 'llm_error')
+    LLM_BREAKER.record_success()
+    return answer, True
+
+
+def _degraded_answer(message: str, documents: list, reason: str) -> tuple:
+    """Best retrieved chunk, else best KnowledgeBase match, else a canned reply (not answered)."""
+    DEGRADED_ANSWERS.incr(reason)
+    if documents:
+        return documents[0].page_content, True
+    try:
+        matches = search_knowledge(message, limit=1)
+    except Exception:
+        logger.exception("KnowledgeBase search failed for %r", message)
+        matches = []
+    if matches:
+        return matches[0].answer, True
+    return NO_ANSWER, False
@@ -0,0 +1,189 @@
+"""
+Single-flight coalescing of identical knowledgebase questions.
+
+When many users ask the same question at once, the first caller runs the
+embedding/search/LLM pipeline and concurrent duplicates wait for its
+result instead of starting their own:
+
+• within a process - followers block on the leader's event
+• across workers   - optional, when ``settings.CHATBOT_COALESCE_LOCK_DIR``
+  is set: the leader holds an ``flock`` on a per-question lock file and
+  leaves its answer next to it for ``CHATBOT_COALESCE_RESULT_TTL`` seconds.
+  The leader removes the lock file before releasing it, and expired
+  answers are deleted when read and by a periodic sweep of the directory
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+from django.conf import settings
+
+from .backends import tokenize
+from .resilience import MetricCounters
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; coalescing stays in-process
+    fcntl = None
+
+
+def normalize_question(text: str) -> str:
+    return " ".join(tokenize(text))
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self, lock_dir: str = None, result_ttl: float = 5.0, wait_timeout: float = 10.0):
+        self.lock_dir = lock_dir if fcntl else None
+        self.result_ttl = result_ttl
+        self.wait_timeout = wait_timeout
+        self.counters = MetricCounters()
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._next_sweep = 0.0
+        if self.lock_dir:
+            os.makedirs(self.lock_dir, exist_ok=True)
+
+    def do(self, key: str, fn):
+        """Return ``fn()``, sharing one execution among concurrent callers with the same key."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            if call.event.wait(self.wait_timeout):
+                self.counters.incr('coalesced')
+                if call.error is not None:
+                    raise call.error
+                return call.result
+            # Leader is stuck; don't hold this request hostage
+            self.counters.incr('wait_timeouts')
+            self.counters.incr('executed')
+            return fn()
+
+        try:
+            call.result = self._lead(key, fn)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            call.event.set()
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def _lead(self, key: str, fn):
+        if not self.lock_dir:
+            self.counters.incr('executed')
+            return fn()
+
+        self._sweep()
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        lock_path = os.path.join(self.lock_dir, f"{digest}.lock")
+        result_path = os.path.join(self.lock_dir, f"{digest}.json")
+        lock_file = self._acquire(lock_path)
+        if lock_file is None:
+            self.counters.incr('wait_timeouts')
+            self.counters.incr('executed')
+            return fn()
+        try:
+            # Another worker may have just answered this question
+            cached = self._read_result(result_path)
+            if cached is not None:
+                self.counters.incr('coalesced_remote')
+                return cached['result']
+            result = fn()
+            self.counters.incr('executed')
+            self._write_result(result_path, result)
+            return result
+        finally:
+            # Unlink while still holding the lock; waiters notice and reopen (see _acquire)
+            try:
+                os.unlink(lock_path)
+            except OSError:
+                pass
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+
+    def _acquire(self, lock_path: str):
+        """The locked lock file, or None after ``wait_timeout``."""
+        deadline = time.monotonic() + self.wait_timeout
+        lock_file = open(lock_path, 'a')
+        while True:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    lock_file.close()
+                    return None
+                time.sleep(0.02)
+                continue
+            try:
+                if os.stat(lock_path).st_ino == os.fstat(lock_file.fileno()).st_ino:
+                    return lock_file
+            except FileNotFoundError:
+                pass
+            # The previous leader unlinked this file before releasing it: lock the current one
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+            lock_file = open(lock_path, 'a')
+
+    def _read_result(self, path: str):
+        try:
+            if time.time() - os.path.getmtime(path) > self.result_ttl:
+                os.unlink(path)
+                return None
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _sweep(self) -> None:
+        """Delete answers nobody asked for again, at most once a minute (or per TTL)."""
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next_sweep:
+                return
+            self._next_sweep = now + max(60.0, self.result_ttl)
+        cutoff = time.time() - self.result_ttl
+        try:
+            names = os.listdir(self.lock_dir)
+        except OSError:
+            return
+        for name in names:
+            if not name.endswith(('.json', '.tmp')):
+                continue
+            path = os.path.join(self.lock_dir, name)
+            try:
+                # Leftover .tmp files are from a worker that died mid-write
+                if os.path.getmtime(path) < (cutoff if name.endswith('.json') else cutoff - 60):
+                    os.unlink(path)
+            except OSError:
+                continue
+
+    def _write_result(self, path: str, result) -> None:
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'result': result}, f)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError):
+            # Unserializable or unwritable results just aren't shared
+            pass
+
+
+KNOWLEDGE_FLIGHT = SingleFlight(
+    lock_dir=getattr(settings, 'CHATBOT_COALESCE_LOCK_DIR', None),
+    result_ttl=getattr(settings, 'CHATBOT_COALESCE_RESULT_TTL', 5.0),
+    wait_timeout=getattr(settings, 'CHATBOT_TURN_BUDGET', 4.0) + 1.0,
+)
@@ -0,0 +1,217 @@
+"""
+Columnar snapshots of the chat tables for offline analysis.
+
+``snapshot_dataset()`` appends rows newer than the last snapshot (by id)
+as a new segment: one ``.npy`` file per column. The layout is
+``<dir>/<dataset>/seg-00001.<column>.npy`` plus ``manifest.json``.
+
+Column kinds:
+
+• ``int``      - int64 (ids, lengths)
+• ``float``    - float64, NaN for NULL
+• ``datetime`` - datetime64[us], UTC
+• ``dict``     - int32 codes into the column's dictionary in the manifest;
+  -1 is NULL. Codes never change once assigned, so every segment shares one
+  dictionary.
+
+The manifest lists each segment's row count and id/created_at range. It is
+replaced atomically after the segment's files are written, so a crashed
+run leaves the previous snapshot intact. Load with ``open_snapshot()``;
+columns are memory-mapped, e.g.::
+
+    snap = open_snapshot('analytics_snapshot', 'chatlog')
+    counts = np.bincount(snap.column('selected_panel') + 1)   # +1: NULL -> 0
+"""
+import json
+import os
+from datetime import timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.db.models.functions import Length
+from django.utils import timezone
+
+from .models import ChatLog, ChatMessage
+
+# dataset -> (model, [(column, kind, source field/annotation)])
+DATASETS = {
+    'chatlog': (ChatLog, [
+        ('id', 'int', 'id'),
+        ('session_id', 'int', 'session_id'),
+        ('created_at', 'datetime', 'created_at'),
+        ('intent', 'dict', 'intent'),
+        ('selected_panel', 'dict', 'selected_panel'),
+        ('purpose', 'dict', 'purpose'),
+    ]),
+    'chatmessage': (ChatMessage, [
+        ('id', 'int', 'id'),
+        ('session_id', 'int', 'session_id'),
+        ('created_at', 'datetime', 'created_at'),
+        ('sender', 'dict', 'sender'),
+        ('intent', 'dict', 'intent'),
+        ('message_length', 'int', 'message_length'),
+    ]),
+}
+
+ANNOTATIONS = {
+    'message_length': Length('message'),
+}
+
+DTYPES = {
+    'int': np.int64,
+    'float': np.float64,
+    'datetime': 'datetime64[us]',
+    'dict': np.int32,
+}
+
+
+def _manifest_path(directory: str) -> str:
+    return os.path.join(directory, 'manifest.json')
+
+
+def new_manifest(dataset: str, kinds: dict) -> dict:
+    """Empty manifest for columns ``{name: kind}``."""
+    return {
+        'dataset': dataset,
+        'columns': dict(kinds),
+        'dictionaries': {name: [] for name, kind in kinds.items() if kind == 'dict'},
+        'segments': [],
+        'last_id': 0,
+    }
+
+
+def read_manifest(directory: str, dataset: str) -> dict:
+    try:
+        with open(_manifest_path(directory), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        _, columns = DATASETS[dataset]
+        return new_manifest(dataset, {name: kind for name, kind, _ in columns})
+
+
+def _write_manifest(directory: str, manifest: dict) -> None:
+    tmp_path = f"{_manifest_path(directory)}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, _manifest_path(directory))
+
+
+def segment_name(segment: int, column: str) -> str:
+    return f"seg-{segment:05d}.{column}.npy"
+
+
+def _segment_file(directory: str, segment: int, column: str) -> str:
+    return os.path.join(directory, segment_name(segment, column))
+
+
+def encode_value(kind: str, value, codes: dict, dictionary: list):
+    """Python value -> what ``column_array()`` stores; new dictionary values are appended."""
+    if kind == 'dict':
+        if value is None:
+            return -1
+        if value not in codes:
+            codes[value] = len(dictionary)
+            dictionary.append(value)
+        return codes[value]
+    if kind == 'datetime':
+        return value.astimezone(dt_timezone.utc)
+    if kind == 'float' and value is None:
+        return np.nan
+    return value
+
+
+def column_array(kind: str, data: list) -> np.ndarray:
+    if kind == 'datetime':
+        return np.array([moment.replace(tzinfo=None) for moment in data], dtype=DTYPES[kind])
+    return np.array(data, dtype=DTYPES[kind])
+
+
+def _write_segment(directory: str, manifest: dict, columns: list, values: dict) -> dict:
+    number = len(manifest['segments']) + 1
+    for name, kind, _ in columns:
+        np.save(_segment_file(directory, number, name), column_array(kind, values[name]))
+    ids, created = values['id'], values['created_at']
+    return {
+        'segment': number,
+        'rows': len(ids),
+        'min_id': ids[0],
+        'max_id': ids[-1],
+        'created_min': min(created).isoformat(),
+        'created_max': max(created).isoformat(),
+    }
+
+
+def snapshot_dataset(directory: str, dataset: str, segment_rows: int = 500000, chunk_size: int = 5000) -> int:
+    """Append rows past the manifest's last_id as new segments; returns how many."""
+    model, columns = DATASETS[dataset]
+    directory = os.path.join(directory, dataset)
+    os.makedirs(directory, exist_ok=True)
+    manifest = read_manifest(directory, dataset)
+    codes = {name: {value: code for code, value in enumerate(values)} for name, values in manifest['dictionaries'].items()}
+
+    # Rows from transactions still in flight could get lower ids than ones we see
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'ANALYTICS_ROLLUP_LAG', 5))
+    rows = model.objects.filter(id__gt=manifest['last_id'], created_at__lt=cutoff).order_by('id')
+    annotations = {name: ANNOTATIONS[source] for name, _, source in columns if source in ANNOTATIONS}
+    if annotations:
+        rows = rows.annotate(**annotations)
+    sources = [source for _, _, source in columns]
+
+    def empty():
+        return {name: [] for name, _, _ in columns}
+
+    values, exported = empty(), 0
+    for row in rows.values_list(*sources).iterator(chunk_size=chunk_size):
+        for (name, kind, _), value in zip(columns, row):
+            values[name].append(encode_value(kind, value, codes.get(name), manifest['dictionaries'].get(name)))
+        if len(values['id']) >= segment_rows:
+            exported += _commit_segment(directory, manifest, columns, values)
+            values = empty()
+    if values['id']:
+        exported += _commit_segment(directory, manifest, columns, values)
+    return exported
+
+
+def _commit_segment(directory: str, manifest: dict, columns: list, values: dict) -> int:
+    segment = _write_segment(directory, manifest, columns, values)
+    manifest['segments'].append(segment)
+    manifest['last_id'] = segment['max_id']
+    _write_manifest(directory, manifest)
+    return segment['rows']
+
+
+class ColumnarSnapshot:
+    def __init__(self, directory: str, dataset: str):
+        self.directory = os.path.join(directory, dataset)
+        self.manifest = read_manifest(self.directory, dataset)
+
+    @property
+    def rows(self) -> int:
+        return sum(segment['rows'] for segment in self.manifest['segments'])
+
+    def dictionary(self, column: str) -> list:
+        return self.manifest['dictionaries'][column]
+
+    def segments(self, column: str):
+        """Memory-mapped array per segment, oldest first."""
+        for segment in self.manifest['segments']:
+            yield np.load(_segment_file(self.directory, segment['segment'], column), mmap_mode='r')
+
+    def column(self, column: str) -> np.ndarray:
+        """Whole column; zero-copy when there is a single segment."""
+        parts = list(self.segments(column))
+        if not parts:
+            kind = self.manifest['columns'][column]
+            return np.empty(0, dtype=DTYPES[kind])
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def decoded(self, column: str) -> np.ndarray:
+        """Dictionary column as an object array of values (None for NULL)."""
+        lookup = np.array(self.dictionary(column) + [None], dtype=object)
+        return lookup[self.column(column)]   # -1 picks the trailing None
+
+
+def open_snapshot(directory: str, dataset: str) -> ColumnarSnapshot:
+    return ColumnarSnapshot(directory, dataset)
@@ -0,0 +1,216 @@
+"""
+Background exports.
+
+``enqueue()`` records an ``ExportJob`` and returns at once; the export is
+built off the request thread by one of:
+
+• ``EXPORT_JOB_RUNNER = 'thread'`` (default) - a pool of
+  ``EXPORT_JOB_WORKERS`` threads in the web process starts it straight away
+• ``'command'`` - jobs wait in the table for ``manage.py run_export_jobs``,
+  a separate worker process (or several)
+
+Either way a job is claimed with a conditional UPDATE (queued -> running),
+so it runs once however many workers see it. Clients poll the job and
+download the file when it is done.
+
+Files are cached in ``EXPORT_CACHE_DIR`` under ``Export.cache_key()``, a
+hash of dataset, format, filters and data version. Enqueueing an export
+whose file exists, or that is already queued or running, returns that job
+instead of building again; once the data changes, so does the key.
+``prune()`` removes files and jobs older than ``EXPORT_CACHE_MAX_AGE`` and
+product tombstones past ``PRODUCT_TOMBSTONE_RETENTION_DAYS``, and ``fail_stale()`` fails jobs whose worker died. ``run_export_jobs``
+calls both; in thread mode ``enqueue()`` and ``render()`` run them at most
+once per ``EXPORT_HOUSEKEEPING_INTERVAL`` per process. The synchronous
+export views share the same files (see urls.export_view).
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .exports import Export, prune_tombstones
+from .models import ExportJob
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_lock = threading.Lock()
+_next_housekeeping = 0.0
+
+
+def cached_path(cache_key: str, filename: str) -> str:
+    extension = filename.split('.', 1)[1]
+    return os.path.join(settings.EXPORT_CACHE_DIR, f"{cache_key}.{extension}")
+
+
+def artifact_path(job: ExportJob) -> str:
+    return cached_path(job.cache_key, job.filename)
+
+
+def render(export: Export, path: str) -> None:
+    """Write ``export`` to ``path`` unless it is already there (atomic replace)."""
+    if os.path.exists(path):
+        return
+    housekeeping()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as out:
+            export.write_to(out)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'EXPORT_JOB_WORKERS', 2), thread_name_prefix='export-job',
+            )
+        return _pool
+
+
+def _dispatch(job: ExportJob) -> None:
+    if getattr(settings, 'EXPORT_JOB_RUNNER', 'thread') == 'thread':
+        # After commit, so the worker thread can see the row
+        transaction.on_commit(lambda: _executor().submit(run_job, job.pk, close_connection=True))
+
+
+def _is_stale(job: ExportJob) -> bool:
+    timeout = timedelta(seconds=getattr(settings, 'EXPORT_JOB_TIMEOUT', 3600))
+    return job.status == 'running' and job.started_at < timezone.now() - timeout
+
+
+def enqueue(export: Export):
+    """(job, created): the job that will hold ``export``, reusing a cached or pending one."""
+    housekeeping()
+    cache_key = export.cache_key()
+    for job in ExportJob.objects.filter(cache_key=cache_key, status__in=('queued', 'running', 'done')).order_by('-created_at')[:5]:
+        if job.status == 'done':
+            try:
+                # Touch: prune() keeps files that are still being downloaded
+                os.utime(artifact_path(job))
+            except OSError:
+                continue
+        if _is_stale(job):
+            continue
+        if job.status == 'queued':
+            # A thread pool does not survive a restart; claiming makes this harmless
+            _dispatch(job)
+        return job, False
+    job = ExportJob.objects.create(
+        dataset=export.dataset.name, params=export.params(), cache_key=cache_key, filename=export.filename,
+    )
+    _dispatch(job)
+    return job, True
+
+
+def claim(pk: int) -> bool:
+    return ExportJob.objects.filter(pk=pk, status='queued').update(status='running', started_at=timezone.now()) == 1
+
+
+def _build(pk: int) -> None:
+    job = ExportJob.objects.get(pk=pk)
+    started = time.perf_counter()
+    try:
+        path = artifact_path(job)
+        render(Export.from_params(job.dataset, job.params), path)
+        ExportJob.objects.filter(pk=pk).update(status='done', size=os.path.getsize(path), finished_at=timezone.now())
+        logger.info(f"Export job {job.job_id} ({job.dataset}) done in {time.perf_counter() - started:.1f}s")
+    except Exception as e:
+        logger.exception(f"Export job {job.job_id} ({job.dataset}) failed")
+        ExportJob.objects.filter(pk=pk).update(status='failed', error=str(e)[:1000], finished_at=timezone.now())
+
+
+def run_job(pk: int, close_connection: bool = False) -> None:
+    """Build a queued job's file; does nothing if another worker claimed it first."""
+    try:
+        if claim(pk):
+            _build(pk)
+    finally:
+        if close_connection:
+            # Pool threads outlive requests; don't pin a connection per thread
+            connection.close()
+
+
+def run_next() -> bool:
+    """Claim and run the oldest queued job (worker command); False if there was none."""
+    for pk in ExportJob.objects.filter(status='queued').order_by('created_at').values_list('pk', flat=True)[:10]:
+        if claim(pk):
+            _build(pk)
+            return True
+    return False
+
+
+def fail_stale() -> int:
+    """Mark running jobs whose worker died (older than EXPORT_JOB_TIMEOUT) as failed."""
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'EXPORT_JOB_TIMEOUT', 3600))
+    return ExportJob.objects.filter(status='running', started_at__lt=cutoff).update(
+        status='failed', error='Worker stopped before the export finished', finished_at=timezone.now(),
+    )
+
+
+def prune() -> int:
+    """
+    Delete cached files and finished jobs older than EXPORT_CACHE_MAX_AGE, and
+    expired product tombstones; returns files removed.
+    """
+    max_age = getattr(settings, 'EXPORT_CACHE_MAX_AGE', 7 * 86400)
+    cutoff = time.time() - max_age
+    removed = 0
+    try:
+        names = os.listdir(settings.EXPORT_CACHE_DIR)
+    except FileNotFoundError:
+        names = []
+    for name in names:
+        path = os.path.join(settings.EXPORT_CACHE_DIR, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            continue
+    ExportJob.objects.filter(
+        status__in=('done', 'failed'), finished_at__lt=timezone.now() - timedelta(seconds=max_age),
+    ).delete()
+    prune_tombstones()
+    return removed
+
+
+def housekeeping() -> None:
+    """fail_stale() and prune(), at most once per EXPORT_HOUSEKEEPING_INTERVAL in this process."""
+    global _next_housekeeping
+    with _pool_lock:
+        now = time.monotonic()
+        if now < _next_housekeeping:
+            return
+        _next_housekeeping = now + getattr(settings, 'EXPORT_HOUSEKEEPING_INTERVAL', 3600)
+    try:
+        fail_stale()
+        prune()
+    except Exception:
+        logger.exception("Export cache housekeeping failed")
+
+
+def describe(job: ExportJob) -> dict:
+    return {
+        'job_id': str(job.job_id),
+        'dataset': job.dataset,
+        'format': job.params.get('format'),
+        'status': job.status,
+        'filename': job.filename,
+        'size': job.size,
+        'error': job.error or None,
+        'created_at': job.created_at,
+        'started_at': job.started_at,
+        'finished_at': job.finished_at,
+    }
@@ -0,0 +1,647 @@
+"""
+One export engine for every downloadable dataset.
+
+A dataset is a list of ``Sheet``s. A sheet has a title, declarative
+``Column``s, and a function that yields one dict per row. Rows from the
+database are read with ``.iterator()``. Writers encode the sheets:
+
+• ``xlsx``     - write-only workbook, one worksheet per sheet (see xlsx.py)
+• ``csv``      - one CSV; a zip of one CSV per sheet when there are several
+• ``jsonl``    - one JSON object per row, with a "sheet" key when there are several
+• ``columnar`` - zip of ``<sheet>/seg-*.npy`` + ``manifest.json`` in the
+  columnar.py layout; extract it and load with ``open_snapshot(dir, sheet)``
+
+csv and jsonl stream out as they are encoded, optionally gzip-framed. The
+zip-based formats are built in a spooled temp file. Either way, memory does
+not grow with the row count. ``Export`` is the one entry point for the
+HTTP views, the management commands and the scripts in the project root.
+"""
+import csv
+import hashlib
+import heapq
+import json
+import zipfile
+import zlib
+from datetime import timedelta
+from tempfile import SpooledTemporaryFile
+
+import numpy as np
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Max
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.text import slugify
+
+from . import columnar
+from .models import ChatLog, ChatMessage, PanelSpec, Product, ProductTombstone
+from .transcripts import COLUMNS as TRANSCRIPT_COLUMNS, iter_transcript_rows, parse_bound
+from .xlsx import XLSX_CONTENT_TYPE, SheetWriter, new_workbook
+
+BLOCK_SIZE = 64 * 1024
+
+
+# ---------------------------
+# Schemas
+# ---------------------------
+class Column:
+    """
+    ``kind`` is one of text, number, int, bool, datetime or list (of
+    strings). It decides how each format renders the value: lists are
+    joined with ``separator`` except in JSONL, and datetimes are ISO 8601
+    except in XLSX.
+    """
+
+    def __init__(self, header: str, key: str, kind: str = 'text', source=None, wrap: bool = False,
+                 separator: str = '\n'):
+        self.header = header
+        self.key = key
+        self.kind = kind
+        self.source = source      # row -> value; default row[key]
+        self.wrap = wrap          # wrap text in XLSX
+        self.separator = separator
+
+    def joined(self, value) -> str:
+        return self.separator.join(str(item) for item in value)
+
+    def value(self, row: dict):
+        return self.source(row) if self.source else row.get(self.key)
+
+
+class Sheet:
+    def __init__(self, title: str, columns: list, rows):
+        self.title = title
+        self.columns = columns
+        self.rows = rows          # filters -> iterable of dicts
+
+    @property
+    def slug(self) -> str:
+        return slugify(self.title).replace('-', '_')
+
+
+class Dataset:
+    def __init__(self, name: str, sheets: list, filename: str, version, date_range: bool = False,
+                 default_days: int = None, watermark: bool = False, private: bool = False):
+        self.name = name
+        self.sheets = sheets
+        self.filename = filename
+        self.version = version              # filters -> token that changes when the rows do
+        self.date_range = date_range        # accepts start / end filters
+        self.default_days = default_days    # start defaults to this many days before end
+        self.watermark = watermark          # accepts since / until filters (delta exports)
+        self.private = private              # staff only over HTTP
+
+    @property
+    def cacheable(self) -> bool:
+        """False when the default filters move with the clock, so no two exports share a file."""
+        return not (self.date_range or self.watermark)
+
+    def parse_filters(self, params) -> dict:
+        """start / end (or since / until) from request or command parameters; ValueError if invalid."""
+        if self.watermark:
+            since = parse_bound(params['since']) if params.get('since') else None
+            # Changes younger than EXPORT_DELTA_LAG may still be committing: leave them for the next pull
+            lag = timedelta(seconds=getattr(settings, 'EXPORT_DELTA_LAG', 5))
+            until = parse_bound(params['until']) if params.get('until') else timezone.now() - lag
+            if since and since >= until:
+                raise ValueError("since must be before until")
+            if since and since < tombstone_cutoff():
+                # Deletions before the cutoff may already be pruned
+                raise ValueError(
+                    f"since is older than the {getattr(settings, 'PRODUCT_TOMBSTONE_RETENTION_DAYS', 90)}-day window in which "
+                    f"deletions are kept; omit it for a full export"
+                )
+            return {'since': since, 'until': until}
+        if not self.date_range:
+            return {}
+        end = parse_bound(params['end'], end=True) if params.get('end') else None
+        if params.get('start'):
+            start = parse_bound(params['start'])
+        elif self.default_days:
+            end = end or timezone.now()
+            start = end - timedelta(days=self.default_days)
+        else:
+            start = None
+        return {'start': start, 'end': end}
+
+    def base_filename(self, filters: dict) -> str:
+        start, end = filters.get('start') or filters.get('since'), filters.get('end') or filters.get('until')
+        if start or end:
+            first = f"{start:%Y%m%d}" if start else 'first'
+            last = f"{end:%Y%m%d}" if end else 'now'
+            return f"{self.filename}_{first}_{last}"
+        return self.filename
+
+
+# ---------------------------
+# Datasets
+# ---------------------------
+def _product_rows(filters):
+    products = Product.objects.order_by('id').values('name', 'description', 'price', 'category', 'guide_steps', 'created_at')
+    return products.iterator(chunk_size=2000)
+
+
+def _spec_rows(filters):
+    from .views import INDOOR_SPECS, OUTDOOR_SPECS, RENTAL_SPECS, STANDEE_SPECS
+
+    # An imported catalog (see imports.py) replaces the built-in specs
+    if PanelSpec.objects.exists():
+        for panel_type, model, specs in PanelSpec.objects.order_by('id').values_list('panel_type', 'model', 'specs').iterator():
+            yield dict(specs, type=panel_type, model=model)
+        return
+    for panel_type, specs_by_model in (
+        ('Indoor', INDOOR_SPECS), ('Outdoor', OUTDOOR_SPECS),
+        ('Rental', RENTAL_SPECS), ('Standee', STANDEE_SPECS),
+    ):
+        for model, specs in specs_by_model.items():
+            yield dict(specs, type=panel_type, model=model)
+
+
+def tombstone_cutoff():
+    """Tombstones older than this are pruned, so ``since`` may not be older either."""
+    return timezone.now() - timedelta(days=getattr(settings, 'PRODUCT_TOMBSTONE_RETENTION_DAYS', 90))
+
+
+def prune_tombstones() -> int:
+    """Delete ProductTombstone rows past the retention window; returns how many."""
+    deleted, _ = ProductTombstone.objects.filter(deleted_at__lt=tombstone_cutoff()).delete()
+    return deleted
+
+
+def _product_change_rows(filters):
+    """
+    Products created or changed in (since, until] as upserts and deletions
+    as tombstones, merged in change order. Both are index range scans.
+    Rows carry the product id; a rename is a delete of the old name
+    followed by an upsert (see signals.record_product_rename). Tombstones
+    are kept for PRODUCT_TOMBSTONE_RETENTION_DAYS; an older ``since`` is
+    refused by ``parse_filters`` and the client does a full export.
+    """
+    since, until = filters.get('since'), filters['until']
+    changed = Product.objects.filter(updated_at__lte=until)
+    deleted = ProductTombstone.objects.filter(deleted_at__lte=until)
+    if since:
+        changed, deleted = changed.filter(updated_at__gt=since), deleted.filter(deleted_at__gt=since)
+    else:
+        # Full sync: the current catalog, nothing to delete
+        deleted = deleted.none()
+    upserts = (
+        dict(product, change='upsert', changed_at=product['updated_at'])
+        for product in changed.order_by('updated_at', 'id').values(
+            'id', 'name', 'description', 'price', 'category', 'guide_steps', 'created_at', 'updated_at',
+        ).iterator(chunk_size=2000)
+    )
+    deletes = (
+        {'change': 'delete', 'id': product_id, 'name': name, 'changed_at': deleted_at}
+        for product_id, name, deleted_at in deleted.order_by('deleted_at', 'id').values_list(
+            'product_id', 'name', 'deleted_at',
+        ).iterator(chunk_size=2000)
+    )
+    return heapq.merge(upserts, deletes, key=lambda row: row['changed_at'])
+
+
+def _purpose_guide_rows(filters):
+    from .views import PURPOSE_RECOMMENDATIONS
+
+    for purpose, recs in PURPOSE_RECOMMENDATIONS.items():
+        if purpose != 'default':
+            yield dict(recs, purpose=purpose.title())
+
+
+def _transcript_rows(filters):
+    return iter_transcript_rows(filters['start'], filters['end'] or timezone.now())
+
+
+def _lead_rows(filters):
+    leads = _in_range(ChatLog.objects.filter(intent='save_configuration'), filters)
+    fields = ['created_at', 'session__session_id', 'selected_panel', 'purpose', 'user_interests']
+    for created_at, session_id, panel, purpose, interests in (
+        leads.order_by('created_at', 'id').values_list(*fields).iterator(chunk_size=2000)
+    ):
+        yield dict(interests or {}, saved_at=created_at, session_id=session_id, model=panel, purpose=purpose)
+
+
+def _static_version(*objects) -> str:
+    return hashlib.sha256(json.dumps(objects, sort_keys=True, cls=DjangoJSONEncoder).encode('utf-8')).hexdigest()[:16]
+
+
+def _aggregate_version(queryset, field: str) -> str:
+    """Row count plus the newest ``field``: one aggregate query."""
+    stats = queryset.aggregate(rows=Count('pk'), latest=Max(field))
+    latest = stats['latest'].isoformat() if hasattr(stats['latest'], 'isoformat') else stats['latest']
+    return f"{stats['rows']}:{latest}"
+
+
+def _in_range(queryset, filters):
+    if filters.get('start'):
+        queryset = queryset.filter(created_at__gte=filters['start'])
+    if filters.get('end'):
+        queryset = queryset.filter(created_at__lt=filters['end'])
+    return queryset
+
+
+def _products_version(filters):
+    # Inserts and updates raise max(updated_at); deletes lower the count
+    return _aggregate_version(Product.objects.all(), 'updated_at')
+
+
+def _specs_version(filters):
+    from .views import INDOOR_SPECS, OUTDOOR_SPECS, RENTAL_SPECS, STANDEE_SPECS
+
+    catalog = _aggregate_version(PanelSpec.objects.all(), 'updated_at')
+    if not catalog.startswith('0:'):
+        return catalog
+    return _static_version(INDOOR_SPECS, OUTDOOR_SPECS, RENTAL_SPECS, STANDEE_SPECS)
+
+
+def _guides_version(filters):
+    from .views import PURPOSE_RECOMMENDATIONS
+
+    return f"{_static_version(PURPOSE_RECOMMENDATIONS)}:{_products_version(filters)}"
+
+
+def _transcripts_version(filters):
+    # Messages only ever get appended, so the newest id covers edits to the range
+    return _aggregate_version(_in_range(ChatMessage.objects.all(), filters), 'id')
+
+
+def _leads_version(filters):
+    return _aggregate_version(_in_range(ChatLog.objects.filter(intent='save_configuration'), filters), 'id')
+
+
+def _first_of(*keys):
+    """First of ``keys`` present in the row, as a list."""
+    def get(row):
+        for key in keys:
+            if row.get(key):
+                return row[key]
+        return []
+    return get
+
+
+PRODUCT_COLUMNS = [
+    Column('Name', 'name'),
+    Column('Description', 'description'),
+    Column('Price', 'price', 'number'),
+    Column('Category', 'category', source=lambda row: row.get('category') or ''),
+    Column('Guide Steps', 'guide_steps', 'list', wrap=True),
+    Column('Created At', 'created_at', 'datetime'),
+]
+
+SPEC_COLUMNS = [
+    Column('Type', 'type'),
+    Column('Model', 'model'),
+    Column('Pixel Pitch', 'pixel_pitch'),
+    Column('Module Resolution', 'module_resolutions', 'list', separator=', '),
+    Column('LED Type', 'led_types', 'list', separator=', '),
+    Column('Brightness', 'brightness_options', 'list', separator=', '),
+    Column('Module Size', 'module_sizes', 'list', source=_first_of('module_sizes', 'Dimensions'), separator=', '),
+    Column('Scan Time / Driving Mode', 'scan_times', 'list', source=_first_of('scan_times', 'driving_modes'), separator=', '),
+    Column('IP Rating', 'ip_rating'),
+    Column('Price per Sq.Meter', 'price_per_sq_meter'),
+    Column('Price per Cabinet', 'price_per_cabinet'),
+    Column('Rental Price per Day', 'rental_price_per_day'),
+    Column('Rental Price per Week', 'rental_price_per_week'),
+    Column('Setup Fee', 'setup_fee'),
+    Column('Durability', 'durability'),
+    Column('Availability', 'availability'),
+]
+
+PRODUCT_CHANGE_COLUMNS = [
+    Column('Change', 'change'),
+    Column('Changed At', 'changed_at', 'datetime'),
+    Column('Product ID', 'id', 'int'),
+] + PRODUCT_COLUMNS
+
+PURPOSE_GUIDE_COLUMNS = [
+    Column('Purpose', 'purpose'),
+    Column('Panel Recommendation', 'panel_recommendation'),
+    Column('Estimated Brightness', 'estimated_brightness'),
+    Column('Key Considerations', 'tips', 'list', wrap=True),
+    Column('Additional Accessories', 'additional_accessories', 'list', wrap=True),
+    Column('Setup Steps', 'setup_steps', 'list', wrap=True),
+]
+
+PANEL_GUIDE_COLUMNS = [
+    Column('Panel Name', 'name'),
+    Column('Guide Steps', 'guide_steps', 'list', wrap=True),
+]
+
+_TRANSCRIPT_KINDS = {'message_id': 'int', 'session_created_at': 'datetime', 'created_at': 'datetime'}
+TRANSCRIPT_SCHEMA = [Column(key, key, _TRANSCRIPT_KINDS.get(key, 'text')) for key in TRANSCRIPT_COLUMNS]
+
+LEAD_COLUMNS = [
+    Column('Saved At', 'saved_at', 'datetime'),
+    Column('Session ID', 'session_id'),
+    Column('Panel Type', 'panel_type', source=lambda row: (row.get('selected_panel') or {}).get('type')),
+    Column('Model', 'model'),
+    Column('Purpose', 'purpose'),
+    Column('Width (ft)', 'width'),
+    Column('Height (ft)', 'height'),
+    Column('Quantity', 'quantity'),
+    Column('Rental Duration', 'rental_duration'),
+    Column('Include Controller', 'include_controller', 'bool'),
+    Column('Installation', 'installation', 'bool'),
+    Column('Delivery', 'delivery'),
+    Column('Company', 'company_name'),
+    Column('Contact Person', 'contact_person'),
+    Column('Mobile', 'mobile'),
+    Column('Email', 'email'),
+]
+
+DATASETS = {
+    'products': Dataset('products', [Sheet('Products', PRODUCT_COLUMNS, _product_rows)], 'products', _products_version),
+    'product_changes': Dataset('product_changes', [Sheet('Product Changes', PRODUCT_CHANGE_COLUMNS, _product_change_rows)],
+                               'product_changes', _products_version, watermark=True),
+    'specs': Dataset('specs', [Sheet('Panel Specs', SPEC_COLUMNS, _spec_rows)], 'panel_specs', _specs_version),
+    'guides': Dataset('guides', [
+        Sheet('Purpose Guides', PURPOSE_GUIDE_COLUMNS, _purpose_guide_rows),
+        Sheet('Panel Guides', PANEL_GUIDE_COLUMNS, _product_rows),
+    ], 'guides', _guides_version),
+    'transcripts': Dataset('transcripts', [Sheet('Transcripts', TRANSCRIPT_SCHEMA, _transcript_rows)],
+                           'transcripts', _transcripts_version, date_range=True, default_days=7, private=True),
+    'leads': Dataset('leads', [Sheet('Leads', LEAD_COLUMNS, _lead_rows)], 'leads', _leads_version,
+                     date_range=True, private=True),
+}
+
+
+# ---------------------------
+# Writers
+# ---------------------------
+def _as_text(column: Column, value) -> str:
+    if value is None:
+        return ''
+    if column.kind == 'list':
+        return column.joined(value)
+    if column.kind == 'datetime':
+        return value.isoformat()
+    return value
+
+
+class _Echo:
+    """File-like object whose write() hands the encoded line back to csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_lines(sheet: Sheet, filters: dict):
+    writer = csv.writer(_Echo())
+    yield writer.writerow([column.key for column in sheet.columns])
+    for row in sheet.rows(filters):
+        yield writer.writerow([_as_text(column, column.value(row)) for column in sheet.columns])
+
+
+def _jsonl_lines(sheets: list, filters: dict):
+    for sheet in sheets:
+        for row in sheet.rows(filters):
+            record = {'sheet': sheet.slug} if len(sheets) > 1 else {}
+            for column in sheet.columns:
+                value = column.value(row)
+                record[column.key] = value.isoformat() if column.kind == 'datetime' and value is not None else value
+            yield json.dumps(record, cls=DjangoJSONEncoder, ensure_ascii=False) + "\n"
+
+
+def _blocks(lines, compress: bool = False):
+    """Encode ``lines`` into ~64 KB byte blocks; gzip-framed when ``compress``."""
+    # wbits=31 -> gzip header and trailer, so the output is a valid .gz file
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    buffer, size = [], 0
+    for line in lines:
+        data = line.encode('utf-8')
+        buffer.append(data)
+        size += len(data)
+        if size >= BLOCK_SIZE:
+            block = b"".join(buffer)
+            buffer, size = [], 0
+            if compressor:
+                block = compressor.compress(block)
+            if block:
+                yield block
+    block = b"".join(buffer)
+    if compressor:
+        block = compressor.compress(block) + compressor.flush()
+    if block:
+        yield block
+
+
+class Writer:
+    extension = ''
+    content_type = 'application/octet-stream'
+
+    def is_streaming(self, sheets: list) -> bool:
+        """True: ``blocks()`` yields the output; False: ``build()`` writes it to a file."""
+        return False
+
+    def blocks(self, sheets: list, filters: dict, compress: bool = False):
+        raise NotImplementedError
+
+    def build(self, sheets: list, filters: dict, out) -> None:
+        raise NotImplementedError
+
+
+class CsvWriter(Writer):
+    extension = 'csv'
+    content_type = 'text/csv'
+
+    def is_streaming(self, sheets):
+        return len(sheets) == 1
+
+    def blocks(self, sheets, filters, compress=False):
+        return _blocks(_csv_lines(sheets[0], filters), compress)
+
+    def build(self, sheets, filters, out):
+        with zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for sheet in sheets:
+                with archive.open(f"{sheet.slug}.csv", 'w', force_zip64=True) as member:
+                    for block in _blocks(_csv_lines(sheet, filters)):
+                        member.write(block)
+
+
+class JsonlWriter(Writer):
+    extension = 'jsonl'
+    content_type = 'application/x-ndjson'
+
+    def is_streaming(self, sheets):
+        return True
+
+    def blocks(self, sheets, filters, compress=False):
+        return _blocks(_jsonl_lines(sheets, filters), compress)
+
+
+class XlsxWriter(Writer):
+    extension = 'xlsx'
+    content_type = XLSX_CONTENT_TYPE
+
+    @staticmethod
+    def _cell(column: Column, value):
+        if value is None:
+            return None
+        if column.kind == 'list':
+            return column.joined(value)
+        if column.kind == 'datetime':
+            # Excel has no time zones: write local wall-clock time
+            return timezone.localtime(value).replace(tzinfo=None)
+        return value
+
+    def build(self, sheets, filters, out):
+        workbook = new_workbook()
+        for sheet in sheets:
+            writer = SheetWriter(
+                workbook, sheet.title, [column.header for column in sheet.columns], bold_headers=True,
+                wrap_columns=[index for index, column in enumerate(sheet.columns, 1) if column.wrap],
+            )
+            for row in sheet.rows(filters):
+                writer.append([self._cell(column, column.value(row)) for column in sheet.columns])
+            writer.close()
+        workbook.save(out)
+
+
+class ColumnarWriter(Writer):
+    """Segments of ``segment_rows`` rows, so only one segment is ever held in memory."""
+    extension = 'columnar.zip'
+    content_type = 'application/zip'
+    KINDS = {'text': 'dict', 'list': 'dict', 'bool': 'dict', 'number': 'float', 'int': 'int', 'datetime': 'datetime'}
+
+    def __init__(self, segment_rows: int = 100000):
+        self.segment_rows = segment_rows
+
+    def _value(self, column: Column, value):
+        if column.kind == 'list':
+            return column.joined(value) if value else None
+        if column.kind == 'bool':
+            return None if value is None else str(bool(value))
+        if column.kind == 'text' and value is not None:
+            return str(value)
+        return value
+
+    def _write_segment(self, archive, sheet, manifest, values) -> None:
+        number = len(manifest['segments']) + 1
+        for column in sheet.columns:
+            array = columnar.column_array(manifest['columns'][column.key], values[column.key])
+            with archive.open(f"{sheet.slug}/{columnar.segment_name(number, column.key)}", 'w', force_zip64=True) as member:
+                np.save(member, array)
+        manifest['segments'].append({'segment': number, 'rows': len(values[sheet.columns[0].key])})
+
+    def build(self, sheets, filters, out):
+        with zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for sheet in sheets:
+                kinds = {column.key: self.KINDS[column.kind] for column in sheet.columns}
+                manifest = columnar.new_manifest(sheet.slug, kinds)
+                codes = {key: {} for key in manifest['dictionaries']}
+                values = {column.key: [] for column in sheet.columns}
+                count = 0
+                for row in sheet.rows(filters):
+                    for column in sheet.columns:
+                        values[column.key].append(columnar.encode_value(
+                            kinds[column.key], self._value(column, column.value(row)),
+                            codes.get(column.key), manifest['dictionaries'].get(column.key),
+                        ))
+                    count += 1
+                    if count == self.segment_rows:
+                        self._write_segment(archive, sheet, manifest, values)
+                        values, count = {column.key: [] for column in sheet.columns}, 0
+                if count or not manifest['segments']:
+                    self._write_segment(archive, sheet, manifest, values)
+                archive.writestr(f"{sheet.slug}/manifest.json", json.dumps(manifest, indent=1))
+
+
+FORMATS = {
+    'xlsx': XlsxWriter(),
+    'csv': CsvWriter(),
+    'jsonl': JsonlWriter(),
+    'columnar': ColumnarWriter(),
+}
+FORMAT_ALIASES = {'ndjson': 'jsonl'}
+
+
+# ---------------------------
+# Entry point
+# ---------------------------
+class Export:
+    """One dataset in one format; raises ValueError for anything invalid."""
+
+    def __init__(self, dataset: str, fmt: str = 'xlsx', filters: dict = None, compress: bool = False):
+        if dataset not in DATASETS:
+            raise ValueError(f"Unknown dataset {dataset!r}. Use: {', '.join(DATASETS)}")
+        fmt = FORMAT_ALIASES.get(fmt, fmt)
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown format {fmt!r}. Use: {', '.join(FORMATS)}")
+        self.dataset = DATASETS[dataset]
+        self.format = fmt
+        self.writer = FORMATS[fmt]
+        self.filters = filters if filters is not None else self.dataset.parse_filters({})
+        self.streaming = self.writer.is_streaming(self.dataset.sheets)
+        if compress and not self.streaming:
+            raise ValueError("gzip applies to single-sheet csv and jsonl exports only")
+        self.compress = compress
+
+    @classmethod
+    def from_params(cls, dataset: str, params, default_format: str = 'xlsx') -> 'Export':
+        """From query / command parameters: format, start, end, gzip."""
+        if dataset not in DATASETS:
+            raise ValueError(f"Unknown dataset {dataset!r}. Use: {', '.join(DATASETS)}")
+        gzip = params.get('gzip')
+        compress = gzip is True or str(gzip or '').lower() in ('1', 'true', 'yes')
+        return cls(dataset, params.get('format') or default_format, DATASETS[dataset].parse_filters(params), compress)
+
+    def data_version(self) -> str:
+        return self.dataset.version(self.filters)
+
+    def cache_key(self, version: str = None) -> str:
+        """Same key for the same dataset, format, filters and data version."""
+        filters = {key: value.isoformat() if value else None for key, value in sorted(self.filters.items())}
+        parts = [self.dataset.name, self.format, self.compress, filters, version or self.data_version()]
+        return hashlib.sha256(json.dumps(parts).encode('utf-8')).hexdigest()[:32]
+
+    def params(self) -> dict:
+        """Parameters that rebuild this export with ``from_params`` (e.g. in a job worker)."""
+        params = {key: value.isoformat() for key, value in self.filters.items() if value}
+        return dict(params, format=self.format, gzip=self.compress)
+
+    @property
+    def filename(self) -> str:
+        extension = self.writer.extension
+        if self.format == 'csv' and not self.streaming:
+            extension = 'csv.zip'
+        name = f"{self.dataset.base_filename(self.filters)}.{extension}"
+        return f"{name}.gz" if self.compress else name
+
+    @property
+    def content_type(self) -> str:
+        if self.compress:
+            return 'application/gzip'
+        return self.writer.content_type if self.streaming or self.format != 'csv' else 'application/zip'
+
+    def spool(self):
+        """The whole export in a rewound temp file (in memory up to EXPORT_SPOOL_MAX_BYTES)."""
+        spool = SpooledTemporaryFile(max_size=getattr(settings, 'EXPORT_SPOOL_MAX_BYTES', 8 * 1024 * 1024))
+        if self.streaming:
+            for block in self.blocks():
+                spool.write(block)
+        else:
+            self.writer.build(self.dataset.sheets, self.filters, spool)
+        spool.seek(0)
+        return spool
+
+    def blocks(self):
+        if self.streaming:
+            yield from self.writer.blocks(self.dataset.sheets, self.filters, self.compress)
+            return
+        with self.spool() as spool:
+            yield from iter(lambda: spool.read(BLOCK_SIZE), b'')
+
+    def write_to(self, out) -> int:
+        """Write the export to a binary file object; returns bytes written."""
+        written = 0
+        for block in self.blocks():
+            out.write(block)
+            written += len(block)
+        return written
+
+    def response(self):
+        if self.streaming:
+            response = StreamingHttpResponse(self.blocks(), content_type=self.content_type)
+            response['Content-Disposition'] = f'attachment; filename={self.filename}'
+            return response
+        return FileResponse(self.spool(), as_attachment=True, filename=self.filename, content_type=self.content_type)
@@ -0,0 +1,215 @@
+"""
+Conversation funnel over the quoting flow.
+
+The funnel is the ``STEPS`` chain from ``greeting`` to ``final_action``,
+followed by ``saved`` (a ``save_configuration`` ChatLog). A session has
+reached a step once the bot has answered with that intent.
+
+``refresh_funnel()`` follows ChatMessage ids past the 'funnel' watermark.
+Each session touched since the last run has its ``SessionFunnel`` row
+recomputed, in chunks of sessions, with one grouped query over their
+messages. New entries and saves are also added to the daily
+``AnalyticsRollup`` counts 'funnel_entered' and 'funnel_saved', so the
+save-rate trend is a read of a few small rows.
+"""
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Aggregate, Count, DateTimeField, F, FloatField, Func, Max, Min, Q
+from django.db.models.fields.json import KeyTextTransform
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from .models import AnalyticsRollup, ChatLog, ChatMessage, RollupWatermark, SessionFunnel
+from .rollups import add_counts
+
+SAVED = 'saved'
+WATERMARK = 'funnel'
+
+
+@lru_cache(maxsize=1)
+def funnel_steps() -> tuple:
+    """('greeting', 'panel_category', ..., 'final_action', 'saved')"""
+    from .views import STEPS
+
+    steps, step = [], 'greeting'
+    while step and step not in steps:
+        steps.append(step)
+        step = STEPS[step]['next']
+    return tuple(steps) + (SAVED,)
+
+
+def _session_states(session_ids: list) -> dict:
+    """session id -> {'started_at', 'step_times'} from one grouped pass."""
+    steps = funnel_steps()
+    states = {}
+    first_seen = (
+        ChatMessage.objects.filter(session_id__in=session_ids)
+        .values('session_id', 'intent')
+        .annotate(first=Min('created_at'))
+        .order_by()
+    )
+    for row in first_seen:
+        state = states.setdefault(row['session_id'], {'started_at': row['first'], 'step_times': {}})
+        state['started_at'] = min(state['started_at'], row['first'])
+        if row['intent'] in steps:
+            state['step_times'][row['intent']] = row['first']
+
+    saves = (
+        ChatLog.objects.filter(session_id__in=session_ids, intent='save_configuration')
+        .values('session_id')
+        .annotate(first=Min('created_at'))
+        .order_by()
+    )
+    for row in saves:
+        if row['session_id'] in states:
+            states[row['session_id']]['step_times'][SAVED] = row['first']
+    return states
+
+
+def _refresh_sessions(session_ids: list) -> None:
+    steps = funnel_steps()
+    existing = {f.session_id: f for f in SessionFunnel.objects.filter(session_id__in=session_ids)}
+    to_create, to_update, increments = [], [], {}
+
+    for session_id, state in _session_states(session_ids).items():
+        times = state['step_times']
+        furthest = max((steps.index(step) for step in times), default=-1)
+        funnel = existing.get(session_id)
+        if funnel is None:
+            funnel = SessionFunnel(session_id=session_id, started_at=state['started_at'])
+            to_create.append(funnel)
+            key = (timezone.localdate(funnel.started_at), 'funnel_entered', '')
+            increments[key] = increments.get(key, 0) + 1
+        else:
+            to_update.append(funnel)
+        if times.get(SAVED) and not funnel.saved_at:
+            # Saves count against the day the session started (cohort save rate)
+            key = (timezone.localdate(funnel.started_at), 'funnel_saved', '')
+            increments[key] = increments.get(key, 0) + 1
+        funnel.furthest_step = furthest
+        funnel.step_times = {step: moment.isoformat() for step, moment in times.items()}
+        funnel.saved_at = times.get(SAVED)
+        funnel.updated_at = timezone.now()
+
+    SessionFunnel.objects.bulk_create(to_create)
+    SessionFunnel.objects.bulk_update(to_update, ['furthest_step', 'step_times', 'saved_at', 'updated_at'])
+    add_counts(increments)
+
+
+def refresh_funnel(batch_size: int = 10000, session_chunk: int = 500, max_batches: int = None) -> int:
+    """
+    Recompute the funnel rows of sessions with messages past the watermark;
+    returns how many messages were consumed. Skips if another process holds
+    the watermark.
+    """
+    RollupWatermark.objects.get_or_create(name=WATERMARK)
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'ANALYTICS_ROLLUP_LAG', 5))
+    upper = ChatMessage.objects.filter(created_at__lt=cutoff).aggregate(upper=Max('id'))['upper'] or 0
+
+    processed = batches = 0
+    while max_batches is None or batches < max_batches:
+        with transaction.atomic():
+            mark = RollupWatermark.objects.select_for_update(skip_locked=True).filter(name=WATERMARK).first()
+            if mark is None or mark.last_id >= upper:
+                break
+            end = min(mark.last_id + batch_size, upper)
+            new_messages = ChatMessage.objects.filter(id__gt=mark.last_id, id__lte=end)
+            processed += new_messages.count()
+            touched = list(new_messages.values_list('session_id', flat=True).distinct().order_by())
+            for i in range(0, len(touched), session_chunk):
+                _refresh_sessions(touched[i:i + session_chunk])
+            mark.last_id = end
+            mark.save(update_fields=['last_id', 'updated_at'])
+        batches += 1
+    return processed
+
+
+def rebuild_funnel(batch_size: int = 50000) -> int:
+    """Recompute the funnel from the live messages; archived months are lost (see archive.py)."""
+    with transaction.atomic():
+        SessionFunnel.objects.all().delete()
+        AnalyticsRollup.objects.filter(dimension__in=['funnel_entered', 'funnel_saved']).delete()
+        RollupWatermark.objects.filter(name=WATERMARK).delete()
+        return refresh_funnel(batch_size=batch_size)
+
+
+class Median(Aggregate):
+    """Postgres ``percentile_cont(0.5)``; NULLs are ignored."""
+    function = 'PERCENTILE_CONT'
+    template = '%(function)s(0.5) WITHIN GROUP (ORDER BY %(expressions)s)'
+    output_field = FloatField()
+
+
+class SecondsBetween(Func):
+    """``end - start`` in seconds."""
+    template = 'EXTRACT(EPOCH FROM (%(expressions)s))'
+    arg_joiner = ' - '
+    output_field = FloatField()
+
+
+def funnel_report(since=None) -> list:
+    """
+    Per step: sessions that reached it (or any later step), conversion from
+    the previous step and from the start, and the median seconds it took
+    from the previous step. ``since`` limits it to sessions started after.
+    Two grouped queries; no SessionFunnel row is loaded into Python.
+    """
+    steps = funnel_steps()
+    funnels = SessionFunnel.objects.all()
+    if since is not None:
+        funnels = funnels.filter(started_at__gte=since)
+
+    # Sessions per furthest step, accumulated from the last step backwards
+    by_furthest = dict(
+        funnels.values('furthest_step').annotate(sessions=Count('id')).order_by().values_list('furthest_step', 'sessions')
+    )
+    reached, running = [0] * len(steps), 0
+    for index in reversed(range(len(steps))):
+        running += by_furthest.get(index, 0)
+        reached[index] = running
+
+    times = {f't{index}': Cast(KeyTextTransform(step, 'step_times'), DateTimeField()) for index, step in enumerate(steps)}
+    medians = funnels.annotate(**times).aggregate(**{
+        f'd{index}': Median(
+            SecondsBetween(F(f't{index}'), F(f't{index - 1}')),
+            filter=Q(**{f't{index}__gte': F(f't{index - 1}')}),
+        )
+        for index in range(1, len(steps))
+    })
+
+    report = []
+    for index, step in enumerate(steps):
+        previous = reached[index - 1] if index else reached[0]
+        median = medians.get(f'd{index}')
+        report.append({
+            'step': step,
+            'sessions': reached[index],
+            'conversion_from_previous': round(reached[index] / previous, 4) if previous else None,
+            'conversion_from_start': round(reached[index] / reached[0], 4) if reached[0] else None,
+            'median_seconds_from_previous': round(median, 1) if median is not None else None,
+        })
+    return report
+
+
+def save_rate_trend(days: int = 30) -> list:
+    """Daily sessions entering the funnel, how many of them saved, and the rate."""
+    since = timezone.localdate() - timedelta(days=days - 1)
+    rows = AnalyticsRollup.objects.filter(
+        dimension__in=['funnel_entered', 'funnel_saved'], value='', day__gte=since
+    ).values_list('day', 'dimension', 'count')
+    by_day = {}
+    for day, dimension, count in rows:
+        by_day.setdefault(day, {'entered': 0, 'saved': 0})[dimension.split('_', 1)[1]] = count
+    trend = []
+    for day in sorted(by_day):
+        entered, saved = by_day[day]['entered'], by_day[day]['saved']
+        trend.append({
+            'date': day.isoformat(),
+            'entered': entered,
+            'saved': saved,
+            'save_rate': round(saved / entered, 4) if entered else None,
+        })
+    return trend
@@ -0,0 +1,72 @@
+"""
+HyperLogLog distinct counter.
+
+With ``p`` index bits a sketch has m = 2**p one-byte registers and a
+relative standard error of about 1.04 / sqrt(m): p=12 (the default) means
+4096 registers and ~1.6% error (so ~3.3% at two standard deviations), at
+any cardinality. Sketches with the same ``p`` merge losslessly by taking
+the register-wise maximum, so daily sketches can be combined into weekly,
+monthly or yearly uniques. The merged result is the sketch of the union.
+"""
+import hashlib
+import math
+import zlib
+
+import numpy as np
+
+DEFAULT_PRECISION = 12
+
+
+def _hash64(item: str) -> int:
+    # blake2b rather than hash() so sketches built by different processes agree
+    return int.from_bytes(hashlib.blake2b(item.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+class HyperLogLog:
+    def __init__(self, p: int = DEFAULT_PRECISION, registers: np.ndarray = None):
+        if not 4 <= p <= 16:
+            raise ValueError("precision must be between 4 and 16")
+        self.p = p
+        self.m = 1 << p
+        self.registers = registers if registers is not None else np.zeros(self.m, dtype=np.uint8)
+
+    @staticmethod
+    def error_bound(p: int = DEFAULT_PRECISION) -> float:
+        """Relative standard error of the estimate."""
+        return 1.04 / math.sqrt(1 << p)
+
+    def add(self, item: str) -> None:
+        value = _hash64(item)
+        index = value >> (64 - self.p)
+        rest = value & ((1 << (64 - self.p)) - 1)
+        # Position of the leftmost 1-bit in the remaining 64-p bits
+        rank = (64 - self.p) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: 'HyperLogLog') -> 'HyperLogLog':
+        """Fold ``other`` into this sketch (in place) and return self."""
+        if other.p != self.p:
+            raise ValueError("cannot merge sketches of different precision")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self) -> int:
+        m = self.m
+        alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(m, 0.7213 / (1 + 1.079 / m))
+        estimate = alpha * m * m / float(np.sum(np.power(2.0, -self.registers.astype(np.float64))))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # Small range: linear counting is more accurate
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def to_bytes(self) -> bytes:
+        # Precision byte + zlib'd registers; sparse (low-count) sketches shrink a lot
+        return bytes([self.p]) + zlib.compress(self.registers.tobytes())
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'HyperLogLog':
+        data = bytes(data)
+        registers = np.frombuffer(zlib.decompress(data[1:]), dtype=np.uint8).copy()
+        return cls(p=data[0], registers=registers)
@@ -0,0 +1,332 @@
+"""
+Bulk import of products and panel specs from spreadsheets.
+
+Workbooks are opened in openpyxl's read-only mode and read row by row.
+Each sheet is recognised by its header row:
+
+• products - Name and Price columns (products.xlsx, the product sheet of
+  panel_specs_export.xlsx, or our own products export); upserted into
+  ``Product`` by name
+• product updates - a Name column and some other product columns but no
+  Price (e.g. the Panel Guides sheet of our guides export); updates those
+  columns on existing products by name. Unknown names are row errors
+• specs    - Model and Pixel Pitch columns (the Indoor / Outdoor / Rental
+  sheets of panel_specs_export.xlsx, or our specs export); upserted into
+  ``PanelSpec`` by (panel type, model). The type comes from a Type column
+  or else the sheet title
+
+Other sheets (e.g. the purpose guides) are reported as skipped.
+
+Rows are validated in chunks of ``chunk_rows``, in a process pool when
+``workers`` > 1, with at most two chunks per worker in flight. Each valid
+chunk is written with one ``bulk_create(update_conflicts=True)``; within a
+chunk the last row for a key wins. Invalid rows are reported by sheet and
+row number and do not stop the import. A price must be one amount
+(currency mark and thousands separators allowed); ranges and other text
+are errors rather than guesses. Only columns present in the sheet
+are updated on existing products, so a sheet without Guide Steps keeps
+the steps already stored, and products whose values did not change are
+left alone (``written`` counts the rest), so they keep their updated_at.
+"""
+import multiprocessing
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import openpyxl
+from django.db import connections, transaction
+from django.utils import timezone
+
+from . import product_matcher
+from .models import PanelSpec, Product
+
+MAX_REPORTED_ERRORS = 1000
+PANEL_TYPES = ('Indoor', 'Outdoor', 'Rental', 'Standee')
+
+# One amount: an optional currency mark, digits with optional thousands
+# separators (32,000 or 2,50,000) and decimals, and an optional "/-"
+PRICE_RE = re.compile(
+    r"^(?P<sign>-)?\s*(?:₹|rs\.?|inr|\$|€|£)?\s*(?P<amount>\d{1,3}(?:,\d{3})+|\d{1,2}(?:,\d{2})+,\d{3}|\d+)(?P<fraction>\.\d+)?\s*(?:/-)?$",
+    re.IGNORECASE,
+)
+
+# Header (lower case) -> Product field
+PRODUCT_HEADERS = {
+    'name': 'name',
+    'panel name': 'name',
+    'description': 'description',
+    'price': 'price',
+    'category': 'category',
+    'guide steps': 'guide_steps',
+}
+
+# Header (lower case) -> key in the views.py spec dictionaries; both the
+# shipped workbook's headers and those of the specs export
+SPEC_HEADERS = {
+    'type': 'type',
+    'model': 'model',
+    'pixel pitch': 'pixel_pitch',
+    'module resolution': 'module_resolutions',
+    'led type': 'led_types',
+    'brightness': 'brightness_options',
+    'module size': 'Dimensions',
+    'scan time': 'scan_times',
+    'driving mode': 'driving_modes',
+    'scan time / driving mode': 'scan_times',
+    'ip rating': 'ip_rating',
+    'price per sq.m': 'price_per_sq_meter',
+    'price per sq.meter': 'price_per_sq_meter',
+    'price per cabinet': 'price_per_cabinet',
+    'rental price per day': 'rental_price_per_day',
+    'rental price per week': 'rental_price_per_week',
+    'setup fee': 'setup_fee',
+    'durability': 'durability',
+    'availability': 'availability',
+}
+SPEC_LIST_KEYS = {'module_resolutions', 'led_types', 'brightness_options', 'Dimensions', 'scan_times', 'driving_modes'}
+
+
+def _text(value) -> str:
+    return '' if value is None else str(value).strip()
+
+
+def _split(value) -> list:
+    return [item.strip() for item in re.split(r"\n|,\s", _text(value)) if item.strip()]
+
+
+# ---------------------------
+# Validation (runs in pool processes: plain data in, plain data out)
+# ---------------------------
+def _parse_price(text: str) -> float:
+    """"₹32,000" -> 32000.0; ranges and other text are errors, never a guess."""
+    match = PRICE_RE.match(text)
+    if match is None:
+        if len(re.findall(r"\d+(?:[.,]\d+)*", text)) > 1:
+            raise ValueError(f"Price {text!r} is a range or has several numbers; give one price")
+        raise ValueError(f"Price {text!r} is not a number")
+    price = float(match.group('amount').replace(',', '') + (match.group('fraction') or ''))
+    return -price if match.group('sign') else price
+
+
+def _product_record(values: dict, partial: bool = False) -> dict:
+    name = _text(values.get('name'))
+    if not name:
+        raise ValueError("Name is required")
+    if len(name) > 200:
+        raise ValueError("Name is longer than 200 characters")
+    record = {'name': name}
+    price = values.get('price')
+    if _text(price) == '' and not partial:
+        raise ValueError("Price is required")
+    if _text(price) != '':
+        if not isinstance(price, (int, float)):
+            price = _parse_price(_text(price))
+        if price < 0:
+            raise ValueError("Price is negative")
+        record['price'] = float(price)
+    if 'description' in values:
+        record['description'] = _text(values['description'])
+    if 'category' in values:
+        category = _text(values['category'])
+        if len(category) > 100:
+            raise ValueError("Category is longer than 100 characters")
+        record['category'] = category or None
+    if 'guide_steps' in values:
+        record['guide_steps'] = [line.strip() for line in _text(values['guide_steps']).split('\n') if line.strip()]
+    return record
+
+
+def _spec_record(values: dict, default_type: str) -> tuple:
+    model = _text(values.get('model'))
+    if not model:
+        raise ValueError("Model is required")
+    if len(model) > 100:
+        raise ValueError("Model is longer than 100 characters")
+    panel_type = _text(values.get('type')).title() or default_type
+    if panel_type not in PANEL_TYPES:
+        raise ValueError(f"Unknown panel type {panel_type!r}; use one of {', '.join(PANEL_TYPES)}")
+    specs = {}
+    for key, value in values.items():
+        if key in ('type', 'model') or _text(value) == '':
+            continue
+        if key == 'scan_times' and panel_type == 'Outdoor' and 'driving_modes' not in values:
+            # The export's merged "Scan Time / Driving Mode" column: outdoor panels list driving modes
+            key = 'driving_modes'
+        specs[key] = _split(value) if key in SPEC_LIST_KEYS else _text(value)
+    return panel_type, model, specs
+
+
+def validate_chunk(kind: str, header: list, default_type: str, rows: list) -> tuple:
+    """
+    (records, errors) for [(row number, values)]; errors are (row number,
+    message). Product update records are (row number, record): whether the
+    name exists is only known when writing.
+    """
+    records, errors = [], []
+    for number, row in rows:
+        values = {key: value for key, value in zip(header, row) if key}
+        try:
+            if kind == 'products':
+                records.append(_product_record(values))
+            elif kind == 'product_updates':
+                records.append((number, _product_record(values, partial=True)))
+            else:
+                records.append(_spec_record(values, default_type))
+        except ValueError as e:
+            errors.append((number, str(e)))
+    return records, errors
+
+
+# ---------------------------
+# Writing
+# ---------------------------
+def _write_products(records: list, fields: list) -> int:
+    by_name = {record['name']: record for record in records}
+    compared = [field for field in fields if field != 'updated_at']
+    stored = {
+        row['name']: row for row in Product.objects.filter(name__in=list(by_name)).values('name', *compared)
+    }
+    # Skip rows that would not change anything, so they keep their updated_at
+    products = [
+        Product(**{'description': '', 'guide_steps': [], **record})
+        for name, record in by_name.items()
+        if name not in stored or any(stored[name][field] != record[field] for field in compared if field in record)
+    ]
+    if products:
+        with transaction.atomic():
+            Product.objects.bulk_create(products, update_conflicts=True, unique_fields=['name'], update_fields=fields)
+    return len(products)
+
+
+def _update_products(records: list, fields: list, dry_run: bool) -> tuple:
+    """(written, errors) for [(row number, record)] naming existing products."""
+    by_name = {record['name']: (number, record) for number, record in records}
+    compared = [field for field in fields if field != 'updated_at']
+    stored = {row['name']: row for row in Product.objects.filter(name__in=list(by_name)).values('id', 'name', *compared)}
+    errors = [(number, f"No product named {record['name']!r}") for number, record in records if record['name'] not in stored]
+    now = timezone.now()
+    products = [
+        # bulk_update does not fill auto_now fields
+        Product(id=stored[name]['id'], updated_at=now, **record)
+        for name, (_, record) in by_name.items()
+        if name in stored and any(stored[name][field] != record[field] for field in compared if field in record)
+    ]
+    if dry_run:
+        return 0, errors
+    if products:
+        with transaction.atomic():
+            Product.objects.bulk_update(products, fields)
+    return len(products), errors
+
+
+def _write_specs(records: list) -> int:
+    by_key = {(panel_type, model): specs for panel_type, model, specs in records}
+    specs = [PanelSpec(panel_type=panel_type, model=model, specs=data) for (panel_type, model), data in by_key.items()]
+    with transaction.atomic():
+        PanelSpec.objects.bulk_create(
+            specs, update_conflicts=True, unique_fields=['panel_type', 'model'], update_fields=['specs', 'updated_at'],
+        )
+    return len(specs)
+
+
+# ---------------------------
+# Entry point
+# ---------------------------
+def _sheet_kind(header: list, title: str) -> tuple:
+    """('products' | 'product_updates' | 'specs' | None, field header, default panel type)."""
+    names = [_text(cell).lower() for cell in header]
+    if 'model' in names and 'pixel pitch' in names:
+        default_type = next((panel_type for panel_type in PANEL_TYPES if panel_type.lower() in title.lower()), '')
+        return 'specs', [SPEC_HEADERS.get(name) for name in names], default_type
+    if 'name' in names or 'panel name' in names:
+        fields = [PRODUCT_HEADERS.get(name) for name in names]
+        if 'price' in names:
+            return 'products', fields, ''
+        if set(fields) - {None, 'name'}:
+            return 'product_updates', fields, ''
+    return None, [], ''
+
+
+def _chunks(rows, size: int):
+    chunk = []
+    for number, row in enumerate(rows, 2):
+        if all(cell is None or _text(cell) == '' for cell in row):
+            continue
+        chunk.append((number, row))
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _validated(chunks, kind: str, header: list, default_type: str, pool, workers: int):
+    """Validation results in chunk order; at most two chunks per worker in flight."""
+    if pool is None:
+        for chunk in chunks:
+            yield validate_chunk(kind, header, default_type, chunk)
+        return
+    pending = deque()
+    for chunk in chunks:
+        pending.append(pool.submit(validate_chunk, kind, header, default_type, chunk))
+        if len(pending) >= 2 * workers:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def import_workbook(file, workers: int = 1, chunk_rows: int = 1000, dry_run: bool = False) -> dict:
+    """
+    Import every recognised sheet of ``file`` (path or binary file object).
+    Returns {'sheets': [{sheet, kind, rows, valid, written, errors}], 'errors':
+    [{sheet, row, error}] (first MAX_REPORTED_ERRORS), 'error_count'}.
+    """
+    report = {'sheets': [], 'errors': [], 'error_count': 0, 'dry_run': dry_run}
+    workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    pool = None
+    if workers > 1:
+        # Forked workers only validate; they must not share the parent's DB sockets
+        connections.close_all()
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork'))
+    products_changed = False
+    try:
+        for ws in workbook.worksheets:
+            rows = ws.iter_rows(values_only=True)
+            header = next(rows, None) or []
+            kind, fields, default_type = _sheet_kind(header, ws.title)
+            summary = {'sheet': ws.title, 'kind': kind or 'skipped', 'rows': 0, 'valid': 0, 'written': 0, 'errors': 0}
+            report['sheets'].append(summary)
+            if kind is None:
+                continue
+            # auto_now only fills updated_at; listing it here bumps it on updated rows too
+            update_fields = sorted({field for field in fields if field and field != 'name'} | {'updated_at'})
+            for records, errors in _validated(_chunks(rows, chunk_rows), kind, fields, default_type, pool, workers):
+                summary['rows'] += len(records) + len(errors)
+                if kind == 'product_updates' and records:
+                    # Looked up even on a dry run: unknown names are only found against the table
+                    written, unknown = _update_products(records, update_fields, dry_run)
+                    summary['written'] += written
+                    products_changed = products_changed or written > 0
+                    summary['valid'] -= len(unknown)
+                    errors = sorted(errors + unknown)
+                summary['valid'] += len(records)
+                summary['errors'] += len(errors)
+                report['error_count'] += len(errors)
+                for number, message in errors:
+                    if len(report['errors']) < MAX_REPORTED_ERRORS:
+                        report['errors'].append({'sheet': ws.title, 'row': number, 'error': message})
+                if not records or dry_run or kind == 'product_updates':
+                    continue
+                if kind == 'products':
+                    summary['written'] += _write_products(records, update_fields)
+                    products_changed = True
+                else:
+                    summary['written'] += _write_specs(records)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        workbook.close()
+    if products_changed:
+        # bulk_create sends no post_save: refresh what the Product signals would have
+        product_matcher.invalidate()
+    return report
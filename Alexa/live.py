@@ -0,0 +1,265 @@
+"""
+Live analytics feed over server-sent events.
+
+The chat path calls ``publish()`` once per turn. Deltas are added to the
+open frame of the in-process ``EventBus``; about once a second the frame
+is sealed and numbered, so a dashboard receives one coalesced ``delta``
+event per second however busy the chat is::
+
+    {"sessions": 2, "intents": {"greeting": 2, ...}, "panels": {"P3mm": 1}, "saves": 0}
+
+The bus only sees turns handled by this worker. Every
+``settings.LIVE_SNAPSHOT_INTERVAL`` seconds (and on connect) each stream
+also gets a ``snapshot`` event built from the rollups, unique sketches and
+trending summaries, which cover all workers; dashboards replace their
+totals with it and apply deltas on top. The snapshot is computed once per
+interval and shared by every open stream, so the database sees one set
+of small queries a minute however many dashboards are open.
+
+A snapshot carries the id of the last frame it includes: building one
+seals the open frame first, so deltas a dashboard receives after a
+snapshot are never already counted in it.
+
+Streams end after ``LIVE_MAX_STREAM_SECONDS`` (EventSource reconnects on
+its own). A reconnect's ``Last-Event-ID`` resumes from the retained frames,
+or falls back to a snapshot when it is too far behind.
+
+Serve dashboards from the ASGI application (e.g. ``uvicorn
+myassistant.asgi:application``): there an open stream is an idle coroutine.
+Under WSGI every stream holds a worker thread for up to
+LIVE_MAX_STREAM_SECONDS, so only ``LIVE_MAX_WSGI_STREAMS`` are allowed per
+process and further ones get a 503.
+"""
+import json
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.utils import timezone
+
+from .models import AnalyticsRollup, ChatLog
+from .rollups import catch_up, top_values
+from .trending import trending
+from .uniques import count_uniques
+
+
+def _empty_delta() -> dict:
+    return {'sessions': 0, 'intents': {}, 'panels': {}, 'saves': 0}
+
+
+def build_snapshot() -> dict:
+    """Totals for the dashboard, from the shared (all-worker) aggregates."""
+    catch_up(max_batches=getattr(settings, 'ANALYTICS_ROLLUP_MAX_BATCHES', 1))
+    today = timezone.localdate()
+    start_of_day = timezone.make_aware(datetime.combine(today, datetime.min.time()))
+    sessions_today = (
+        AnalyticsRollup.objects.filter(day=today, dimension='sessions', value='')
+        .values_list('count', flat=True).first() or 0
+    )
+    return {
+        'generated_at': timezone.now(),
+        'today': {
+            'sessions': sessions_today,
+            'unique_visitors': count_uniques('visitors', today),
+            'saves': ChatLog.objects.filter(intent='save_configuration', created_at__gte=start_of_day).count(),
+        },
+        'top_panels': [{'panel': item['value'], 'count': item['count']} for item in top_values('panel')],
+        'common_purposes': [{'purpose': item['value'], 'count': item['count']} for item in top_values('purpose')],
+        'trending': trending(['5m'], limit=5)['5m'],
+    }
+
+
+class EventBus:
+    def __init__(self, history: int = 300):
+        self._lock = threading.Lock()
+        self._open = _empty_delta()
+        self._open_since = None
+        self._frames = deque(maxlen=history)   # (seq, delta), oldest first
+        self._seq = 0
+        self._snapshot_lock = threading.Lock()
+        self._snapshot = None
+        self._snapshot_seq = 0
+        self._snapshot_at = 0.0
+
+    def publish(self, new_session: bool = False, intent: str = None, panel: str = None, saved: bool = False) -> None:
+        with self._lock:
+            delta = self._open
+            if new_session:
+                delta['sessions'] += 1
+            if intent:
+                delta['intents'][intent] = delta['intents'].get(intent, 0) + 1
+            if panel:
+                delta['panels'][panel] = delta['panels'].get(panel, 0) + 1
+            if saved:
+                delta['saves'] += 1
+            if self._open_since is None:
+                self._open_since = time.monotonic()
+
+    def _seal(self) -> None:
+        # Caller holds self._lock
+        if self._open_since is not None:
+            self._seq += 1
+            self._frames.append((self._seq, self._open))
+            self._open, self._open_since = _empty_delta(), None
+
+    def seal(self) -> int:
+        """Close the open frame now (whatever its age); returns the latest seq."""
+        with self._lock:
+            self._seal()
+            return self._seq
+
+    def frames_after(self, cursor: int):
+        """
+        (frames newer than ``cursor``, latest seq). Frames is None when
+        ``cursor`` is older than anything retained or newer than this
+        worker's latest (the caller resyncs).
+        """
+        frame_seconds = getattr(settings, 'LIVE_FRAME_SECONDS', 1)
+        with self._lock:
+            if self._open_since is not None and time.monotonic() - self._open_since >= frame_seconds:
+                self._seal()
+            # Ahead of us (another worker's ids, or a restart) or beyond the history
+            if cursor > self._seq or (cursor < self._seq and self._frames[0][0] > cursor + 1):
+                return None, self._seq
+            return [frame for frame in self._frames if frame[0] > cursor], self._seq
+
+    def snapshot(self) -> tuple:
+        """
+        (``build_snapshot()``, seq of the last frame it covers), recomputed at
+        most once per LIVE_SNAPSHOT_INTERVAL for all streams.
+        """
+        interval = getattr(settings, 'LIVE_SNAPSHOT_INTERVAL', 60)
+        with self._snapshot_lock:
+            if self._snapshot is None or time.monotonic() - self._snapshot_at >= interval:
+                # Turns published so far are in the tables the snapshot reads
+                seq = self.seal()
+                try:
+                    self._snapshot = build_snapshot()
+                finally:
+                    # Streams outlive their request; don't pin a connection per stream thread
+                    connection.close()
+                self._snapshot_seq = seq
+                self._snapshot_at = time.monotonic()
+            return self._snapshot, self._snapshot_seq
+
+
+BUS = EventBus()
+
+
+def publish(**delta) -> None:
+    BUS.publish(**delta)
+
+
+def _event(name: str, seq: int, data: dict) -> str:
+    return f"event: {name}\nid: {seq}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n"
+
+
+class Subscription:
+    """Per-stream cursor; ``poll()`` returns the text to send now ('' if nothing)."""
+
+    def __init__(self, bus: EventBus, last_event_id: str = None):
+        self.bus = bus
+        self.started = False
+        self.last_write = time.monotonic()
+        try:
+            self.cursor = int(last_event_id)
+            # Reconnect: resume from the retained frames; snapshot on schedule
+            self.next_snapshot = self.last_write + getattr(settings, 'LIVE_SNAPSHOT_INTERVAL', 60)
+        except (TypeError, ValueError):
+            self.cursor = None
+            self.next_snapshot = 0.0
+
+    def snapshot_due(self) -> bool:
+        return time.monotonic() >= self.next_snapshot
+
+    def poll(self, snapshot: tuple = None) -> str:
+        """``snapshot`` is ``EventBus.snapshot()``'s (data, seq) when one is due."""
+        now = time.monotonic()
+        chunks = []
+        if not self.started:
+            chunks.append(f"retry: {getattr(settings, 'LIVE_RETRY_MS', 3000)}\n\n")
+            self.started = True
+        if snapshot is not None:
+            data, self.cursor = snapshot
+            chunks.append(_event('snapshot', self.cursor, data))
+            self.next_snapshot = now + getattr(settings, 'LIVE_SNAPSHOT_INTERVAL', 60)
+        # Frames newer than the snapshot (or the last delta) follow straight away
+        frames, seq = self.bus.frames_after(self.cursor)
+        if frames is None:
+            self.next_snapshot = 0.0   # too far behind: resync on the next poll
+        else:
+            chunks.extend(_event('delta', frame_seq, delta) for frame_seq, delta in frames)
+            self.cursor = seq
+        if not chunks and now - self.last_write >= getattr(settings, 'LIVE_HEARTBEAT_SECONDS', 15):
+            chunks.append(": keepalive\n\n")
+        if chunks:
+            self.last_write = now
+        return ''.join(chunks)
+
+
+_wsgi_streams = 0
+_wsgi_lock = threading.Lock()
+
+
+class WsgiStream:
+    """
+    ``stream()`` holding one of the LIVE_MAX_WSGI_STREAMS slots until the
+    response is closed (Django calls ``close()`` even if it never started).
+    """
+
+    def __init__(self, last_event_id: str = None):
+        self.last_event_id = last_event_id
+        self.released = False
+
+    @classmethod
+    def open(cls, last_event_id: str = None):
+        """A stream, or None when this process already serves LIVE_MAX_WSGI_STREAMS."""
+        global _wsgi_streams
+        with _wsgi_lock:
+            if _wsgi_streams >= getattr(settings, 'LIVE_MAX_WSGI_STREAMS', 4):
+                return None
+            _wsgi_streams += 1
+        return cls(last_event_id)
+
+    def __iter__(self):
+        return stream(self.last_event_id)
+
+    def close(self) -> None:
+        global _wsgi_streams
+        with _wsgi_lock:
+            if not self.released:
+                self.released = True
+                _wsgi_streams -= 1
+
+
+def stream(last_event_id: str = None):
+    """Blocking event stream (WSGI): holds a worker thread per open dashboard."""
+    subscription = Subscription(BUS, last_event_id)
+    deadline = time.monotonic() + getattr(settings, 'LIVE_MAX_STREAM_SECONDS', 1800)
+    frame_seconds = getattr(settings, 'LIVE_FRAME_SECONDS', 1)
+    while time.monotonic() < deadline:
+        chunk = subscription.poll(BUS.snapshot() if subscription.snapshot_due() else None)
+        if chunk:
+            yield chunk
+        time.sleep(frame_seconds)
+
+
+async def astream(last_event_id: str = None):
+    """Same stream for ASGI servers: an idle coroutine instead of a thread per dashboard."""
+    import asyncio
+
+    from asgiref.sync import sync_to_async
+
+    subscription = Subscription(BUS, last_event_id)
+    deadline = time.monotonic() + getattr(settings, 'LIVE_MAX_STREAM_SECONDS', 1800)
+    frame_seconds = getattr(settings, 'LIVE_FRAME_SECONDS', 1)
+    while time.monotonic() < deadline:
+        snapshot = await sync_to_async(BUS.snapshot)() if subscription.snapshot_due() else None
+        chunk = subscription.poll(snapshot)
+        if chunk:
+            yield chunk
+        await asyncio.sleep(frame_seconds)
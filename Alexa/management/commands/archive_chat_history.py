@@ -0,0 +1,41 @@
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from Alexa.archive import ARCHIVED_MODELS, archive_month, ensure_future_partitions, months_to_archive
+
+
+def months_back(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 - count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+class Command(BaseCommand):
+    help = 'Archive chat messages/logs older than the retention window to gzip JSONL and drop them (run from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep-months', type=int, default=getattr(settings, 'CHAT_RETENTION_MONTHS', 12),
+                            help="Whole months to keep besides the current one")
+        parser.add_argument('--archive-dir', default=str(getattr(settings, 'CHAT_ARCHIVE_DIR', 'chat_archive')))
+        parser.add_argument('--months-ahead', type=int, default=3, help="Future monthly partitions to keep created")
+        parser.add_argument('--chunk-size', type=int, default=5000, help="Rows fetched per round trip while archiving")
+        parser.add_argument('--dry-run', action='store_true', help="List what would be archived")
+
+    def handle(self, *args, **options):
+        cutoff = months_back(date.today().replace(day=1), options['keep_months'])
+
+        if not options['dry_run']:
+            for name in ensure_future_partitions(options['months_ahead']):
+                self.stdout.write(f"Created partition {name}")
+
+        for table in ARCHIVED_MODELS:
+            for month in months_to_archive(table, cutoff):
+                if options['dry_run']:
+                    self.stdout.write(f"Would archive {table} {month:%Y-%m}")
+                    continue
+                path, count = archive_month(table, month, options['archive_dir'], chunk_size=options['chunk_size'])
+                if path:
+                    self.stdout.write(self.style.SUCCESS(f"Archived {count} rows of {table} {month:%Y-%m} to {path}"))
+                else:
+                    self.stdout.write(f"Dropped empty {table} {month:%Y-%m}")
@@ -0,0 +1,74 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from Alexa.backends import get_model_backend
+from Alexa.retrieval import get_retriever
+
+DEFAULT_QUERIES = [
+    "what is pixel pitch",
+    "how often should I clean the panels",
+    "which controller works with P3.91mm panels",
+    "how do I install an outdoor stage screen",
+    "what brightness do I need for a mall",
+    "does the novastar MRV336 receiving card support P2.5mm",
+    "warranty on power supplies",
+    "how to calibrate colour for a studio",
+]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the AI knowledgebase fallback: retrieval and answer latency, throughput'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backend', help="Model backend to use (default: settings.CHATBOT_MODEL_BACKEND)")
+        parser.add_argument('--queries', help="File with one query per line (default: built-in sample)")
+        parser.add_argument('--iterations', type=int, default=5, help="Passes over the query set")
+        parser.add_argument('--k', type=int, default=3, help="Chunks retrieved per query")
+
+    def handle(self, *args, **options):
+        if options['queries']:
+            with open(options['queries'], encoding='utf-8') as f:
+                queries = [line.strip() for line in f if line.strip()]
+        else:
+            queries = DEFAULT_QUERIES
+
+        started = time.perf_counter()
+        backend = get_model_backend(options['backend'])
+        retriever = get_retriever(backend)
+        self.stdout.write(f"Backend: {backend.name} (setup {self._ms(time.perf_counter() - started)})")
+
+        retrieval, answer, total = [], [], []
+        stages = {'lexical_ms': [], 'vector_ms': [], 'fusion_ms': []}
+        passes = []
+        started = time.perf_counter()
+        for _ in range(options['iterations']):
+            pass_started = time.perf_counter()
+            for query in queries:
+                t0 = time.perf_counter()
+                result = retriever.retrieve(query, k=options['k'])
+                t1 = time.perf_counter()
+                backend.answer(query, result.documents)
+                t2 = time.perf_counter()
+                retrieval.append(t1 - t0)
+                answer.append(t2 - t1)
+                total.append(t2 - t0)
+                for stage in stages:
+                    stages[stage].append(result.timings[stage] / 1000)
+            passes.append(time.perf_counter() - pass_started)
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(f"Queries: {len(total)} ({len(queries)} x {options['iterations']})")
+        rows = [(stage[:-3], samples) for stage, samples in stages.items()]
+        rows += [('retrieval', retrieval), ('answer', answer), ('total', total)]
+        for label, samples in rows:
+            p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+            self.stdout.write(f"  {label:<10} p50 {self._ms(p50)}  p95 {self._ms(p95)}  p99 {self._ms(p99)}")
+        if len(passes) > 1:
+            warm = sum(passes[1:]) / len(passes[1:])
+            self.stdout.write(f"  cold pass {self._ms(passes[0])}, warm pass avg {self._ms(warm)}")
+        self.stdout.write(self.style.SUCCESS(f"Throughput: {len(total) / elapsed:.1f} queries/s"))
+
+    def _ms(self, seconds):
+        return f"{seconds * 1000:.2f}ms"
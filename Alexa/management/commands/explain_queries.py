@@ -0,0 +1,172 @@
+import random
+import uuid
+from datetime import timedelta
+from importlib import import_module
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count, Min
+from django.db.models.functions import Trunc, TruncDate
+from django.utils import timezone
+
+from Alexa.models import ChatLog, ChatMessage, ChatSession
+from Alexa.views import window_messages_count
+
+SEED_PREFIX = 'explain-'
+INTENTS = ['greeting', 'panel_category', 'panel_selection', 'size_input', 'purpose_input', 'quantity_input', 'knowledge', 'price']
+PANELS = ['P1.25mm', 'P2.5mm', 'P3mm', 'P3.91mm', 'P4.81mm', 'P6mm', 'P10mm', None]
+PURPOSES = ['mall', 'church', 'studio', 'retail', 'temple', 'event hall', None]
+
+
+def index_names():
+    """Indexes added by 0016_chat_analytics_indexes."""
+    names = [index.name for model in (ChatSession, ChatMessage, ChatLog) for index in model._meta.indexes]
+    migration = import_module('Alexa.migrations.0016_chat_analytics_indexes')
+    return names + [name for name, _ in migration.BRIN_INDEXES]
+
+
+def access_patterns():
+    """(name, queryset) for each query the views, admin and analytics jobs run."""
+    now = timezone.now()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    month = today.replace(day=1)
+    week = now - timedelta(days=7)
+    page = list(ChatSession.objects.filter(created_at__gte=month).order_by('-created_at', '-id').values_list('id', flat=True)[:51])
+    last_log = ChatLog.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+    return [
+        ('ChatDataAPIView: session page + messages_count', ChatSession.objects.filter(created_at__gte=month)
+            .annotate(messages_count=window_messages_count(month))
+            .order_by('-created_at', '-id')[:51]),
+        ('ChatDataAPIView: messages prefetch', ChatMessage.objects.filter(session_id__in=page, created_at__gte=month)
+            .order_by('created_at', 'id')),
+        ('ChatDataAPIView: total_sessions', ChatSession.objects.filter(created_at__gte=month).values('id')),
+        ('AnalyticsAPIView rollups: ChatLog batch', ChatLog.objects.filter(id__gt=last_log - 10000, id__lte=last_log)
+            .exclude(selected_panel__isnull=True).annotate(day=TruncDate('created_at'))
+            .values('day', 'selected_panel').annotate(n=Count('id')).order_by()),
+        ('Rollups: settled upper bound', ChatLog.objects.filter(created_at__lt=now - timedelta(seconds=5))
+            .order_by('-id').values('id')[:1]),
+        ('Time series: messages per hour (48h)', ChatMessage.objects.filter(created_at__gte=now - timedelta(hours=48), created_at__lt=now)
+            .annotate(bucket=Trunc('created_at', 'hour')).values('bucket').annotate(count=Count('id')).order_by()),
+        ('Time series: panels per day (30d)', ChatLog.objects.filter(created_at__gte=now - timedelta(days=30), created_at__lt=now)
+            .exclude(selected_panel__isnull=True).annotate(bucket=Trunc('created_at', 'day'))
+            .values('bucket', 'selected_panel').annotate(count=Count('id')).order_by()),
+        ('Funnel: first time each intent was reached', ChatMessage.objects.filter(session_id__in=page)
+            .values('session_id', 'intent').annotate(first=Min('created_at')).order_by()),
+        ('Funnel: saves in a week', ChatLog.objects.filter(intent='save_configuration', created_at__gte=week).values('session_id')),
+        ('Admin ChatLog: panel filter choices', ChatLog.objects.values_list('selected_panel', flat=True).distinct().order_by('selected_panel')),
+        ('Admin ChatLog: purpose filter', ChatLog.objects.filter(purpose='church').order_by('-id')[:100]),
+        ('Admin ChatLog: today', ChatLog.objects.filter(created_at__gte=today).order_by('-id')[:100]),
+        ('Admin ChatMessage: intent this week', ChatMessage.objects.filter(intent='price', created_at__gte=week).order_by('-id')[:100]),
+        ('Transcript export: one day', ChatMessage.objects.filter(created_at__gte=today - timedelta(days=1), created_at__lt=today)
+            .order_by('created_at', 'id')),
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Capture EXPLAIN ANALYZE for the chat/analytics queries; with --drop, also without the 0016 indexes (Postgres)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0, help="Generate this many sessions (~10 messages, ~4 logs each) first")
+        parser.add_argument('--days', type=int, default=365, help="Spread seeded sessions over this many days")
+        parser.add_argument('--cleanup', action='store_true', help="Delete the seeded sessions and exit")
+        parser.add_argument('--drop', action='store_true',
+                            help="Also capture plans without the 0016 indexes (DROP INDEX in a rolled-back transaction)")
+        parser.add_argument('--output', '-o', default='explain_report.txt', help="Where to write the full plans")
+        parser.add_argument('--i-know-this-is-not-production', action='store_true', dest='not_production',
+                            help="Required for --seed and --drop: they write to the chat tables or lock them")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("EXPLAIN ANALYZE capture needs Postgres")
+
+        if (options['seed'] or options['drop']) and not options['not_production']:
+            # --seed inserts synthetic sessions into the live tables; --drop holds
+            # ACCESS EXCLUSIVE locks on them for the whole capture
+            raise CommandError(
+                "--seed and --drop write to or lock the chat tables; run them against a copy "
+                "and pass --i-know-this-is-not-production"
+            )
+        if options['cleanup']:
+            deleted, _ = ChatSession.objects.filter(session_id__startswith=SEED_PREFIX).delete()
+            self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} seeded rows"))
+            return
+        if options['seed']:
+            self.seed(options['seed'], options['days'])
+
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE "Alexa_chatsession", "Alexa_chatmessage", "Alexa_chatlog"')
+
+        after = self.capture(drop_indexes=False)
+        if not options['drop']:
+            with open(options['output'], 'w', encoding='utf-8') as report:
+                for name, plan in after.items():
+                    report.write(f"=== {name}\n{plan}\n\n")
+                    self.stdout.write(f"{name}: {self.execution_time(plan)}")
+            self.stdout.write(self.style.SUCCESS(f"Full plans written to {options['output']}"))
+            return
+        before = self.capture(drop_indexes=True)
+
+        with open(options['output'], 'w', encoding='utf-8') as report:
+            for name, plan_before in before.items():
+                report.write(f"=== {name}\n--- before\n{plan_before}\n--- after\n{after[name]}\n\n")
+                self.stdout.write(f"{name}: {self.execution_time(plan_before)} -> {self.execution_time(after[name])}")
+        self.stdout.write(self.style.SUCCESS(f"Full plans written to {options['output']}"))
+
+    def capture(self, drop_indexes: bool) -> dict:
+        plans = {}
+        with transaction.atomic():
+            if drop_indexes:
+                # DDL is transactional in Postgres: dropped only for this capture
+                with connection.cursor() as cursor:
+                    # Give up rather than queue behind (and block) live traffic
+                    cursor.execute("SET LOCAL lock_timeout = '2s'")
+                    for name in index_names():
+                        cursor.execute(f'DROP INDEX IF EXISTS {name}')
+            for name, queryset in access_patterns():
+                plans[name] = queryset.explain(analyze=True, buffers=True)
+            transaction.set_rollback(True)
+        return plans
+
+    def execution_time(self, plan: str) -> str:
+        for line in plan.splitlines():
+            if line.startswith('Execution Time'):
+                return line.split(':', 1)[1].strip()
+        return '?'
+
+    def seed(self, sessions: int, days: int, batch: int = 2000):
+        now = timezone.now()
+        span = days * 86400
+        self.stdout.write(f"Seeding {sessions} sessions...")
+        for offset in range(0, sessions, batch):
+            count = min(batch, sessions - offset)
+            # Oldest first so created_at follows insertion order, like production
+            starts = sorted(now - timedelta(seconds=span * (1 - (offset + i) / sessions)) for i in range(count))
+            created = ChatSession.objects.bulk_create([
+                ChatSession(session_id=f"{SEED_PREFIX}{uuid.uuid4()}", created_at=start) for start in starts
+            ])
+            messages, logs = [], []
+            for session in created:
+                for n in range(random.randint(4, 16)):
+                    messages.append(ChatMessage(
+                        session=session, sender='bot' if n % 2 else 'user', message='seed',
+                        intent=random.choice(INTENTS),
+                    ))
+                for _ in range(random.randint(1, 6)):
+                    logs.append(ChatLog(
+                        session=session, intent=random.choice(INTENTS + ['save_configuration']), message='seed',
+                        selected_panel=random.choice(PANELS), purpose=random.choice(PURPOSES),
+                    ))
+            ChatMessage.objects.bulk_create(messages)
+            ChatLog.objects.bulk_create(logs)
+
+            # auto_now_add fields: backdate to the session start in one statement each
+            ids = [session.id for session in created]
+            with connection.cursor() as cursor:
+                for table in ('"Alexa_chatmessage"', '"Alexa_chatlog"'):
+                    cursor.execute(
+                        f'UPDATE {table} t SET created_at = s.created_at + (t.id %% 600) * interval \'1 second\' '
+                        f'FROM "Alexa_chatsession" s WHERE t.session_id = s.id AND s.id = ANY(%s)',
+                        [ids],
+                    )
+        self.stdout.write(self.style.SUCCESS(f"Seeded {sessions} sessions"))
@@ -0,0 +1,43 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Alexa.exports import DATASETS, FORMAT_ALIASES, FORMATS, Export
+
+
+class Command(BaseCommand):
+    help = 'Export a dataset (products, product_changes, specs, guides, transcripts, leads) as XLSX, CSV, JSONL or columnar'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=list(DATASETS))
+        parser.add_argument('--format', choices=list(FORMATS) + list(FORMAT_ALIASES), default='xlsx')
+        parser.add_argument('--start', help="First day/timestamp to include (transcripts, leads)")
+        parser.add_argument('--end', help="Last day to include, or an exclusive timestamp (transcripts, leads)")
+        parser.add_argument('--since', help="product_changes: watermark printed by the previous run (omit for a full sync, "
+                                                  "needed once it is older than PRODUCT_TOMBSTONE_RETENTION_DAYS)")
+        parser.add_argument('--until', help="product_changes: upper bound (default: a few seconds ago)")
+        parser.add_argument('--gzip', action='store_true', help="gzip-compress the output (csv, jsonl)")
+        parser.add_argument('--output', '-o', help="Output file, or - for stdout (default: the export's file name)")
+
+    def handle(self, *args, **options):
+        try:
+            export = Export.from_params(options['dataset'], options, default_format='xlsx')
+        except ValueError as e:
+            raise CommandError(str(e))
+        write_export(self, export, options['output'])
+        if export.dataset.watermark:
+            # stderr, so it stays out of the data when writing to stdout
+            self.stderr.write(f"Next --since: {export.filters['until'].isoformat()}")
+
+
+def write_export(command: BaseCommand, export: Export, output: str = None) -> int:
+    """Write ``export`` to ``output`` (a path, or '-' for stdout); shared by the export commands."""
+    if output == '-':
+        written = export.write_to(sys.stdout.buffer)
+        sys.stdout.buffer.flush()
+        return written
+    path = output or export.filename
+    with open(path, 'wb') as out:
+        written = export.write_to(out)
+    command.stdout.write(command.style.SUCCESS(f"Wrote {written} bytes to {path}"))
+    return written
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from Alexa.exports import Export
+
+from .export_data import write_export
+
+
+class Command(BaseCommand):
+    help = 'Stream chat transcripts (one row per message) for a date range to NDJSON or CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help="First day/timestamp to include (default: 7 days before --end)")
+        parser.add_argument('--end', help="Last day to include, or an exclusive timestamp (default: now)")
+        parser.add_argument('--format', choices=['ndjson', 'csv'], default='ndjson')
+        parser.add_argument('--gzip', action='store_true', help="gzip-compress the output")
+        parser.add_argument('--output', '-o', default='-', help="Output file (default: stdout)")
+
+    def handle(self, *args, **options):
+        # Same export as `manage.py export_data transcripts`
+        try:
+            export = Export.from_params('transcripts', options, default_format='jsonl')
+        except ValueError as e:
+            raise CommandError(str(e))
+        write_export(self, export, options['output'])
@@ -0,0 +1,46 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Alexa.imports import import_workbook
+
+
+class Command(BaseCommand):
+    help = 'Upsert products and panel specs from XLSX workbooks (e.g. products.xlsx, panel_specs_export.xlsx)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help="Workbook files")
+        parser.add_argument('--workers', type=int, default=1,
+                            help="Processes validating rows in parallel (1 = inline; reading the XLSX usually dominates)")
+        parser.add_argument('--chunk-rows', type=int, default=1000, help="Rows per validation chunk and write batch")
+        parser.add_argument('--dry-run', action='store_true', help="Validate and report without writing")
+        parser.add_argument('--max-errors', type=int, default=50, help="Row errors to print per workbook")
+
+    def handle(self, *args, **options):
+        failed = False
+        for path in options['paths']:
+            if not os.path.exists(path):
+                raise CommandError(f"No such file: {path}")
+            start = time.perf_counter()
+            report = import_workbook(path, workers=options['workers'], chunk_rows=options['chunk_rows'],
+                                     dry_run=options['dry_run'])
+            elapsed = time.perf_counter() - start
+            self.stdout.write(f"{path} ({elapsed:.2f}s{', dry run' if options['dry_run'] else ''}):")
+            for sheet in report['sheets']:
+                if sheet['kind'] == 'skipped':
+                    self.stdout.write(f"  {sheet['sheet']}: skipped (not a product or spec sheet)")
+                    continue
+                self.stdout.write(
+                    f"  {sheet['sheet']} [{sheet['kind']}]: {sheet['rows']} rows, {sheet['valid']} valid, "
+                    f"{sheet['written']} written, {sheet['errors']} errors"
+                )
+            for error in report['errors'][:options['max_errors']]:
+                self.stdout.write(self.style.WARNING(f"  {error['sheet']} row {error['row']}: {error['error']}"))
+            if report['error_count'] > options['max_errors']:
+                self.stdout.write(self.style.WARNING(f"  ... {report['error_count'] - options['max_errors']} more errors"))
+            failed = failed or bool(report['error_count'])
+        if failed:
+            self.stdout.write(self.style.WARNING("Imported with row errors (those rows were skipped)"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Validated" if options['dry_run'] else "Imported"))
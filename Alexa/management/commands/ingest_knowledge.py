@@ -0,0 +1,121 @@
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+
+from Alexa.backends import get_model_backend, get_vector_store
+from Alexa.models import KnowledgeBase, Product
+from Alexa.views import PURPOSE_RECOMMENDATIONS
+
+
+def collect_documents():
+    """Yield (source, source_id, text) for everything the knowledgebase should know."""
+    for entry in KnowledgeBase.objects.order_by('id').iterator():
+        yield 'kb', str(entry.id), f"Q: {entry.question}\nA: {entry.answer}"
+
+    for product in Product.objects.order_by('id').only('id', 'name', 'guide_steps').iterator():
+        if product.guide_steps:
+            steps = "\n".join(f"{i}. {step}" for i, step in enumerate(product.guide_steps, 1))
+            yield 'product', str(product.id), f"{product.name} setup guide:\n{steps}"
+
+    for purpose, recs in PURPOSE_RECOMMENDATIONS.items():
+        if purpose == 'default':
+            continue
+        lines = [
+            f"Guide for {purpose.title()}:",
+            f"Recommended panel type: {recs.get('panel_recommendation', '')}",
+            f"Brightness requirement: {recs.get('estimated_brightness', '')}",
+        ]
+        lines += [f"Consideration: {tip}" for tip in recs.get('tips', [])]
+        if recs.get('additional_accessories'):
+            lines.append(f"Recommended accessories: {', '.join(recs['additional_accessories'])}")
+        lines += [step for step in recs.get('setup_steps', [])]
+        yield 'purpose', purpose, "\n".join(lines)
+
+
+def chunk_text(text: str, max_chars: int) -> list:
+    """Split on line boundaries into chunks of at most ~max_chars."""
+    chunks, current = [], ''
+    for line in text.splitlines():
+        if current and len(current) + len(line) + 1 > max_chars:
+            chunks.append(current)
+            current = ''
+        current = f"{current}\n{line}" if current else line
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class Command(BaseCommand):
+    help = 'Build or incrementally refresh the kb_vectors knowledgebase (only new/changed chunks are embedded)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backend', help="Model backend to embed with (default: settings.CHATBOT_MODEL_BACKEND)")
+        parser.add_argument('--batch-size', type=int, default=64, help="Chunks per embedding call")
+        parser.add_argument('--workers', type=int, default=4, help="Embedding calls in flight")
+        parser.add_argument('--chunk-chars', type=int, default=800, help="Maximum chunk size in characters")
+        parser.add_argument('--full', action='store_true', help="Re-embed every chunk, not only changed ones")
+        parser.add_argument('--dry-run', action='store_true', help="Report what would change without writing")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        backend = get_model_backend(options['backend'])
+        collection = get_vector_store(backend)._collection
+
+        chunks = {}
+        for source, source_id, text in collect_documents():
+            for n, chunk in enumerate(chunk_text(text, options['chunk_chars'])):
+                chunks[f"{source}:{source_id}:{n}"] = {
+                    'document': chunk,
+                    'metadata': {
+                        'source': source,
+                        'source_id': source_id,
+                        'content_hash': hashlib.sha256(chunk.encode('utf-8')).hexdigest(),
+                    },
+                }
+
+        stored = collection.get(include=['metadatas'])
+        stored_hashes = {
+            chunk_id: (metadata or {}).get('content_hash')
+            for chunk_id, metadata in zip(stored['ids'], stored['metadatas'])
+        }
+        changed = [
+            chunk_id for chunk_id, chunk in chunks.items()
+            if options['full'] or stored_hashes.get(chunk_id) != chunk['metadata']['content_hash']
+        ]
+        stale = [chunk_id for chunk_id in stored_hashes if chunk_id not in chunks]
+
+        self.stdout.write(
+            f"{len(chunks)} chunks: {len(changed)} new/changed, "
+            f"{len(chunks) - len(changed)} unchanged, {len(stale)} stale"
+        )
+        if options['dry_run']:
+            return
+
+        batch_size = options['batch_size']
+        batches = [changed[i:i + batch_size] for i in range(0, len(changed), batch_size)]
+
+        def embed(ids):
+            return ids, backend.embeddings.embed_documents([chunks[chunk_id]['document'] for chunk_id in ids])
+
+        # Embedding calls run in parallel; writes stay on this thread
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            futures = [pool.submit(embed, ids) for ids in batches]
+            for done, future in enumerate(as_completed(futures), 1):
+                ids, embeddings = future.result()
+                collection.upsert(
+                    ids=ids,
+                    embeddings=embeddings,
+                    documents=[chunks[chunk_id]['document'] for chunk_id in ids],
+                    metadatas=[chunks[chunk_id]['metadata'] for chunk_id in ids],
+                )
+                self.stdout.write(f"  batch {done}/{len(batches)}: {len(ids)} chunks upserted")
+
+        if stale:
+            collection.delete(ids=stale)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Knowledgebase ({backend.name}) refreshed in {time.perf_counter() - started:.2f}s: "
+            f"{len(changed)} embedded, {len(stale)} deleted"
+        ))
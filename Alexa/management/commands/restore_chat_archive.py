@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from Alexa.archive import restore_archive
+
+
+class Command(BaseCommand):
+    help = ('Load archived chat messages/logs (<table>_YYYY_MM.jsonl.gz) back into the database; '
+            'the next archive_chat_history run archives them again if still past retention')
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='+', help="Archive files written by archive_chat_history")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        for path in options['files']:
+            try:
+                restored, skipped = restore_archive(path, batch_size=options['batch_size'])
+            except (OSError, ValueError) as e:
+                raise CommandError(str(e))
+            message = f"Restored {restored} rows from {path}"
+            if skipped:
+                message += f" ({skipped} skipped: already present, or their session no longer exists)"
+            self.stdout.write(self.style.SUCCESS(message))
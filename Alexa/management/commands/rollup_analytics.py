@@ -0,0 +1,38 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from Alexa.archive import ARCHIVED_MODELS, refuse_rebuild
+from Alexa.funnel import rebuild_funnel, refresh_funnel
+from Alexa.rollups import catch_up, rebuild
+
+
+class Command(BaseCommand):
+    help = 'Fold new ChatLog / ChatSession / ChatMessage rows into the analytics rollups and funnel (run from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000, help="Source rows per transaction")
+        parser.add_argument('--rebuild', action='store_true',
+                            help="Drop the rollups and funnel and recompute them from the live tables. Refused "
+                                 "while archive_chat_history has archived months, whose counts it would lose")
+        parser.add_argument('--archive-dir', default=str(getattr(settings, 'CHAT_ARCHIVE_DIR', 'chat_archive')))
+        parser.add_argument('--include-archived', action='store_true',
+                            help="Rebuild anyway, after restoring the archived months with restore_chat_archive")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        if options['rebuild']:
+            if not options['include_archived']:
+                try:
+                    refuse_rebuild(options['archive_dir'], ARCHIVED_MODELS)
+                except ValueError as e:
+                    raise CommandError(str(e))
+            processed = rebuild(batch_size=options['batch_size'])
+            funnel_messages = rebuild_funnel(batch_size=options['batch_size'])
+        else:
+            processed = catch_up(batch_size=options['batch_size'])
+            funnel_messages = refresh_funnel(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rolled up {processed} rows and {funnel_messages} funnel messages in {time.perf_counter() - start:.2f}s"
+        ))
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from Alexa.export_jobs import fail_stale, prune, run_next
+
+
+class Command(BaseCommand):
+    help = "Run queued export jobs (for EXPORT_JOB_RUNNER = 'command'); several workers may run side by side"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Run the jobs queued now, then exit (e.g. from cron)")
+        parser.add_argument('--poll', type=float, default=2.0, help="Seconds between queue checks when idle")
+        parser.add_argument('--prune-every', type=int, default=3600, help="Seconds between cache cleanups")
+
+    def handle(self, *args, **options):
+        next_prune = 0.0
+        processed = 0
+        while True:
+            if time.monotonic() >= next_prune:
+                failed, removed = fail_stale(), prune()
+                if failed or removed:
+                    self.stdout.write(f"Marked {failed} stale jobs failed, removed {removed} cached files")
+                next_prune = time.monotonic() + options['prune_every']
+            if run_next():
+                processed += 1
+                continue
+            if options['once']:
+                break
+            time.sleep(options['poll'])
+        self.stdout.write(self.style.SUCCESS(f"Ran {processed} export jobs"))
@@ -0,0 +1,40 @@
+import os
+import shutil
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from Alexa.archive import refuse_rebuild
+from Alexa.columnar import DATASETS, snapshot_dataset
+
+
+class Command(BaseCommand):
+    help = 'Append new ChatLog / ChatMessage rows to the columnar (.npy per column) analytics snapshot'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', default=str(getattr(settings, 'ANALYTICS_SNAPSHOT_DIR', 'analytics_snapshot')))
+        parser.add_argument('--dataset', choices=list(DATASETS) + ['all'], default='all')
+        parser.add_argument('--segment-rows', type=int, default=500000, help="Maximum rows per segment file")
+        parser.add_argument('--rebuild', action='store_true',
+                            help="Discard the existing snapshot and export the live tables again. Refused while "
+                                 "archive_chat_history has archived months, which the snapshot would lose")
+        parser.add_argument('--archive-dir', default=str(getattr(settings, 'CHAT_ARCHIVE_DIR', 'chat_archive')))
+        parser.add_argument('--include-archived', action='store_true',
+                            help="Rebuild anyway, after restoring the archived months with restore_chat_archive")
+
+    def handle(self, *args, **options):
+        datasets = list(DATASETS) if options['dataset'] == 'all' else [options['dataset']]
+        if options['rebuild'] and not options['include_archived']:
+            try:
+                refuse_rebuild(options['archive_dir'], [DATASETS[dataset][0]._meta.db_table for dataset in datasets])
+            except ValueError as e:
+                raise CommandError(str(e))
+        for dataset in datasets:
+            start = time.perf_counter()
+            if options['rebuild']:
+                shutil.rmtree(os.path.join(options['dir'], dataset), ignore_errors=True)
+            exported = snapshot_dataset(options['dir'], dataset, segment_rows=options['segment_rows'])
+            self.stdout.write(self.style.SUCCESS(
+                f"{dataset}: appended {exported} rows in {time.perf_counter() - start:.2f}s"
+            ))
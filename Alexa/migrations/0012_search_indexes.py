@@ -0,0 +1,38 @@
+# Full-text search indexes used by Alexa/search.py (Postgres only).
+
+from django.db import migrations
+
+# The expression must match KNOWLEDGE_TSVECTOR in Alexa/search.py. Products are
+# matched in memory by Alexa/product_matcher.py and need no index.
+SEARCH_INDEXES = [
+    (
+        'alexa_knowledgebase_search_idx',
+        '"Alexa_knowledgebase"',
+        "to_tsvector('english', coalesce(question, '') || ' ' || coalesce(answer, ''))",
+    ),
+]
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, expression in SEARCH_INDEXES:
+        schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} USING GIN (({expression}))')
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _, _ in SEARCH_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Alexa', '0011_chatmessage_intent_chatmessage_response'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Alexa', '0013_analytics_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SessionFunnel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField(help_text='First message in the session')),
+                ('furthest_step', models.SmallIntegerField(default=-1, help_text='Index into funnel.FUNNEL_STEPS of the last step reached')),
+                ('step_times', models.JSONField(default=dict, help_text='Step -> ISO time it was first reached')),
+                ('saved_at', models.DateTimeField(blank=True, help_text='When the configuration was saved', null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('session', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='funnel', to='Alexa.chatsession')),
+            ],
+        ),
+    ]
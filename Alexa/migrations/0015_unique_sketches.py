@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Alexa', '0014_session_funnel'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UniqueSketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('dimension', models.CharField(help_text="What is counted, e.g. 'sessions', 'visitors', 'panel'", max_length=30)),
+                ('value', models.CharField(blank=True, default='', help_text="Dimension value ('' when the dimension has none)", max_length=100)),
+                ('registers', models.BinaryField(help_text='Serialized HyperLogLog registers')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'dimension', 'value'), name='unique_sketch_per_day')],
+            },
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:53
+
+from django.db import migrations, models
+
+# Append-only logs: created_at follows the physical row order, so a BRIN
+# index answers time-range scans (time series, rollups, admin date filters)
+# at a tiny fraction of a B-tree's size. Postgres only.
+BRIN_INDEXES = [
+    ('alexa_msg_created_brin', '"Alexa_chatmessage"'),
+    ('alexa_log_created_brin', '"Alexa_chatlog"'),
+]
+
+
+def create_brin_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table in BRIN_INDEXES:
+        schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} USING BRIN (created_at)')
+
+
+def drop_brin_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _ in BRIN_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Alexa', '0015_unique_sketches'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chatlog',
+            index=models.Index(fields=['selected_panel'], name='alexa_log_panel_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chatlog',
+            index=models.Index(fields=['purpose'], name='alexa_log_purpose_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chatlog',
+            index=models.Index(fields=['intent', 'created_at'], name='alexa_log_intent_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['session', 'created_at'], name='alexa_msg_session_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['intent'], name='alexa_msg_intent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chatsession',
+            index=models.Index(fields=['created_at', 'id'], name='alexa_session_created_idx'),
+        ),
+        migrations.RunPython(create_brin_indexes, drop_brin_indexes),
+    ]
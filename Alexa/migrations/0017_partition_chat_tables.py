@@ -0,0 +1,137 @@
+# Monthly range partitioning of the chat tables on created_at (Postgres only).
+#
+# Each table is rebuilt as "<table>" PARTITION BY RANGE (created_at) with one
+# partition per UTC month ("<table>_pYYYY_MM", the naming Alexa/archive.py
+# relies on) plus a DEFAULT partition. The primary key becomes
+# (id, created_at) because a partitioned table's unique keys must contain
+# the partition key. ids keep coming from a sequence, so they stay unique.
+# Existing rows, indexes and the session foreign key are carried over.
+
+from datetime import date
+
+from django.db import migrations
+
+TABLES = ['Alexa_chatmessage', 'Alexa_chatlog']
+MONTHS_AHEAD = 3
+
+
+def _next_month(day: date) -> date:
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+def _month_starts(first: date, last: date):
+    current = first.replace(day=1)
+    while current <= last:
+        yield current
+        current = _next_month(current)
+
+
+def _last_id(cursor, table: str) -> int:
+    # Continue from the sequence, not max(id): ids of deleted rows are never reused
+    cursor.execute(f"SELECT pg_get_serial_sequence('\"{table}\"', 'id')")
+    sequence = cursor.fetchone()[0]
+    cursor.execute(f'SELECT max(id) FROM "{table}"')
+    last_id = cursor.fetchone()[0] or 0
+    if sequence:
+        cursor.execute(f'SELECT last_value, is_called FROM {sequence}')
+        value, is_called = cursor.fetchone()
+        last_id = max(last_id, value if is_called else value - 1)
+    return int(last_id)
+
+
+def partition_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for table in TABLES:
+            legacy = f'{table}_legacy'
+            cursor.execute(
+                "SELECT indexdef FROM pg_indexes WHERE schemaname = current_schema() "
+                "AND tablename = %s AND indexname <> %s",
+                [table, f'{table}_pkey'],
+            )
+            index_defs = [row[0] for row in cursor.fetchall()]
+            cursor.execute(
+                "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+                "WHERE conrelid = %s::regclass AND contype = 'f'",
+                [f'"{table}"'],
+            )
+            foreign_keys = cursor.fetchall()
+            cursor.execute(f'SELECT min(created_at)::date FROM "{table}"')
+            oldest = cursor.fetchone()[0]
+            last_id = _last_id(cursor, table)
+
+            schema_editor.execute(f'ALTER TABLE "{table}" RENAME TO "{legacy}"')
+            schema_editor.execute(
+                f'CREATE TABLE "{table}" (LIKE "{legacy}" INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)'
+            )
+            today = date.today()
+            last = today
+            for _ in range(MONTHS_AHEAD):
+                last = _next_month(last)
+            for month in _month_starts(oldest or today, last):
+                schema_editor.execute(
+                    f'CREATE TABLE "{table}_p{month:%Y_%m}" PARTITION OF "{table}" '
+                    f"FOR VALUES FROM ('{month:%Y-%m-%d} 00:00:00+00') TO ('{_next_month(month):%Y-%m-%d} 00:00:00+00')"
+                )
+            schema_editor.execute(f'CREATE TABLE "{table}_default" PARTITION OF "{table}" DEFAULT')
+
+            schema_editor.execute(f'INSERT INTO "{table}" SELECT * FROM "{legacy}"')
+            # Drops the identity sequence, pkey, FK and index names with it
+            schema_editor.execute(f'DROP TABLE "{legacy}"')
+
+            schema_editor.execute(f'CREATE SEQUENCE "{table}_id_seq" OWNED BY "{table}".id')
+            schema_editor.execute(f'''ALTER TABLE "{table}" ALTER COLUMN id SET DEFAULT nextval('"{table}_id_seq"')''')
+            if last_id:
+                schema_editor.execute(f'''SELECT setval('"{table}_id_seq"', {last_id})''')
+            schema_editor.execute(f'ALTER TABLE "{table}" ADD CONSTRAINT "{table}_pkey" PRIMARY KEY (id, created_at)')
+            for name, definition in foreign_keys:
+                schema_editor.execute(f'ALTER TABLE "{table}" ADD CONSTRAINT "{name}" {definition}')
+            for definition in index_defs:
+                schema_editor.execute(definition)
+
+
+def unpartition_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for table in TABLES:
+            partitioned = f'{table}_partitioned'
+            cursor.execute(
+                "SELECT indexdef FROM pg_indexes WHERE schemaname = current_schema() "
+                "AND tablename = %s AND indexname <> %s",
+                [table, f'{table}_pkey'],
+            )
+            index_defs = [row[0] for row in cursor.fetchall()]
+            cursor.execute(
+                "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+                "WHERE conrelid = %s::regclass AND contype = 'f'",
+                [f'"{table}"'],
+            )
+            foreign_keys = cursor.fetchall()
+            last_id = _last_id(cursor, table)
+
+            schema_editor.execute(f'ALTER TABLE "{table}" RENAME TO "{partitioned}"')
+            schema_editor.execute(f'CREATE TABLE "{table}" (LIKE "{partitioned}")')
+            schema_editor.execute(f'INSERT INTO "{table}" SELECT * FROM "{partitioned}"')
+            schema_editor.execute(f'DROP TABLE "{partitioned}" CASCADE')
+
+            schema_editor.execute(f'ALTER TABLE "{table}" ADD CONSTRAINT "{table}_pkey" PRIMARY KEY (id)')
+            schema_editor.execute(f'ALTER TABLE "{table}" ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY')
+            if last_id:
+                schema_editor.execute(f"SELECT setval(pg_get_serial_sequence('\"{table}\"', 'id'), {last_id})")
+            for name, definition in foreign_keys:
+                schema_editor.execute(f'ALTER TABLE "{table}" ADD CONSTRAINT "{name}" {definition}')
+            for definition in index_defs:
+                schema_editor.execute(definition.replace(' ON ONLY ', ' ON '))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Alexa', '0016_chat_analytics_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_tables, unpartition_tables),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:19
+
+from django.db import migrations, models
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.db.models import Count
+
+
+def check_product_names(apps, schema_editor):
+    # Imports upsert on the name, so it has to be unique. Which duplicate to keep
+    # is for a person to decide: stop with the list rather than delete products
+    Product = apps.get_model('Alexa', 'Product')
+    duplicates = Product.objects.values('name').annotate(rows=Count('id'), ids=ArrayAgg('id', order_by='id')).filter(rows__gt=1)
+    problems = [f"  {row['name']!r}: ids {', '.join(map(str, row['ids']))}" for row in duplicates.order_by('name')]
+    if problems:
+        raise RuntimeError(
+            "Product names must be unique before this migration; rename or delete the duplicates "
+            "(e.g. in the admin) and migrate again:\n" + "\n".join(problems)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Alexa', '0018_export_jobs'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_product_names, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='product',
+            name='name',
+            field=models.CharField(max_length=200, unique=True),
+        ),
+        migrations.CreateModel(
+            name='PanelSpec',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('panel_type', models.CharField(help_text='Indoor, Outdoor, Rental or Standee', max_length=20)),
+                ('model', models.CharField(max_length=100)),
+                ('specs', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('panel_type', 'model'), name='unique_panel_spec')],
+            },
+        ),
+    ]
@@ -1,14 +1,17 @@
+import uuid
+
 from django.db import models
 from django.utils import timezone
 from django.contrib.postgres.fields import ArrayField
 
 
 class Product(models.Model):
-    name = models.CharField(max_length=200)
+    name = models.CharField(max_length=200, unique=True)
     description = models.TextField()
     price = models.FloatField()
     guide_steps = models.JSONField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     category = models.CharField(max_length=100, blank=True, null=True)  # <--- new field
 
     # Step-by-step guide instructions for AI assistant
@@ -23,6 +26,40 @@ class Product(models.Model):
         return self.name
 
 
+class ProductTombstone(models.Model):
+    """
+    A deleted Product, recorded by signals.py so delta exports (see
+    exports.py, ``product_changes``) can tell clients to remove it. Pruned
+    after PRODUCT_TOMBSTONE_RETENTION_DAYS (export_jobs.prune).
+    """
+    product_id = models.BigIntegerField()
+    name = models.CharField(max_length=200)
+    deleted_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self) -> str:
+        return f"{self.name} (deleted {self.deleted_at:%Y-%m-%d %H:%M})"
+
+
+class PanelSpec(models.Model):
+    """
+    Spec catalog row loaded from a spreadsheet (see Alexa/imports.py).
+    ``specs`` has the shape of the dictionaries in views.py (INDOOR_SPECS
+    etc.); while the table is empty the specs export uses those.
+    """
+    panel_type = models.CharField(max_length=20, help_text="Indoor, Outdoor, Rental or Standee")
+    model = models.CharField(max_length=100)
+    specs = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['panel_type', 'model'], name='unique_panel_spec'),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.panel_type} {self.model}"
+
+
 class KnowledgeBase(models.Model):
     """
     Stores frequently asked questions and answers for the chatbot.
@@ -59,6 +96,12 @@ class ChatSession(models.Model):
     )
     created_at = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        indexes = [
+            # ChatDataAPIView window + keyset order, time series
+            models.Index(fields=['created_at', 'id'], name='alexa_session_created_idx'),
+        ]
+
     def __str__(self) -> str:
         return f"ChatSession {self.session_id}"
 
@@ -83,6 +126,14 @@ class ChatMessage(models.Model):
     intent = models.CharField(max_length=50, blank=True, null=True, help_text="Detected intent for the message")
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Per-session messages in a window (ChatDataAPIView prefetch/count, funnel)
+            models.Index(fields=['session', 'created_at'], name='alexa_msg_session_created_idx'),
+            # Admin intent filter
+            models.Index(fields=['intent'], name='alexa_msg_intent_idx'),
+        ]
+
     def __str__(self) -> str:
         return f"{self.sender.capitalize()}: {self.message[:30]}"
 
@@ -101,5 +152,116 @@ class ChatLog(models.Model):
     configuration_summary = models.TextField(blank=True, null=True, help_text="Final configuration summary when user saves")
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Admin list filters and per-value analytics
+            models.Index(fields=['selected_panel'], name='alexa_log_panel_idx'),
+            models.Index(fields=['purpose'], name='alexa_log_purpose_idx'),
+            models.Index(fields=['intent', 'created_at'], name='alexa_log_intent_created_idx'),
+        ]
+
     def __str__(self):
         return f"{self.intent} - {self.message[:30]}"
+
+
+class AnalyticsRollup(models.Model):
+    """
+    Pre-aggregated daily counts for the analytics dashboard, keyed by
+    (day, dimension, value). Maintained incrementally by Alexa/rollups.py.
+    """
+    day = models.DateField()
+    dimension = models.CharField(max_length=30, help_text="What is counted, e.g. 'panel', 'purpose', 'sessions'")
+    value = models.CharField(max_length=100, blank=True, default='', help_text="Dimension value ('' when the dimension has none)")
+    count = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'dimension', 'value'], name='unique_analytics_rollup'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.dimension}={self.value}: {self.count}"
+
+
+class RollupWatermark(models.Model):
+    """
+    High-water mark of an incremental job: the last source row id already
+    folded into the rollups.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    last_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.last_id}"
+
+
+class SessionFunnel(models.Model):
+    """
+    How far one session got through the quoting flow (STEPS), with the time
+    each step was first reached. Refreshed incrementally by Alexa/funnel.py.
+    """
+    session = models.OneToOneField(ChatSession, on_delete=models.CASCADE, related_name='funnel')
+    started_at = models.DateTimeField(help_text="First message in the session")
+    furthest_step = models.SmallIntegerField(default=-1, help_text="Index into funnel.FUNNEL_STEPS of the last step reached")
+    step_times = models.JSONField(default=dict, help_text="Step -> ISO time it was first reached")
+    saved_at = models.DateTimeField(blank=True, null=True, help_text="When the configuration was saved")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Funnel {self.session_id}: step {self.furthest_step}"
+
+
+class UniqueSketch(models.Model):
+    """
+    HyperLogLog sketch (see Alexa/hll.py) of the distinct items seen on one
+    day for (dimension, value), e.g. session ids, client IPs, or the
+    sessions interested in one panel. Maintained by Alexa/uniques.py.
+    """
+    day = models.DateField()
+    dimension = models.CharField(max_length=30, help_text="What is counted, e.g. 'sessions', 'visitors', 'panel'")
+    value = models.CharField(max_length=100, blank=True, default='', help_text="Dimension value ('' when the dimension has none)")
+    registers = models.BinaryField(help_text="Serialized HyperLogLog registers")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'dimension', 'value'], name='unique_sketch_per_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.dimension}={self.value}"
+
+
+class ExportJob(models.Model):
+    """
+    One export (see Alexa/exports.py) run in the background by
+    Alexa/export_jobs.py. Jobs for the same dataset, format, filters and
+    data version share ``cache_key`` and the file it names.
+    """
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    job_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    dataset = models.CharField(max_length=30)
+    params = models.JSONField(default=dict, help_text="Export.params(): format, gzip and the date filters")
+    cache_key = models.CharField(max_length=64, db_index=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    filename = models.CharField(max_length=200, help_text="Download name, e.g. products.xlsx")
+    size = models.BigIntegerField(blank=True, null=True, help_text="Bytes, once done")
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='exportjob_status_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.dataset} export {self.job_id} ({self.status})"
@@ -0,0 +1,137 @@
+"""
+Product mention detection.
+
+An Aho-Corasick automaton over every ``Product.name`` finds all products
+mentioned anywhere in a message in one linear pass, without a database
+query. It is built on first use and rebuilt after a Product save/delete
+(``signals.py``) or once older than ``settings.SEARCH_INDEX_TTL`` seconds,
+so other workers pick up catalogue edits too.
+"""
+import re
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+from .models import Product
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+_matcher = None
+_lock = threading.Lock()
+
+
+def normalize(text: str) -> str:
+    return _WHITESPACE_RE.sub(" ", text.lower()).strip()
+
+
+class AhoCorasick:
+    """
+    Multi-pattern matcher: ``find(text)`` reports every occurrence of every
+    pattern in O(len(text) + matches), however many patterns there are.
+    """
+
+    def __init__(self, patterns: list):
+        self.patterns = patterns
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]
+        for index, pattern in enumerate(patterns):
+            node = 0
+            for char in pattern:
+                if char not in self.goto[node]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                    self.goto[node][char] = len(self.goto) - 1
+                node = self.goto[node][char]
+            self.out[node].append(index)
+
+        # Breadth-first: a node's failure link points at the longest proper
+        # suffix of its path that is also a path in the trie
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                fallback = self.fail[node]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                self.out[child] = self.out[child] + self.out[self.fail[child]]
+
+    def find(self, text: str) -> list:
+        """(start, end, pattern_index) for every match, in order of end position."""
+        matches = []
+        node = 0
+        for position, char in enumerate(text):
+            while node and char not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(char, 0)
+            for index in self.out[node]:
+                matches.append((position + 1 - len(self.patterns[index]), position + 1, index))
+        return matches
+
+
+def _whole_word(text: str, start: int, end: int) -> bool:
+    # "P3" must match neither inside "XP3" nor inside "P3.91mm"
+    if start and text[start - 1].isalnum():
+        return False
+    if end < len(text) and text[end].isalnum():
+        return False
+    return not (text[end:end + 1] == '.' and text[end + 1:end + 2].isalnum())
+
+
+class ProductMatcher:
+    def __init__(self, products: list):
+        # products: card dicts with at least 'name'
+        self.products = [product for product in products if normalize(product['name'])]
+        self.automaton = AhoCorasick([normalize(product['name']) for product in self.products])
+        self.built_at = time.monotonic()
+
+    def find(self, text: str) -> list:
+        text = normalize(text)
+        candidates = []
+        for start, end, index in self.automaton.find(text):
+            if _whole_word(text, start, end):
+                candidates.append((start, end, index))
+
+        # Leftmost-longest, non-overlapping
+        candidates.sort(key=lambda match: (match[0], -(match[1] - match[0])))
+        found, seen, covered_until = [], set(), 0
+        for start, end, index in candidates:
+            if start < covered_until:
+                continue
+            covered_until = end
+            if index not in seen:
+                seen.add(index)
+                found.append(self.products[index])
+        return found
+
+
+def _build() -> ProductMatcher:
+    products = Product.objects.values('id', 'name', 'category', 'price').iterator()
+    return ProductMatcher(list(products))
+
+
+def get_matcher() -> ProductMatcher:
+    global _matcher
+    ttl = getattr(settings, 'SEARCH_INDEX_TTL', 300)
+    with _lock:
+        if _matcher is None or time.monotonic() - _matcher.built_at > ttl:
+            _matcher = _build()
+        return _matcher
+
+
+def invalidate() -> None:
+    global _matcher
+    with _lock:
+        _matcher = None
+
+
+def find_product_mentions(text: str) -> list:
+    """Products named anywhere in ``text``, in order of appearance (id, name, category, price)."""
+    if not text:
+        return []
+    return get_matcher().find(text)
@@ -0,0 +1,131 @@
+"""
+Latency budget and circuit breaker for calls to the model provider.
+
+• ``Deadline``       - per-turn time budget; stages take what is left
+• ``run_with_timeout`` - run a call on a worker thread, give up on time.
+  Retrieval and the LLM have separate pools, so a hung LLM cannot take
+  the threads retrieval needs
+• ``CircuitBreaker`` - after N consecutive failures/timeouts the LLM is
+  skipped for a cooldown, then a single trial call decides whether to close
+
+Counters are per process and exposed by ``ChatbotMetricsAPIView``.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from django.conf import settings
+
+RETRIEVAL_POOL = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'CHATBOT_MODEL_WORKERS', 16),
+    thread_name_prefix='model-call',
+)
+LLM_POOL = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'CHATBOT_LLM_WORKERS', 4),
+    thread_name_prefix='llm-call',
+)
+
+
+class Deadline:
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+
+def run_with_timeout(timeout: float, fn, *args, pool: ThreadPoolExecutor = RETRIEVAL_POOL):
+    """
+    ``fn(*args)`` on ``pool``, or ``concurrent.futures.TimeoutError``. A call
+    still queued at the timeout is cancelled; one already running cannot be
+    interrupted, so ``fn`` must carry its own client timeout (see backends).
+    """
+    future = pool.submit(fn, *args)
+    try:
+        return future.result(timeout=timeout)
+    except TimeoutError:
+        future.cancel()
+        raise
+
+
+class MetricCounters:
+    """Thread-safe named counters."""
+
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def incr(self, name: str, amount: float = 1) -> None:
+        with self._lock:
+            self._counts[name] = self._counts.get(name, 0) + amount
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self._counts)
+
+
+class CircuitBreaker:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str, failure_threshold: int = 3, cooldown: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.counters = MetricCounters()
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """True if a call may go through; counts short-circuited calls."""
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+                # Let exactly one trial call through
+                self.state = self.HALF_OPEN
+                self.counters.incr('calls')
+                return True
+            if self.state != self.CLOSED:
+                self.counters.incr('short_circuited')
+                return False
+            self.counters.incr('calls')
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.counters.incr('successes')
+            self.consecutive_failures = 0
+            self.state = self.CLOSED
+
+    def record_failure(self, timeout: bool = False) -> None:
+        with self._lock:
+            self.counters.incr('timeouts' if timeout else 'failures')
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.counters.incr('opened')
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'name': self.name,
+                'state': self.state,
+                'consecutive_failures': self.consecutive_failures,
+                'failure_threshold': self.failure_threshold,
+                'cooldown_seconds': self.cooldown,
+                **self.counters.snapshot(),
+            }
+
+
+LLM_BREAKER = CircuitBreaker(
+    'llm',
+    failure_threshold=getattr(settings, 'CHATBOT_LLM_BREAKER_THRESHOLD', 3),
+    cooldown=getattr(settings, 'CHATBOT_LLM_BREAKER_COOLDOWN', 30.0),
+)
+
+# Why the knowledgebase fallback answered without the LLM
+DEGRADED_ANSWERS = MetricCounters()
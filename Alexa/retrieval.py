@@ -0,0 +1,167 @@
+"""
+Hybrid knowledgebase retrieval.
+
+Exact model codes ("MRV336", "VX600") are often missed by embeddings alone,
+so every query runs two searches in parallel:
+
+• lexical - Chroma's own FTS5 table (``embedding_fulltext_search``, trigram
+  tokenizer) ranked with ``bm25()``
+• vector  - nearest neighbours from the collection's vector index
+
+and the two rankings are merged with reciprocal rank fusion (RRF).
+Per-stage latency counts/sums are in ``RETRIEVAL_TIMINGS``, exposed by
+``ChatbotMetricsAPIView``.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from langchain.schema import Document
+
+from .backends import get_vector_store
+from .resilience import MetricCounters
+from .search import query_terms
+
+logger = logging.getLogger(__name__)
+
+RRF_K = 60
+
+LEXICAL_SQL = """
+    SELECT e.embedding_id
+    FROM embedding_fulltext_search f
+    JOIN embeddings e ON e.id = f.rowid
+    JOIN segments s ON s.id = e.segment_id
+    JOIN collections c ON c.id = s.collection
+    WHERE embedding_fulltext_search MATCH ? AND c.name = ?
+    ORDER BY bm25(embedding_fulltext_search)
+    LIMIT ?
+"""
+
+_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix='retrieval')
+_retrievers = {}
+_lock = threading.Lock()
+
+# '<stage>_ms_sum' per stage plus 'retrievals'; mean = sum / retrievals
+RETRIEVAL_TIMINGS = MetricCounters()
+STAGES = ('lexical', 'vector', 'fusion', 'total')
+
+
+class RetrievalResult:
+    def __init__(self, documents: list, timings: dict):
+        self.documents = documents
+        # Milliseconds per stage: lexical, vector, fusion, total
+        self.timings = timings
+
+
+def reciprocal_rank_fusion(rankings: list, k: int = RRF_K) -> list:
+    """Merge ranked id lists; ids ranked high in several lists win."""
+    scores = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, 1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=lambda item: -scores[item])
+
+
+class HybridRetriever:
+    def __init__(self, backend, k: int = 3, candidates: int = 10):
+        self.backend = backend
+        self.collection = get_vector_store(backend)._collection
+        self.db_path = os.path.join(str(getattr(settings, 'KB_VECTORS_DIR', 'kb_vectors')), 'chroma.sqlite3')
+        self.k = k
+        self.candidates = candidates
+        self._local = threading.local()
+
+    def _connection(self):
+        # One read-only connection per thread; sqlite3 connections are not shareable
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+        return conn
+
+    def lexical_search(self, query: str) -> list:
+        # The trigram tokenizer needs at least three characters per phrase
+        terms = [term for term in query_terms(query) if len(term) >= 3]
+        if not terms:
+            return []
+        match = " OR ".join(f'"{term}"' for term in terms)
+        rows = self._connection().execute(
+            LEXICAL_SQL, (match, self.backend.collection_name, self.candidates)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def vector_search(self, query: str) -> list:
+        embedding = self.backend.embeddings.embed_query(query)
+        result = self.collection.query(query_embeddings=[embedding], n_results=self.candidates, include=[])
+        return result['ids'][0]
+
+    def _timed(self, fn, query):
+        started = time.perf_counter()
+        try:
+            return fn(query), (time.perf_counter() - started) * 1000
+        except Exception:
+            logger.exception("%s failed for %r", fn.__name__, query)
+            return [], (time.perf_counter() - started) * 1000
+
+    def retrieve(self, query: str, k: int = None) -> RetrievalResult:
+        started = time.perf_counter()
+        lexical = _pool.submit(self._timed, self.lexical_search, query)
+        vector = _pool.submit(self._timed, self.vector_search, query)
+        lexical_ids, lexical_ms = lexical.result()
+        vector_ids, vector_ms = vector.result()
+
+        fusion_started = time.perf_counter()
+        top_ids = reciprocal_rank_fusion([lexical_ids, vector_ids])[:k or self.k]
+        documents = []
+        if top_ids:
+            found = self.collection.get(ids=top_ids, include=['documents', 'metadatas'])
+            by_id = {
+                chunk_id: Document(page_content=document, metadata=metadata or {})
+                for chunk_id, document, metadata in zip(found['ids'], found['documents'], found['metadatas'])
+            }
+            documents = [by_id[chunk_id] for chunk_id in top_ids if chunk_id in by_id]
+        finished = time.perf_counter()
+
+        timings = {
+            'lexical_ms': round(lexical_ms, 2),
+            'vector_ms': round(vector_ms, 2),
+            'fusion_ms': round((finished - fusion_started) * 1000, 2),
+            'total_ms': round((finished - started) * 1000, 2),
+        }
+        record_timings(timings)
+        logger.debug("retrieval %r: %s", query, timings)
+        return RetrievalResult(documents, timings)
+
+
+def record_timings(timings: dict) -> None:
+    RETRIEVAL_TIMINGS.incr('retrievals')
+    for stage in STAGES:
+        RETRIEVAL_TIMINGS.incr(f'{stage}_ms_sum', timings[f'{stage}_ms'])
+
+
+def retrieval_timings() -> dict:
+    """Counters plus the mean of each stage, for the metrics endpoint."""
+    snapshot = RETRIEVAL_TIMINGS.snapshot()
+    retrievals = snapshot.get('retrievals', 0)
+    return {
+        'retrievals': retrievals,
+        **{
+            stage: {
+                'ms_sum': round(snapshot.get(f'{stage}_ms_sum', 0.0), 2),
+                'mean_ms': round(snapshot.get(f'{stage}_ms_sum', 0.0) / retrievals, 2) if retrievals else None,
+            }
+            for stage in STAGES
+        },
+    }
+
+
+def get_retriever(backend) -> HybridRetriever:
+    with _lock:
+        if backend.name not in _retrievers:
+            _retrievers[backend.name] = HybridRetriever(
+                backend, k=getattr(settings, 'CHATBOT_RETRIEVAL_K', 3)
+            )
+        return _retrievers[backend.name]
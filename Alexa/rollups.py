@@ -0,0 +1,116 @@
+"""
+Incrementally maintained analytics rollups.
+
+``catch_up()`` folds ChatLog / ChatSession rows newer than each source's
+high-water mark (``RollupWatermark.last_id``) into ``AnalyticsRollup``
+daily counts, so dashboard reads cost the same at any table size:
+
+    ('panel', <selected_panel>)   ChatLog rows per day with that panel
+    ('purpose', <purpose>)        ChatLog rows per day with that purpose
+    ('sessions', '')              ChatSession rows created per day
+
+Rows younger than ``settings.ANALYTICS_ROLLUP_LAG`` seconds are left for the
+next run so ids of transactions still in flight are not skipped.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Max, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import AnalyticsRollup, ChatLog, ChatSession, RollupWatermark
+
+
+def _chatlog_counts(rows):
+    counts = {}
+    for dimension, field in (('panel', 'selected_panel'), ('purpose', 'purpose')):
+        grouped = (
+            rows.exclude(**{f'{field}__isnull': True})
+            .annotate(day=TruncDate('created_at'))
+            .values('day', field)
+            .annotate(n=Count('id'))
+            .order_by()
+        )
+        for item in grouped:
+            key = (item['day'], dimension, item[field])
+            counts[key] = counts.get(key, 0) + item['n']
+    return counts
+
+
+def _session_counts(rows):
+    grouped = rows.annotate(day=TruncDate('created_at')).values('day').annotate(n=Count('id')).order_by()
+    return {(item['day'], 'sessions', ''): item['n'] for item in grouped}
+
+
+# watermark name -> (source model, rows -> {(day, dimension, value): count})
+SOURCES = {
+    'rollup:chatlog': (ChatLog, _chatlog_counts),
+    'rollup:chatsession': (ChatSession, _session_counts),
+}
+DIMENSIONS = ('panel', 'purpose', 'sessions')
+
+
+def add_counts(counts: dict) -> None:
+    for (day, dimension, value), n in counts.items():
+        updated = AnalyticsRollup.objects.filter(day=day, dimension=dimension, value=value).update(count=F('count') + n)
+        if not updated:
+            AnalyticsRollup.objects.create(day=day, dimension=dimension, value=value, count=n)
+
+
+def catch_up(batch_size: int = 10000, max_batches: int = None) -> int:
+    """
+    Fold new source rows into the rollups; returns how many rows were
+    processed. A source another process is already catching up is skipped
+    rather than waited on.
+    """
+    for name in SOURCES:
+        RollupWatermark.objects.get_or_create(name=name)
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'ANALYTICS_ROLLUP_LAG', 5))
+
+    processed = 0
+    for name, (model, count_rows) in SOURCES.items():
+        upper = model.objects.filter(created_at__lt=cutoff).aggregate(upper=Max('id'))['upper'] or 0
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            with transaction.atomic():
+                mark = RollupWatermark.objects.select_for_update(skip_locked=True).filter(name=name).first()
+                if mark is None or mark.last_id >= upper:
+                    break
+                end = min(mark.last_id + batch_size, upper)
+                rows = model.objects.filter(id__gt=mark.last_id, id__lte=end)
+                processed += rows.count()
+                add_counts(count_rows(rows))
+                mark.last_id = end
+                mark.save(update_fields=['last_id', 'updated_at'])
+            batches += 1
+    return processed
+
+
+def rebuild(batch_size: int = 50000) -> int:
+    """
+    Recompute every rollup from scratch (backfills, definition changes).
+    Only live rows are counted: archived months are lost (see archive.py).
+    """
+    with transaction.atomic():
+        AnalyticsRollup.objects.filter(dimension__in=DIMENSIONS).delete()
+        RollupWatermark.objects.filter(name__in=SOURCES).delete()
+        return catch_up(batch_size=batch_size)
+
+
+def top_values(dimension: str, limit: int = 10) -> list:
+    return list(
+        AnalyticsRollup.objects.filter(dimension=dimension)
+        .values('value')
+        .annotate(count=Sum('count'))
+        .order_by('-count', 'value')[:limit]
+    )
+
+
+def daily_counts(dimension: str, value: str = '') -> list:
+    return list(
+        AnalyticsRollup.objects.filter(dimension=dimension, value=value)
+        .order_by('day')
+        .values('day', 'count')
+    )
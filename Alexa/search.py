@@ -0,0 +1,140 @@
+"""
+Ranked full-text search over KnowledgeBase.
+
+On Postgres the queries hit the GIN expression index created by migration
+0012 and are ranked with ``ts_rank_cd``. Other databases (SQLite in
+development) fall back to an in-memory BM25 index, rebuilt lazily after a
+KnowledgeBase change (see ``signals.py``) or once it is older than
+``settings.SEARCH_INDEX_TTL`` seconds, so other workers pick edits up too.
+Product mentions are matched by ``product_matcher`` instead.
+"""
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from .backends import tokenize
+from .models import KnowledgeBase
+
+# Must stay identical to the indexed expression in migration 0012,
+# otherwise Postgres cannot use the index.
+KNOWLEDGE_TSVECTOR = "to_tsvector('english', coalesce(question, '') || ' ' || coalesce(answer, ''))"
+
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'can', 'do', 'does', 'for', 'from', 'have',
+    'how', 'i', 'in', 'is', 'it', 'me', 'my', 'of', 'on', 'or', 'our', 'please', 'the', 'this',
+    'to', 'we', 'what', 'when', 'where', 'which', 'who', 'with', 'you', 'your',
+}
+
+_indexes = {}
+_lock = threading.Lock()
+
+
+def query_terms(text: str) -> list:
+    terms = []
+    for token in tokenize(text):
+        if token not in STOPWORDS and token not in terms:
+            terms.append(token)
+    return terms
+
+
+# ---------------------------
+# In-memory BM25 (non-Postgres fallback)
+# ---------------------------
+class BM25Index:
+    """
+    Okapi BM25 over an inverted index: a query only touches the postings
+    of its own terms, not every document.
+    """
+
+    def __init__(self, documents, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.keys = []
+        self.lengths = []
+        self.postings = {}
+        for key, text in documents:
+            tokens = tokenize(text)
+            doc_index = len(self.keys)
+            self.keys.append(key)
+            self.lengths.append(len(tokens))
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, count in counts.items():
+                self.postings.setdefault(token, []).append((doc_index, count))
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+        self.built_at = time.monotonic()
+
+    def idf(self, term: str) -> float:
+        df = len(self.postings.get(term, ()))
+        return math.log(1 + (len(self.keys) - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, limit: int = 5) -> list:
+        scores = {}
+        for term in query_terms(query):
+            idf = self.idf(term)
+            for doc_index, tf in self.postings.get(term, ()):
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[doc_index] / (self.avg_length or 1))
+                scores[doc_index] = scores.get(doc_index, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        return [(self.keys[doc_index], score) for doc_index, score in ranked]
+
+
+def _documents(model):
+    for pk, question, answer in model.objects.values_list('id', 'question', 'answer').iterator():
+        # Questions carry the intent; count them twice so they outweigh long answers
+        yield pk, f"{question} {question} {answer}"
+
+
+def _bm25_index(model) -> BM25Index:
+    ttl = getattr(settings, 'SEARCH_INDEX_TTL', 300)
+    with _lock:
+        index = _indexes.get(model)
+        if index is None or time.monotonic() - index.built_at > ttl:
+            index = _indexes[model] = BM25Index(_documents(model))
+        return index
+
+
+def invalidate(model) -> None:
+    with _lock:
+        _indexes.pop(model, None)
+
+
+# ---------------------------
+# Public API
+# ---------------------------
+def _postgres_search(model, tsvector: str, query: str, limit: int) -> list:
+    terms = query_terms(query)
+    if not terms:
+        return []
+    tsquery = " | ".join(f"'{term}'" for term in terms)
+    sql = (
+        f"SELECT id, ts_rank_cd({tsvector}, q) AS rank "
+        f"FROM {connection.ops.quote_name(model._meta.db_table)}, to_tsquery('english', %s) q "
+        f"WHERE {tsvector} @@ q ORDER BY rank DESC, id LIMIT %s"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [tsquery, limit])
+        return cursor.fetchall()
+
+
+def _search(model, tsvector: str, query: str, limit: int) -> list:
+    if connection.vendor == 'postgresql':
+        ranked = _postgres_search(model, tsvector, query, limit)
+    else:
+        ranked = _bm25_index(model).search(query, limit)
+    objects = model.objects.in_bulk([pk for pk, _ in ranked])
+    results = []
+    for pk, rank in ranked:
+        if pk in objects:
+            objects[pk].rank = rank
+            results.append(objects[pk])
+    return results
+
+
+def search_knowledge(query: str, limit: int = 5) -> list:
+    """KnowledgeBase entries best matching ``query``, best first (``.rank`` set)."""
+    return _search(KnowledgeBase, KNOWLEDGE_TSVECTOR, query, limit)
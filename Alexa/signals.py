@@ -0,0 +1,30 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import product_matcher, search
+from .models import KnowledgeBase, Product, ProductTombstone
+
+
+@receiver([post_save, post_delete], sender=KnowledgeBase)
+def invalidate_search_index(sender, **kwargs):
+    search.invalidate(sender)
+
+
+@receiver([post_save, post_delete], sender=Product)
+def invalidate_product_matcher(sender, **kwargs):
+    product_matcher.invalidate()
+
+
+@receiver(post_delete, sender=Product)
+def record_product_tombstone(sender, instance, **kwargs):
+    ProductTombstone.objects.create(product_id=instance.pk, name=instance.name)
+
+
+@receiver(pre_save, sender=Product)
+def record_product_rename(sender, instance, raw=False, **kwargs):
+    # Clients keyed by name would keep the old one: tombstone it like a delete
+    if raw or instance.pk is None:
+        return
+    old_name = Product.objects.filter(pk=instance.pk).values_list('name', flat=True).first()
+    if old_name is not None and old_name != instance.name:
+        ProductTombstone.objects.create(product_id=instance.pk, name=old_name)
@@ -1,3 +1,1259 @@
-from django.test import TestCase
+import gzip
+import io
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+import zoneinfo
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from unittest import mock
+from datetime import date, datetime, timedelta, timezone as dt_timezone
 
-# Create your tests here.
+import numpy as np
+import openpyxl
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from langchain.schema import Document
+
+from . import backends, chatbot_logic, retrieval, trending, uniques, views
+from .admin import EstimatedCountPaginator
+from .archive import archive_month, restore_archive
+from .chatbot_logic import NO_ANSWER
+from .coalesce import SingleFlight, normalize_question
+from .columnar import open_snapshot, snapshot_dataset
+from .export_jobs import artifact_path, enqueue, fail_stale, prune, run_next
+from .exports import Export
+from .funnel import funnel_report, funnel_steps, refresh_funnel
+from .hll import HyperLogLog
+from .imports import import_workbook
+from .live import EventBus, Subscription, WsgiStream
+from .management.commands.explain_queries import index_names
+from .management.commands.ingest_knowledge import chunk_text
+from .models import (
+    AnalyticsRollup, ChatLog, ChatMessage, ChatSession, ExportJob, KnowledgeBase, Product, ProductTombstone,
+    RollupWatermark,
+)
+from .product_matcher import AhoCorasick, ProductMatcher, find_product_mentions
+from .resilience import CircuitBreaker, run_with_timeout
+from .retrieval import reciprocal_rank_fusion
+from .rollups import catch_up, daily_counts, rebuild, top_values
+from .search import KNOWLEDGE_TSVECTOR, BM25Index, search_knowledge
+from .timeseries import bucket_starts, time_series
+from .topk import SpaceSaving
+from .uniques import count_uniques, top_uniques
+from .views import window_messages_count
+from .xlsx import SheetWriter, new_workbook
+
+# Where the app would write outside the database when not overridden
+CHECKOUT_DIRS = ('TRENDING_DIR', 'EXPORT_CACHE_DIR', 'CHAT_ARCHIVE_DIR', 'ANALYTICS_SNAPSHOT_DIR')
+
+
+class TempDirMixin:
+    """
+    ``self.tmp`` per test, with every directory setting the app writes to
+    pointed inside it, so the suite leaves nothing in the checkout (trending
+    files there would be merged into later trending results).
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.tmp = tempfile.mkdtemp(prefix='alexa-test-')
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        dirs = override_settings(**{name: os.path.join(self.tmp, name.lower()) for name in CHECKOUT_DIRS})
+        dirs.enable()
+        self.addCleanup(dirs.disable)
+        # Buffers flushed at exit would outlive the overrides and the test database
+        self.addCleanup(lambda: trending._slots.clear())
+        self.addCleanup(lambda: uniques._buffer.clear())
+
+
+# ---------------------------
+# Model backends (local)
+# ---------------------------
+class LocalBackendTests(TestCase):
+    def test_embeddings_are_deterministic_unit_vectors(self):
+        embeddings = backends.HashingEmbeddings(dimensions=64)
+        vector = embeddings.embed_query('Outdoor P4 panel brightness')
+        self.assertEqual(vector, backends.HashingEmbeddings(dimensions=64).embed_documents(['outdoor p4 panel BRIGHTNESS'])[0])
+        self.assertEqual(len(vector), 64)
+        self.assertAlmostEqual(sum(v * v for v in vector), 1.0, places=5)
+        self.assertEqual(embeddings.embed_query('...'), [0.0] * 64)
+
+    def test_similar_texts_are_closer(self):
+        embeddings = backends.HashingEmbeddings()
+        query, near, far = (embeddings.embed_query(text) for text in (
+            'outdoor panel brightness', 'brightness of the outdoor panel', 'invoice and payment terms'))
+        dot = lambda a, b: sum(x * y for x, y in zip(a, b))
+        self.assertGreater(dot(query, near), dot(query, far))
+
+    def test_extractive_answer_picks_the_overlapping_sentences(self):
+        documents = [
+            Document(page_content='Panels ship in flight cases. Outdoor panels reach 6000 nits.'),
+            Document(page_content='Warranty is two years.'),
+        ]
+        answerer = backends.ExtractiveAnswerer(max_sentences=1)
+        self.assertEqual(answerer('How bright are outdoor panels?', documents), 'Outdoor panels reach 6000 nits.')
+        self.assertEqual(answerer('Do you sell cables?', documents), answerer.no_answer)
+
+    def test_backend_lookup_by_name_or_dotted_path(self):
+        self.addCleanup(backends._backends.clear)
+        local = backends.get_model_backend('local')
+        self.assertIsInstance(local, backends.LocalBackend)
+        self.assertIs(backends.get_model_backend('local'), local)
+        self.assertIsInstance(backends.get_model_backend('Alexa.backends.LocalBackend'), backends.LocalBackend)
+
+
+# ---------------------------
+# Knowledgebase full-text search
+# ---------------------------
+class KnowledgeSearchTests(TestCase):
+    def setUp(self):
+        self.mount = KnowledgeBase.objects.create(
+            question='How do I wall mount the MRV336 panel?', answer='Use the bracket kit in the box.')
+        self.clean = KnowledgeBase.objects.create(
+            question='How do I clean the panel?', answer='Wipe it with a dry cloth, never water.')
+
+    def test_postgres_ranks_the_best_match_first(self):
+        results = search_knowledge('wall mount bracket')
+        self.assertEqual([entry.pk for entry in results], [self.mount.pk])
+        self.assertGreater(results[0].rank, 0)
+        self.assertEqual(search_knowledge('how do i'), [])    # stopwords only
+
+    def test_postgres_query_uses_the_expression_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute(
+                f'EXPLAIN SELECT id FROM "Alexa_knowledgebase" '
+                f"WHERE {KNOWLEDGE_TSVECTOR} @@ to_tsquery('english', 'panel')"
+            )
+            plan = ' '.join(row[0] for row in cursor.fetchall())
+            cursor.execute("SELECT indexname FROM pg_indexes WHERE indexname LIKE 'alexa_%%search_idx'")
+            self.assertEqual(cursor.fetchall(), [('alexa_knowledgebase_search_idx',)])
+        self.assertIn('alexa_knowledgebase_search_idx', plan)
+
+    def test_bm25_fallback_ranks_by_term_rarity(self):
+        index = BM25Index([(1, 'clean the panel'), (2, 'mount the panel on a wall'), (3, 'panel colours')])
+        self.assertEqual([key for key, _ in index.search('wall panel')][:1], [2])
+        self.assertEqual(index.search('the'), [])
+
+
+# ---------------------------
+# Knowledgebase ingestion
+# ---------------------------
+@override_settings(CHATBOT_MODEL_BACKEND='local')
+class IngestKnowledgeTests(TempDirMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        vectors = override_settings(KB_VECTORS_DIR=os.path.join(self.tmp, 'kb_vectors'))
+        vectors.enable()
+        self.addCleanup(vectors.disable)
+        self.addCleanup(backends._vector_stores.clear)
+        backends._vector_stores.clear()
+        self.entry = KnowledgeBase.objects.create(question='What is the warranty?', answer='Two years on all panels.')
+
+    def ingest(self, *args) -> str:
+        out = io.StringIO()
+        call_command('ingest_knowledge', *args, '--batch-size', '2', stdout=out)
+        return out.getvalue()
+
+    def stored(self) -> dict:
+        found = backends.get_vector_store(backends.get_model_backend('local'))._collection.get()
+        return dict(zip(found['ids'], found['documents']))
+
+    def test_only_changed_chunks_are_embedded(self):
+        first = self.ingest()
+        total = len(self.stored())
+        self.assertIn(f"{total} embedded, 0 deleted", first)
+        self.assertIn(f"{total} chunks: 0 new/changed, {total} unchanged, 0 stale", self.ingest())
+
+        self.entry.answer = 'Three years on all panels.'
+        self.entry.save()
+        self.assertIn("1 embedded, 0 deleted", self.ingest())
+        self.assertEqual(self.stored()[f'kb:{self.entry.pk}:0'], 'Q: What is the warranty?\nA: Three years on all panels.')
+
+        self.entry.delete()
+        self.assertIn("0 embedded, 1 deleted", self.ingest())
+        self.assertEqual(len(self.stored()), total - 1)
+
+    def test_chunks_split_on_lines(self):
+        self.assertEqual(chunk_text('aaaa\nbbbb\ncc', 9), ['aaaa\nbbbb', 'cc'])
+        self.assertEqual(chunk_text('a' * 20, 9), ['a' * 20])    # a long line is not cut
+
+
+# ---------------------------
+# Hybrid retrieval (lexical + vector, RRF)
+# ---------------------------
+class HybridRetrievalTests(TestCase):
+    def test_rrf_prefers_ids_ranked_in_both_lists(self):
+        self.assertEqual(reciprocal_rank_fusion([['a', 'b', 'c'], ['c', 'a']]), ['a', 'c', 'b'])
+        self.assertEqual(reciprocal_rank_fusion([[], []]), [])
+
+    def test_retrieval_records_stage_timings(self):
+        collection = mock.Mock()
+        collection.get.return_value = {'ids': ['c1', 'c2'], 'documents': ['one', 'two'], 'metadatas': [None, None]}
+        with mock.patch.object(retrieval, 'get_vector_store', return_value=mock.Mock(_collection=collection)):
+            retriever = retrieval.HybridRetriever(mock.Mock(collection_name='kb'), k=2)
+        retriever.lexical_search = lambda query: ['c2', 'c9']
+        retriever.vector_search = lambda query: ['c1', 'c2']
+        before = retrieval.RETRIEVAL_TIMINGS.snapshot().get('retrievals', 0)
+
+        result = retriever.retrieve('MRV336 wall mount')
+
+        self.assertEqual([doc.page_content for doc in result.documents], ['two', 'one'])
+        metrics = self.client.get('/api/alexa/metrics/').json()['retrieval_timings']
+        self.assertEqual(metrics['retrievals'], before + 1)
+        for stage in retrieval.STAGES:
+            self.assertIsNotNone(metrics[stage]['mean_ms'])
+            self.assertGreaterEqual(metrics[stage]['ms_sum'], result.timings[f'{stage}_ms'] - 0.01)
+
+
+# ---------------------------
+# Knowledge pipeline (turn budget, breaker, degraded answers)
+# ---------------------------
+@override_settings(CHATBOT_MODEL_BACKEND='openai', CHATBOT_COALESCE_LOCK_DIR=None)
+class KnowledgeFallbackTests(TempDirMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        # No key: building the OpenAI backend fails, as on a box without credentials
+        self.enterContext(mock.patch.dict(os.environ))
+        os.environ.pop('OPENAI_API_KEY', None)
+        self.enterContext(mock.patch.dict(backends._backends, clear=True))
+        self.addCleanup(views.SESSIONS.pop, 'kb-test', None)
+
+    def ask(self, message: str) -> dict:
+        with self.assertLogs('Alexa.chatbot_logic', 'ERROR') as logs:
+            reply = self.chat(message)
+        self.assertIn('Knowledge retrieval failed', logs.output[0])
+        return reply
+
+    def chat(self, message: str) -> dict:
+        response = self.client.post('/api/alexa/', {'session_id': 'kb-test', 'message': message},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_general_question_without_api_key_gets_degraded_answer(self):
+        KnowledgeBase.objects.create(question='How do I mount the cabinet on a wall?',
+                                     answer='Use the wall bracket kit that ships with every cabinet.')
+        self.chat('')
+        reply = self.ask('how do I mount the cabinet on a wall')
+        self.assertEqual((reply['intent'], reply['reply']),
+                         ('knowledge', 'Use the wall bracket kit that ships with every cabinet.'))
+        self.assertNotIn('unmatched', reply)
+        self.assertEqual(trending.trending(['5m'])['5m']['unmatched'], [])
+
+    def test_unanswered_question_is_trending_as_unmatched(self):
+        self.chat('')
+        reply = self.ask('how do I mount the cabinet on a wall')
+        self.assertEqual(reply['reply'], NO_ANSWER)
+        self.assertEqual([row['value'] for row in trending.trending(['5m'])['5m']['unmatched']],
+                         ['how do i mount the cabinet on a wall'])
+
+
+class ResilienceTests(TestCase):
+    def test_timed_out_queued_call_is_cancelled(self):
+        pool = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(pool.shutdown)
+        release, ran = threading.Event(), []
+        with self.assertRaises(FutureTimeout):
+            run_with_timeout(0.05, release.wait, 5, pool=pool)
+        with self.assertRaises(FutureTimeout):
+            run_with_timeout(0.05, ran.append, 'queued', pool=pool)
+        release.set()
+        self.assertEqual(run_with_timeout(1, lambda: 'free', pool=pool), 'free')
+        self.assertEqual(ran, [])
+
+    def test_breaker_opens_then_lets_one_trial_through(self):
+        breaker = CircuitBreaker('test', failure_threshold=2, cooldown=0.05)
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        breaker.record_failure(timeout=True)
+        self.assertFalse(breaker.allow())
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())    # half open: one trial
+        self.assertFalse(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.snapshot()['state'], 'closed')
+
+    @override_settings(CHATBOT_TURN_BUDGET=0.3, CHATBOT_MIN_GENERATION_TIME=0.0)
+    def test_slow_llm_answers_from_the_retrieved_chunk(self):
+        document = Document(page_content='P3 panels suit studios.')
+        backend = mock.Mock(answer=lambda question, documents: time.sleep(1) or 'too late')
+        retriever = mock.Mock(retrieve=lambda question: mock.Mock(documents=[document]))
+        breaker = CircuitBreaker('test', failure_threshold=1)
+        with mock.patch.object(chatbot_logic, 'get_model_backend', return_value=backend), \
+                mock.patch.object(chatbot_logic, 'get_retriever', return_value=retriever), \
+                mock.patch.object(chatbot_logic, 'LLM_BREAKER', breaker), \
+                self.assertLogs('Alexa.chatbot_logic', 'WARNING'):
+            self.assertEqual(chatbot_logic._run_knowledge_pipeline('studio panel?'), ('P3 panels suit studios.', True))
+            # The breaker is open now: no LLM call at all
+            backend.answer = mock.Mock()
+            self.assertEqual(chatbot_logic._run_knowledge_pipeline('studio panel?'), ('P3 panels suit studios.', True))
+        backend.answer.assert_not_called()
+        self.assertEqual(breaker.snapshot()['timeouts'], 1)
+
+
+# ---------------------------
+# Product mentions (Aho-Corasick)
+# ---------------------------
+class ProductMatcherTests(TestCase):
+    def test_automaton_reports_overlapping_matches(self):
+        automaton = AhoCorasick(['he', 'she', 'his', 'hers'])
+        self.assertEqual(sorted(automaton.find('ushers')), [(1, 4, 1), (2, 4, 0), (2, 6, 3)])
+
+    def test_whole_words_leftmost_longest(self):
+        matcher = ProductMatcher([{'id': 1, 'name': 'P3'}, {'id': 2, 'name': 'P3 Outdoor'}, {'id': 3, 'name': 'VX600'}])
+        found = matcher.find('Compare the p3   outdoor with the VX600 and P3.')
+        self.assertEqual([product['id'] for product in found], [2, 3, 1])
+        self.assertEqual(matcher.find('XP3 or P3.91mm or VX6000'), [])
+
+    def test_catalogue_edits_rebuild_the_matcher(self):
+        self.assertEqual(find_product_mentions('do you stock the MRV336?'), [])
+        product = Product.objects.create(name='MRV336', description='', price=1.0)
+        self.assertEqual([p['id'] for p in find_product_mentions('do you stock the MRV336?')], [product.pk])
+        product.delete()
+        self.assertEqual(find_product_mentions('do you stock the MRV336?'), [])
+
+
+# ---------------------------
+# Single-flight coalescing
+# ---------------------------
+class SingleFlightTests(TempDirMixin, TestCase):
+    def test_concurrent_duplicates_share_one_call(self):
+        flight, started, release, calls = SingleFlight(), threading.Event(), threading.Event(), []
+
+        def answer():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return 'two years'
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(flight.do('warranty', answer)))
+        leader.start()
+        started.wait(5)
+        # Count followers as they start waiting on the leader
+        event, waiting = flight._calls['warranty'].event, []
+        event_wait = event.wait
+        event.wait = lambda timeout: waiting.append(1) or event_wait(timeout)
+        followers = [threading.Thread(target=lambda: results.append(flight.do('warranty', answer))) for _ in range(4)]
+        for thread in followers:
+            thread.start()
+        while len(waiting) < 4:
+            time.sleep(0.01)
+        release.set()
+        for thread in [leader] + followers:
+            thread.join(5)
+
+        self.assertEqual(results, ['two years'] * 5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(flight.counters.snapshot(), {'executed': 1, 'coalesced': 4})
+
+    def test_followers_get_the_leaders_error(self):
+        flight, started, release, calls, errors = SingleFlight(), threading.Event(), threading.Event(), [], []
+
+        def fail():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            raise RuntimeError('model down')
+
+        def ask():
+            try:
+                flight.do('q', fail)
+            except RuntimeError as e:
+                errors.append(str(e))
+
+        threads = [threading.Thread(target=ask), threading.Thread(target=ask)]
+        threads[0].start()
+        started.wait(5)
+        event = flight._calls['q'].event
+        event_wait = event.wait
+        event.wait = lambda timeout: release.set() or event_wait(timeout)
+        threads[1].start()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(errors, ['model down', 'model down'])
+        self.assertEqual(len(calls), 1)
+
+    def test_answer_is_shared_across_workers_through_the_lock_dir(self):
+        first, second = (SingleFlight(lock_dir=self.tmp, result_ttl=5) for _ in range(2))
+        self.assertEqual(first.do('q', lambda: ['answer', True]), ['answer', True])
+        self.assertEqual(second.do('q', mock.Mock(side_effect=AssertionError)), ['answer', True])
+        self.assertEqual(second.counters.snapshot(), {'coalesced_remote': 1})
+        self.assertEqual(normalize_question('  What IS the warranty?? '), 'what is the warranty')
+
+
+# ---------------------------
+# Analytics rollups
+# ---------------------------
+@override_settings(ANALYTICS_ROLLUP_LAG=0)
+class RollupTests(TestCase):
+    def setUp(self):
+        self.session = ChatSession.objects.create(session_id='rollup-test')
+
+    def log(self, panel, purpose=None):
+        ChatLog.objects.create(session=self.session, intent='panel', message='-', selected_panel=panel, purpose=purpose)
+
+    def test_catch_up_counts_each_row_once(self):
+        self.log('P3', 'retail')
+        self.log('P3')
+        self.assertEqual(catch_up(), 3)    # two logs and the session
+        self.assertEqual(catch_up(), 0)
+        self.log('P4', 'retail')
+        self.assertEqual(catch_up(), 1)
+        self.assertEqual(top_values('panel'), [{'value': 'P3', 'count': 2}, {'value': 'P4', 'count': 1}])
+        self.assertEqual(top_values('purpose'), [{'value': 'retail', 'count': 2}])
+        self.assertEqual([row['count'] for row in daily_counts('sessions')], [1])
+
+        incremental = list(AnalyticsRollup.objects.order_by('day', 'dimension', 'value').values_list('dimension', 'value', 'count'))
+        rebuild()
+        self.assertEqual(
+            list(AnalyticsRollup.objects.order_by('day', 'dimension', 'value').values_list('dimension', 'value', 'count')),
+            incremental,
+        )
+
+    def test_batches_advance_the_watermark(self):
+        for panel in ('P2', 'P3', 'P4'):
+            self.log(panel)
+        # One id range per source; the rest is left for the next run
+        first = catch_up(batch_size=1, max_batches=1)
+        self.assertEqual(RollupWatermark.objects.get(name='rollup:chatlog').last_id, 1)
+        self.assertEqual(first + catch_up(batch_size=2), 4)
+        self.assertEqual(RollupWatermark.objects.get(name='rollup:chatlog').last_id, ChatLog.objects.latest('id').id)
+
+    @override_settings(ANALYTICS_ROLLUP_LAG=60)
+    def test_rows_younger_than_the_lag_wait(self):
+        self.log('P3')
+        self.assertEqual(catch_up(), 0)
+        self.assertEqual(top_values('panel'), [])
+
+
+# ---------------------------
+# Chat data API (keyset pagination)
+# ---------------------------
+class ChatDataTests(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        # Two sessions share a timestamp: the id breaks the tie across pages
+        moments = [now - timedelta(minutes=minutes) for minutes in (1, 2, 2, 3, 4)]
+        self.sessions = [
+            ChatSession.objects.create(session_id=f'data-{n}', created_at=moment) for n, moment in enumerate(moments)
+        ]
+        for session in self.sessions[:2]:
+            for text in ('hi', 'P3 please'):
+                ChatMessage.objects.create(session=session, sender='user', message=text)
+
+    def get(self, **params):
+        response = self.client.get('/api/alexa/chat-data/', {'filter': 'week', **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_cursor_walks_every_session_once_newest_first(self):
+        seen, cursor = [], None
+        while True:
+            page = self.get(page_size=2, fields='session_id', **({'cursor': cursor} if cursor else {}))
+            seen += [item['session_id'] for item in page['sessions']]
+            cursor = page['next_cursor']
+            if not cursor:
+                break
+        expected = sorted(self.sessions, key=lambda session: (session.created_at, session.id), reverse=True)
+        self.assertEqual(seen, [session.session_id for session in expected])
+        self.assertEqual(page['total_sessions'], 5)
+
+    def test_page_costs_the_same_queries_at_any_size(self):
+        with self.assertNumQueries(3):    # page, prefetched messages, total
+            page = self.get(page_size=5)
+        counts = {item['session_id']: item['messages_count'] for item in page['sessions']}
+        self.assertEqual(counts, {'data-0': 2, 'data-1': 2, 'data-2': 0, 'data-3': 0, 'data-4': 0})
+        self.assertEqual([m['message'] for m in page['sessions'][0]['messages']], ['hi', 'P3 please'])
+
+    def test_bad_parameters(self):
+        for params in ({'cursor': 'not-a-cursor'}, {'page_size': 0}, {'fields': 'secret'}):
+            response = self.client.get('/api/alexa/chat-data/', {'filter': 'week', **params})
+            self.assertEqual(response.status_code, 400, params)
+
+
+# ---------------------------
+# Transcript export
+# ---------------------------
+class TranscriptExportTests(TempDirMixin, TestCase):
+    URL = '/api/alexa/export-transcripts/'
+
+    def setUp(self):
+        super().setUp()
+        session = ChatSession.objects.create(session_id='transcript-test')
+        for day, text in ((1, 'hello'), (2, 'P3 please'), (3, 'thanks')):
+            message = ChatMessage.objects.create(session=session, sender='user', message=text)
+            ChatMessage.objects.filter(pk=message.pk).update(created_at=datetime(2024, 5, day, 23, 30, tzinfo=dt_timezone.utc))
+        self.client.force_login(User.objects.create_user('staff', is_staff=True))
+
+    def rows(self, response) -> list:
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        body = b''.join(response.streaming_content)
+        if response['Content-Type'] == 'application/gzip':
+            body = gzip.decompress(body)
+        return [json.loads(line) for line in body.decode('utf-8').splitlines()]
+
+    @override_settings(TIME_ZONE='UTC')
+    def test_range_includes_whole_end_day(self):
+        rows = self.rows(self.client.get(self.URL, {'start': '2024-05-02', 'end': '2024-05-03'}))
+        self.assertEqual([row['message'] for row in rows], ['P3 please', 'thanks'])
+        self.assertEqual(rows[0]['session_id'], 'transcript-test')
+
+    def test_gzip_and_csv(self):
+        rows = self.rows(self.client.get(self.URL, {'start': '2024-05-01', 'end': '2024-05-04', 'gzip': '1'}))
+        self.assertEqual(len(rows), 3)
+        response = self.client.get(self.URL, {'start': '2024-05-01', 'end': '2024-05-04', 'format': 'csv'})
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual(lines[0].split(',')[:4], ['session_id', 'session_created_at', 'message_id', 'sender'])
+        self.assertEqual(len(lines), 4)
+
+    def test_staff_only_and_dates_validated(self):
+        self.assertEqual(self.client.get(self.URL, {'start': 'yesterday'}).status_code, 400)
+        self.client.logout()
+        self.assertEqual(self.client.get(self.URL).status_code, 403)
+
+
+# ---------------------------
+# Time series
+# ---------------------------
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'timeseries-tests'}})
+class TimeSeriesTests(TestCase):
+    TZ = zoneinfo.ZoneInfo('America/New_York')
+
+    def setUp(self):
+        caches['default'].clear()
+        session = ChatSession.objects.create(session_id='ts-test', created_at=datetime(2024, 3, 9, 20, tzinfo=self.TZ))
+        for day, panel in ((9, 'P3'), (9, 'P4'), (11, 'P3')):
+            log = ChatLog.objects.create(session=session, intent='panel', message='-', selected_panel=panel)
+            ChatLog.objects.filter(pk=log.pk).update(created_at=datetime(2024, 3, day, 23, 30, tzinfo=self.TZ))
+
+    def test_local_day_buckets_and_breakdown(self):
+        series = time_series('panels', 'day', self.TZ, datetime(2024, 3, 9, tzinfo=self.TZ), datetime(2024, 3, 12, tzinfo=self.TZ))
+        self.assertEqual([(point['bucket'][:10], point['count']) for point in series['points']],
+                         [('2024-03-09', 2), ('2024-03-10', 0), ('2024-03-11', 1)])
+        self.assertEqual(series['points'][0]['breakdown'], {'P3': 1, 'P4': 1})
+
+    def test_closed_buckets_are_cached(self):
+        args = ('panels', 'day', self.TZ, datetime(2024, 3, 9, tzinfo=self.TZ), datetime(2024, 3, 12, tzinfo=self.TZ))
+        first = time_series(*args)
+        self.assertEqual((first['cached_buckets'], first['computed_buckets']), (0, 3))
+        second = time_series(*args)
+        self.assertEqual((second['cached_buckets'], second['computed_buckets']), (3, 0))
+        self.assertEqual(second['points'], first['points'])
+
+    def test_hour_buckets_across_dst(self):
+        # In New York 2024-03-10 has 23 hours and 2024-11-03 has 25
+        for month, day, hours in ((3, 10, 23), (11, 3, 25)):
+            start, end = datetime(2024, month, day, tzinfo=self.TZ), datetime(2024, month, day + 1, tzinfo=self.TZ)
+            starts = bucket_starts(start, end, 'hour', self.TZ)
+            self.assertEqual([s.timestamp() for s in starts], [start.timestamp() + 3600 * n for n in range(hours)])
+        with self.assertRaises(ValueError):
+            bucket_starts(datetime(2000, 1, 1, tzinfo=self.TZ), datetime(2024, 1, 1, tzinfo=self.TZ), 'day', self.TZ)
+
+
+# ---------------------------
+# Conversation funnel
+# ---------------------------
+@override_settings(ANALYTICS_ROLLUP_LAG=0)
+class FunnelTests(TestCase):
+    def say(self, session, intent, seconds):
+        message = ChatMessage.objects.create(session=session, sender='bot', message='-', intent=intent)
+        ChatMessage.objects.filter(pk=message.pk).update(created_at=self.start + timedelta(seconds=seconds))
+
+    def setUp(self):
+        self.start = timezone.now() - timedelta(hours=1)
+        self.steps = funnel_steps()
+        # a: three steps (10s, then 20s) and a save; b: two steps (20s); c: greeting only
+        a, b, c = (ChatSession.objects.create(session_id=f'funnel-{name}') for name in 'abc')
+        for session, offsets in ((a, (0, 10, 30)), (b, (0, 20)), (c, (0,))):
+            for step, seconds in zip(self.steps, offsets):
+                self.say(session, step, seconds)
+        ChatLog.objects.create(session=a, intent='save_configuration', message='save')
+
+    def test_report_counts_and_medians(self):
+        refresh_funnel()
+        report = {row['step']: row for row in funnel_report()}
+        first, second, third = self.steps[:3]
+        self.assertEqual([report[step]['sessions'] for step in (first, second, third, 'saved')], [3, 2, 1, 1])
+        self.assertEqual(report[second]['conversion_from_previous'], round(2 / 3, 4))
+        self.assertEqual(report[second]['median_seconds_from_previous'], 15.0)
+        self.assertEqual(report[third]['median_seconds_from_previous'], 20.0)
+        # 'saved' follows the final step, which session a never reached
+        self.assertIsNone(report['saved']['median_seconds_from_previous'])
+
+    def test_refresh_is_incremental(self):
+        refresh_funnel()
+        self.assertEqual(refresh_funnel(), 0)
+        self.say(ChatSession.objects.get(session_id='funnel-c'), self.steps[1], 5)
+        self.assertEqual(refresh_funnel(), 1)
+        self.assertEqual(funnel_report()[1]['sessions'], 3)
+
+
+# ---------------------------
+# Unique counts (HyperLogLog)
+# ---------------------------
+class HyperLogLogTests(TestCase):
+    def sketch(self, items, p=12) -> HyperLogLog:
+        sketch = HyperLogLog(p)
+        for item in items:
+            sketch.add(item)
+        return sketch
+
+    def test_estimates_stay_within_the_error_bound(self):
+        for n in (100, 5000, 100000):
+            estimate = self.sketch(f"session-{i}" for i in range(n)).count()
+            # Three standard errors; the hash is fixed, so this cannot flake
+            self.assertLessEqual(abs(estimate - n) / n, 3 * HyperLogLog.error_bound(), n)
+
+    def test_merge_counts_the_union(self):
+        a = self.sketch(f"s{i}" for i in range(0, 6000))
+        b = self.sketch(f"s{i}" for i in range(4000, 10000))
+        union = HyperLogLog.from_bytes(a.to_bytes()).merge(b)
+        self.assertLessEqual(abs(union.count() - 10000) / 10000, 3 * HyperLogLog.error_bound())
+        self.assertEqual(union.count(), self.sketch(f"s{i}" for i in range(10000)).count())
+        with self.assertRaises(ValueError):
+            a.merge(HyperLogLog(10))
+
+    def test_flushes_are_idempotent(self):
+        self.addCleanup(uniques._buffer.clear)
+        today = timezone.localdate()
+        for _ in range(2):    # e.g. two workers seeing the same sessions
+            for i in range(50):
+                uniques.record_turn(f"session-{i}", ip_address=f"10.0.0.{i % 10}", panel='P3')
+            uniques.flush()
+        self.assertEqual(count_uniques('sessions', today), 50)
+        self.assertEqual(count_uniques('visitors', today), 10)
+        self.assertEqual(top_uniques('panel', today), [{'value': 'P3', 'unique_sessions': 50}])
+
+
+# ---------------------------
+# Chat and analytics indexes
+# ---------------------------
+class IndexTests(TestCase):
+    def test_every_index_exists(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT indexname FROM pg_indexes WHERE indexname LIKE 'alexa_%%'")
+            existing = {row[0] for row in cursor.fetchall()}
+        self.assertEqual(set(index_names()) - existing, set())
+
+    def test_session_page_is_an_index_scan_in_keyset_order(self):
+        month = timezone.now() - timedelta(days=30)
+        page = (
+            ChatSession.objects.filter(created_at__gte=month)
+            .annotate(messages_count=window_messages_count(month))
+            .order_by('-created_at', '-id')[:51]
+        )
+        with connection.cursor() as cursor:
+            # Empty test tables: make the planner pick what it would at scale
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('SET LOCAL enable_bitmapscan = off')
+            sql, params = page.query.sql_with_params()
+            cursor.execute(f'EXPLAIN {sql}', params)
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+        self.assertIn('Index Scan Backward using alexa_session_created_idx', plan)
+        self.assertNotIn('Sort', plan)
+        # messages_count: one (session, created_at) index probe per session on the page
+        self.assertIn('session_id_created_at_idx', plan)
+
+
+# ---------------------------
+# Archive / restore
+# ---------------------------
+class ArchiveRestoreTests(TempDirMixin, TransactionTestCase):
+    # Archiving detaches and drops partitions, which Postgres refuses while
+    # the deferred FK checks of rows inserted in the same transaction are pending
+    MONTH = date(2020, 3, 1)
+
+    def setUp(self):
+        super().setUp()
+        self.session = ChatSession.objects.create(session_id='archive-test')
+        self.interests = {'width': 10, 'features': ['hdr', 'outdoor'], 'nested': {'quantity': 2}}
+        ChatLog.objects.create(
+            session=self.session, intent='save_configuration', message='save',
+            user_interests=self.interests, suggested_products=['ABC Controller'],
+        )
+        ChatLog.objects.create(session=self.session, intent='greeting', message='hi', user_interests=None)
+        ChatMessage.objects.create(session=self.session, sender='user', message='hello', intent='greeting')
+        # auto_now_add: backdate into a month with no partition (rows sit in DEFAULT)
+        created_at = datetime(2020, 3, 15, 12, tzinfo=dt_timezone.utc)
+        ChatLog.objects.update(created_at=created_at)
+        ChatMessage.objects.update(created_at=created_at)
+
+    def test_round_trip_keeps_json_fields(self):
+        table = ChatLog._meta.db_table
+        path, count = archive_month(table, self.MONTH, self.tmp)
+        self.assertEqual(count, 2)
+        self.assertFalse(ChatLog.objects.exists())
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            archived = [json.loads(line) for line in f]
+        self.assertEqual(archived[0]['user_interests'], self.interests)
+
+        self.assertEqual(restore_archive(path), (2, 0))
+        log = ChatLog.objects.get(intent='save_configuration')
+        self.assertEqual(log.user_interests, self.interests)
+        self.assertEqual(log.suggested_products, ['ABC Controller'])
+        self.assertEqual(log.created_at, datetime(2020, 3, 15, 12, tzinfo=dt_timezone.utc))
+        self.assertIsNone(ChatLog.objects.get(intent='greeting').user_interests)
+
+        # Rows already present are skipped, not counted twice
+        self.assertEqual(restore_archive(path), (0, 2))
+
+    def test_restore_skips_rows_of_deleted_sessions(self):
+        path, _ = archive_month(ChatMessage._meta.db_table, self.MONTH, self.tmp)
+        self.session.delete()
+        self.assertEqual(restore_archive(path), (0, 1))
+
+    def test_rebuilds_refuse_to_drop_archived_months(self):
+        archive_month(ChatLog._meta.db_table, self.MONTH, settings.CHAT_ARCHIVE_DIR)
+        out = io.StringIO()
+        with self.assertRaisesMessage(CommandError, 'Alexa_chatlog 2020-03'):
+            call_command('rollup_analytics', rebuild=True, stdout=out)
+        with self.assertRaisesMessage(CommandError, 'restore_chat_archive'):
+            call_command('snapshot_analytics', rebuild=True, dataset='chatlog', stdout=out)
+        # Datasets without archived months, and explicit overrides, still rebuild
+        call_command('snapshot_analytics', rebuild=True, dataset='chatmessage', stdout=out)
+        call_command('rollup_analytics', rebuild=True, include_archived=True, stdout=out)
+
+
+# ---------------------------
+# Columnar snapshot
+# ---------------------------
+@override_settings(ANALYTICS_ROLLUP_LAG=0)
+class ColumnarSnapshotTests(TempDirMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.session = ChatSession.objects.create(session_id='columnar-test')
+
+    def log(self, *panels):
+        for panel in panels:
+            ChatLog.objects.create(session=self.session, intent='panel', message='-', selected_panel=panel)
+
+    def test_appends_segments_with_stable_dictionary_codes(self):
+        self.log('P3', None, 'P4')
+        self.assertEqual(snapshot_dataset(self.tmp, 'chatlog', segment_rows=2), 3)
+        self.assertEqual(snapshot_dataset(self.tmp, 'chatlog'), 0)
+        self.log('P4', 'P2')
+        self.assertEqual(snapshot_dataset(self.tmp, 'chatlog'), 2)
+
+        snap = open_snapshot(self.tmp, 'chatlog')
+        self.assertEqual([segment['rows'] for segment in snap.manifest['segments']], [2, 1, 2])
+        self.assertEqual(snap.dictionary('selected_panel'), ['P3', 'P4', 'P2'])
+        self.assertEqual(snap.column('selected_panel').tolist(), [0, -1, 1, 1, 2])
+        self.assertEqual(snap.decoded('selected_panel').tolist(), ['P3', None, 'P4', 'P4', 'P2'])
+        self.assertEqual(snap.column('id').tolist(), list(ChatLog.objects.order_by('id').values_list('id', flat=True)))
+        self.assertEqual(snap.column('created_at').dtype, np.dtype('datetime64[us]'))
+
+    def test_empty_snapshot_has_typed_empty_columns(self):
+        snap = open_snapshot(self.tmp, 'chatmessage')
+        self.assertEqual(snap.rows, 0)
+        self.assertEqual(snap.column('id').dtype, np.int64)
+
+
+# ---------------------------
+# Chat admin changelists
+# ---------------------------
+class ChatAdminTests(TestCase):
+    URL = '/admin/Alexa/chatlog/'
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+        session = ChatSession.objects.create(session_id='admin-test')
+        for panel in ('P3', 'P4', 'P3'):
+            ChatLog.objects.create(session=session, intent='panel', message='-', selected_panel=panel)
+
+    def test_entering_the_list_opens_the_current_month(self):
+        response = self.client.get(self.URL)
+        now = timezone.localtime()
+        self.assertRedirects(response, f"{self.URL}?created_at__year={now.year}&created_at__month={now.month}",
+                             fetch_redirect_response=False)
+        # "All dates" from the list itself shows every row
+        response = self.client.get(self.URL + '?all=', HTTP_REFERER=f'http://testserver{self.URL}')
+        self.assertEqual(response.status_code, 200)
+
+    def test_unfiltered_count_comes_from_planner_statistics(self):
+        logs = ChatLog.objects.order_by('-id')
+        self.assertEqual(EstimatedCountPaginator(logs, 100).count, 3)    # small table: exact
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE "Alexa_chatlog"')
+        with mock.patch.object(EstimatedCountPaginator, 'exact_below', 0), CaptureQueriesContext(connection) as queries:
+            self.assertEqual(EstimatedCountPaginator(logs, 100).count, 3)
+            self.assertEqual(EstimatedCountPaginator(logs.filter(selected_panel='P3'), 100).count, 2)
+        self.assertEqual(['reltuples' in query['sql'] for query in queries], [True, False])
+
+
+# ---------------------------
+# Trending (Space-Saving top-k)
+# ---------------------------
+class SpaceSavingMergeTests(TestCase):
+    CAPACITY = 20
+
+    def stream(self, seed: int, length: int) -> list:
+        rng = random.Random(seed)
+        # Zipf-like: a few heavy hitters and a long tail
+        return [f"item{min(int(rng.paretovariate(1.1)), 500)}" for _ in range(length)]
+
+    def summary(self, items) -> SpaceSaving:
+        summary = SpaceSaving(self.CAPACITY)
+        for item in items:
+            summary.add(item)
+        return summary
+
+    def assert_bounds(self, summary: SpaceSaving, items: list):
+        truth = Counter(items)
+        self.assertEqual(summary.total, len(items))
+        self.assertLessEqual(len(summary.counters), self.CAPACITY)
+        for item, (count, error) in summary.counters.items():
+            self.assertLessEqual(count - error, truth[item], item)
+            self.assertGreaterEqual(count, truth[item], item)
+        for item, true_count in truth.items():
+            if true_count > len(items) / self.CAPACITY:
+                self.assertIn(item, summary.counters)
+
+    def test_single_summary_bounds(self):
+        items = self.stream(1, 5000)
+        self.assert_bounds(self.summary(items), items)
+
+    def test_merge_keeps_bounds(self):
+        parts = [self.stream(seed, 3000) for seed in range(4)]
+        merged = SpaceSaving(self.CAPACITY)
+        for part in parts:
+            merged.merge(self.summary(part))
+        self.assert_bounds(merged, [item for part in parts for item in part])
+
+    def test_merge_with_disjoint_streams(self):
+        left = [f"a{i % 30}" for i in range(900)] + ['shared'] * 200
+        right = [f"b{i % 30}" for i in range(900)] + ['shared'] * 200
+        merged = self.summary(left).merge(self.summary(right))
+        self.assert_bounds(merged, left + right)
+        self.assertEqual(merged.top(1)[0]['value'], 'shared')
+
+    def test_dict_round_trip(self):
+        summary = self.summary(self.stream(7, 1000))
+        copy = SpaceSaving.from_dict(json.loads(json.dumps(summary.to_dict())))
+        self.assertEqual(copy.top(5), summary.top(5))
+        copy.add('new')
+        self.assertEqual(copy.total, summary.total + 1)
+
+
+@override_settings(TRENDING_FLUSH_INTERVAL=3600)
+class TrendingTests(TempDirMixin, TestCase):
+    def test_record_and_merge_other_workers(self):
+        trending.record_turn(panel='P3', purpose='mall')
+        trending.record_turn(panel='P3', unmatched='Do you ship to Dubai?')
+        trending.record_turn(panel='P10')
+        # Another worker's flushed file
+        other = SpaceSaving(10)
+        other.add('P10', 5)
+        start = trending._slot_start('minute', time.time())
+        os.makedirs(settings.TRENDING_DIR)
+        with open(os.path.join(settings.TRENDING_DIR, 'other-1.json'), 'w') as f:
+            json.dump([['panels', 'minute', start, other.to_dict()]], f)
+
+        result = trending.trending(['5m'])['5m']
+        self.assertEqual([(row['value'], row['count']) for row in result['panels']], [('P10', 6), ('P3', 2)])
+        self.assertEqual(result['unmatched'][0]['value'], 'do you ship to dubai')
+
+    def test_flush_writes_only_under_trending_dir(self):
+        trending.flush()
+        self.assertFalse(os.path.exists(settings.TRENDING_DIR))   # nothing recorded: no file
+        trending.record_turn(purpose='church')
+        trending.flush()
+        self.assertEqual(len(os.listdir(settings.TRENDING_DIR)), 1)
+
+    def test_settings_point_into_the_test_directory(self):
+        for name in CHECKOUT_DIRS:
+            self.assertTrue(getattr(settings, name).startswith(self.tmp), name)
+
+
+# ---------------------------
+# Live analytics feed (SSE)
+# ---------------------------
+class LiveFeedTests(TestCase):
+    def events(self, text: str) -> list:
+        """(event, id, data) per SSE event in ``text``."""
+        events = []
+        for block in text.split('\n\n'):
+            fields = dict(line.split(': ', 1) for line in block.splitlines() if not line.startswith((':', 'retry')))
+            if fields:
+                events.append((fields['event'], int(fields['id']), json.loads(fields['data'])))
+        return events
+
+    def publish_frames(self, bus, count: int) -> None:
+        for _ in range(count):
+            bus.publish(intent='greeting')
+            bus.seal()
+
+    def test_snapshot_then_coalesced_deltas(self):
+        bus = EventBus()
+        subscription = Subscription(bus)
+        self.assertTrue(subscription.snapshot_due())
+        first = subscription.poll(({'today': {'sessions': 4}}, bus.seal()))
+        self.assertTrue(first.startswith('retry: '))
+        self.assertEqual(self.events(first), [('snapshot', 0, {'today': {'sessions': 4}})])
+
+        bus.publish(new_session=True, intent='greeting')
+        bus.publish(intent='greeting', panel='P3')
+        bus.seal()
+        self.assertEqual(self.events(subscription.poll()), [
+            ('delta', 1, {'sessions': 1, 'intents': {'greeting': 2}, 'panels': {'P3': 1}, 'saves': 0}),
+        ])
+        self.assertEqual(subscription.poll(), '')
+
+    def test_reconnect_resumes_after_last_event_id(self):
+        bus = EventBus()
+        self.publish_frames(bus, 4)
+        subscription = Subscription(bus, last_event_id='2')
+        self.assertFalse(subscription.snapshot_due())
+        self.assertEqual([seq for _, seq, _ in self.events(subscription.poll())], [3, 4])
+
+    def test_reconnect_too_far_behind_or_ahead_resyncs(self):
+        bus = EventBus(history=2)
+        self.publish_frames(bus, 5)
+        for last_event_id in ('1', '99'):
+            subscription = Subscription(bus, last_event_id=last_event_id)
+            self.assertEqual(self.events(subscription.poll()), [])
+            self.assertTrue(subscription.snapshot_due())
+
+    @override_settings(LIVE_HEARTBEAT_SECONDS=0, LIVE_MAX_WSGI_STREAMS=1)
+    def test_keepalive_and_wsgi_stream_limit(self):
+        subscription = Subscription(EventBus(), last_event_id='0')
+        subscription.poll()
+        self.assertEqual(subscription.poll(), ': keepalive\n\n')
+
+        stream = WsgiStream.open()
+        self.assertIsNone(WsgiStream.open())
+        stream.close()
+        stream.close()    # closing twice frees one slot only
+        stream = WsgiStream.open()
+        self.assertIsNone(WsgiStream.open())
+        stream.close()
+
+
+# ---------------------------
+# Streaming XLSX
+# ---------------------------
+class SheetWriterTests(TestCase):
+    def build(self, rows, **options):
+        workbook = new_workbook()
+        writer = SheetWriter(workbook, 'Sheet', ['Name', 'Steps'], **options)
+        for row in rows:
+            writer.append(row)
+        writer.close()
+        out = io.BytesIO()
+        workbook.save(out)
+        return writer, openpyxl.load_workbook(io.BytesIO(out.getvalue())).active
+
+    def test_widths_come_from_the_sampled_rows(self):
+        rows = [['P3', 'Unpack\nMount the frame'], ['x' * 80, 'Wire']] + [['late row ' + 'y' * 40, '']] * 3
+        writer, ws = self.build(rows, sample_rows=2, wrap_columns=[2], bold_headers=True)
+        self.assertEqual(writer.rows, 5)
+        self.assertEqual(ws.max_row, 6)
+        self.assertEqual(ws.column_dimensions['A'].width, 50)      # capped at max_width
+        self.assertEqual(ws.column_dimensions['B'].width, 17)      # longest line + 2
+        self.assertTrue(ws['A1'].font.bold)
+        self.assertTrue(ws['B2'].alignment.wrap_text)
+
+    def test_fewer_rows_than_the_sample_are_written_on_close(self):
+        writer, ws = self.build([['P3', 'Mount']])
+        self.assertEqual([list(row) for row in ws.iter_rows(values_only=True)], [['Name', 'Steps'], ['P3', 'Mount']])
+        self.assertEqual(ws.column_dimensions['B'].width, 7)
+
+
+# ---------------------------
+# Export formats
+# ---------------------------
+class ExportFormatTests(TempDirMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        Product.objects.create(name='P3 Indoor', description='Indoor panel', price=32000.0,
+                               category='Indoor', guide_steps=['Unpack', 'Mount'])
+        Product.objects.create(name='ABC Controller', description='', price=1500.0)
+
+    def export(self, fmt: str) -> bytes:
+        out = io.BytesIO()
+        Export('products', fmt).write_to(out)
+        return out.getvalue()
+
+    def test_csv(self):
+        lines = self.export('csv').decode('utf-8').splitlines()
+        self.assertEqual(lines[0], 'name,description,price,category,guide_steps,created_at')
+        self.assertTrue(lines[1].startswith('P3 Indoor,Indoor panel,32000.0,Indoor,'))
+        self.assertTrue(lines[-1].startswith('ABC Controller,,1500.0,,,'))
+
+    def test_jsonl(self):
+        rows = [json.loads(line) for line in self.export('jsonl').decode('utf-8').splitlines()]
+        self.assertEqual([row['name'] for row in rows], ['P3 Indoor', 'ABC Controller'])
+        self.assertEqual(rows[0]['guide_steps'], ['Unpack', 'Mount'])
+        self.assertEqual(rows[1]['category'], '')
+
+    def test_xlsx(self):
+        ws = openpyxl.load_workbook(io.BytesIO(self.export('xlsx')), read_only=True).worksheets[0]
+        rows = list(ws.iter_rows(values_only=True))
+        self.assertEqual(rows[0][:3], ('Name', 'Description', 'Price'))
+        self.assertEqual(rows[1][:5], ('P3 Indoor', 'Indoor panel', 32000, 'Indoor', 'Unpack\nMount'))
+
+    def test_columnar(self):
+        with zipfile.ZipFile(io.BytesIO(self.export('columnar'))) as archive:
+            archive.extractall(self.tmp)
+        snapshot = open_snapshot(self.tmp, 'products')
+        self.assertEqual(snapshot.rows, 2)
+        self.assertEqual(list(snapshot.decoded('name')), ['P3 Indoor', 'ABC Controller'])
+        self.assertEqual(list(snapshot.column('price')), [32000.0, 1500.0])
+
+    def test_multi_sheet_csv_is_zipped(self):
+        export = Export('guides', 'csv')
+        self.assertEqual(export.filename, 'guides.csv.zip')
+        out = io.BytesIO()
+        export.write_to(out)
+        with zipfile.ZipFile(out) as archive:
+            self.assertEqual(archive.namelist(), ['purpose_guides.csv', 'panel_guides.csv'])
+            self.assertIn('P3 Indoor', archive.read('panel_guides.csv').decode('utf-8'))
+
+    def test_gzip_only_for_streaming_formats(self):
+        with self.assertRaises(ValueError):
+            Export('products', 'xlsx', compress=True)
+
+
+# ---------------------------
+# Background export jobs
+# ---------------------------
+@override_settings(EXPORT_JOB_RUNNER='command')
+class ExportJobTests(TempDirMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        Product.objects.create(name='P3 Indoor', description='Indoor panel', price=32000.0)
+        self.client.force_login(User.objects.create_user('staff', is_staff=True))
+
+    def test_job_is_queued_built_and_downloaded(self):
+        response = self.client.post('/api/alexa/export-jobs/', {'dataset': 'products', 'format': 'csv'},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 202)
+        status_url = f"/api/alexa/export-jobs/{response.json()['job_id']}/"
+        self.assertEqual(self.client.get(status_url).json()['status'], 'queued')
+
+        self.assertTrue(run_next())
+        self.assertFalse(run_next())
+        job = self.client.get(status_url).json()
+        self.assertEqual(job['status'], 'done')
+        download = self.client.get(f"{status_url}download/")
+        self.assertEqual(download.status_code, 200)
+        body = b''.join(download.streaming_content).decode('utf-8')
+        self.assertEqual(len(body.encode('utf-8')), job['size'])
+        self.assertIn('P3 Indoor', body)
+
+    def test_same_export_reuses_the_pending_then_finished_job(self):
+        job, created = enqueue(Export('products', 'csv'))
+        self.assertTrue(created)
+        self.assertEqual(enqueue(Export('products', 'csv')), (job, False))
+        run_next()
+        self.assertEqual(enqueue(Export('products', 'csv')), (job, False))
+        # New data, new cache key, new job
+        Product.objects.create(name='ABC Controller', description='', price=1500.0)
+        self.assertTrue(enqueue(Export('products', 'csv'))[1])
+
+    def test_download_before_done_is_a_conflict(self):
+        job, _ = enqueue(Export('products', 'csv'))
+        response = self.client.get(f"/api/alexa/export-jobs/{job.job_id}/download/")
+        self.assertEqual(response.status_code, 409)
+
+    def test_stale_running_job_is_failed_and_not_reused(self):
+        job, _ = enqueue(Export('products', 'csv'))
+        ExportJob.objects.filter(pk=job.pk).update(status='running', started_at=timezone.now() - timedelta(hours=2))
+        self.assertEqual(fail_stale(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertNotEqual(enqueue(Export('products', 'csv'))[0], job)
+
+    def test_prune_removes_old_files_and_jobs(self):
+        old, _ = enqueue(Export('products', 'csv'))
+        run_next()
+        recent, _ = enqueue(Export('products', 'jsonl'))
+        run_next()
+        week_ago = time.time() - 8 * 86400
+        os.utime(artifact_path(old), (week_ago, week_ago))
+        ExportJob.objects.filter(pk=old.pk).update(finished_at=timezone.now() - timedelta(days=8))
+        self.assertEqual(prune(), 1)
+        self.assertFalse(os.path.exists(artifact_path(old)))
+        self.assertTrue(os.path.exists(artifact_path(recent)))
+        self.assertEqual(list(ExportJob.objects.values_list('pk', flat=True)), [recent.pk])
+
+
+# ---------------------------
+# Conditional export downloads (ETag / 304)
+# ---------------------------
+class ConditionalExportTests(TempDirMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.product = Product.objects.create(name='P3 Indoor', description='Indoor panel', price=32000.0)
+
+    def get(self, url='/api/alexa/export/products/', **headers):
+        return self.client.get(url, {'format': 'csv'}, headers=headers)
+
+    def test_unchanged_export_revalidates_to_304(self):
+        first = self.get()
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first['Cache-Control'], 'no-cache')
+        self.assertIn('Last-Modified', first)
+        etag = first['ETag']
+        again = self.get(if_none_match=etag)
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again['ETag'], etag)
+        self.assertEqual(self.get(if_modified_since=first['Last-Modified']).status_code, 304)
+
+    def test_changed_data_changes_the_etag(self):
+        etag = self.get()['ETag']
+        self.product.price = 30000.0
+        self.product.save()
+        response = self.get(if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn('30000.0', b''.join(response.streaming_content).decode('utf-8'))
+
+    def test_private_dataset_stays_out_of_shared_caches(self):
+        self.client.force_login(User.objects.create_user('staff', is_staff=True))
+        response = self.get('/api/alexa/export/transcripts/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+
+
+# ---------------------------
+# Import
+# ---------------------------
+class ImportTests(TempDirMixin, TestCase):
+    def workbook(self, *sheets) -> io.BytesIO:
+        workbook = openpyxl.Workbook()
+        workbook.remove(workbook.active)
+        for title, rows in sheets:
+            ws = workbook.create_sheet(title)
+            for row in rows:
+                ws.append(row)
+        out = io.BytesIO()
+        workbook.save(out)
+        out.seek(0)
+        return out
+
+    def test_export_import_round_trip(self):
+        Product.objects.create(name='P3 Indoor', description='Indoor panel', price=32000.0,
+                               category='Indoor', guide_steps=['Unpack', 'Mount'])
+        out = io.BytesIO()
+        Export('products', 'xlsx').write_to(out)
+        Product.objects.all().delete()
+        out.seek(0)
+        report = import_workbook(out)
+        self.assertEqual(report['error_count'], 0)
+        product = Product.objects.get(name='P3 Indoor')
+        self.assertEqual((product.price, product.category, product.guide_steps), (32000.0, 'Indoor', ['Unpack', 'Mount']))
+
+        # Unchanged rows are not written again
+        out.seek(0)
+        self.assertEqual(import_workbook(out)['sheets'][0]['written'], 0)
+
+    def test_row_errors_do_not_stop_the_import(self):
+        report = import_workbook(self.workbook(('Products', [
+            ['Name', 'Price', 'Category'],
+            ['Good', '₹1,200', 'Indoor'],
+            ['', 10, ''],
+            ['No price', None, ''],
+            ['Bad price', 'call us', ''],
+        ])))
+        self.assertEqual(report['sheets'][0]['written'], 1)
+        self.assertEqual(Product.objects.get(name='Good').price, 1200.0)
+        self.assertEqual([(error['row'], error['error']) for error in report['errors']], [
+            (3, 'Name is required'), (4, 'Price is required'), (5, "Price 'call us' is not a number"),
+        ])
+
+    def test_prices_are_parsed_strictly(self):
+        Product.objects.create(name='Range', description='', price=250000.0)
+        report = import_workbook(self.workbook(('Products', [
+            ['Name', 'Price'],
+            ['Lakh', '₹2,50,000/-'],
+            ['Range', '₹250,000 – ₹320,000'],
+            ['Version', 'v1.2'],
+            ['Ambiguous', '12,00'],
+        ])))
+        self.assertEqual(Product.objects.get(name='Lakh').price, 250000.0)
+        # A bad price is a row error and never overwrites the stored one
+        self.assertEqual(Product.objects.get(name='Range').price, 250000.0)
+        self.assertFalse(Product.objects.filter(name__in=['Version', 'Ambiguous']).exists())
+        self.assertEqual([(error['row'], error['error']) for error in report['errors']], [
+            (3, "Price '₹250,000 – ₹320,000' is a range or has several numbers; give one price"),
+            (4, "Price 'v1.2' is not a number"),
+            (5, "Price '12,00' is not a number"),
+        ])
+
+    def test_guide_sheet_updates_existing_products_by_name(self):
+        Product.objects.create(name='P3 Indoor', description='Indoor panel', price=32000.0)
+        report = import_workbook(self.workbook(
+            ('Panel Guides', [['Panel Name', 'Guide Steps'], ['P3 Indoor', 'Unpack\nMount'], ['Unknown', 'Step']]),
+        ))
+        self.assertEqual(report['sheets'][0]['kind'], 'product_updates')
+        self.assertEqual(report['errors'], [{'sheet': 'Panel Guides', 'row': 3, 'error': "No product named 'Unknown'"}])
+        product = Product.objects.get(name='P3 Indoor')
+        self.assertEqual((product.guide_steps, product.price, product.description), (['Unpack', 'Mount'], 32000.0, 'Indoor panel'))
+        self.assertFalse(Product.objects.filter(name='Unknown').exists())
+
+    def test_specs_sheet_type_from_title(self):
+        report = import_workbook(self.workbook(('Indoor', [['Model', 'Pixel Pitch', 'LED Type'], ['P2.5', '2.5mm', 'SMD, COB']])))
+        self.assertEqual(report['sheets'][0]['kind'], 'specs')
+        self.assertEqual(report['sheets'][0]['written'], 1)
+
+
+# ---------------------------
+# Delta product export
+# ---------------------------
+@override_settings(EXPORT_DELTA_LAG=0, PRODUCT_TOMBSTONE_RETENTION_DAYS=90)
+class ProductChangesTests(TempDirMixin, TestCase):
+    def pull(self, since=None):
+        # A full sync (no since) that also returns the first watermark
+        params = {'format': 'jsonl', **({'since': since} if since else {})}
+        response = self.client.get('/api/alexa/export/product_changes/', params)
+        self.assertEqual(response.status_code, 200)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return [json.loads(line) for line in body.decode('utf-8').splitlines()], response['X-Watermark']
+
+    def test_changes_and_tombstones_since_the_watermark(self):
+        kept = Product.objects.create(name='P3 Indoor', description='', price=32000.0)
+        dropped = Product.objects.create(name='P4 Outdoor', description='', price=41000.0)
+        Product.objects.create(name='ABC Controller', description='', price=1500.0)
+        rows, watermark = self.pull()
+        self.assertEqual(len(rows), 3)
+
+        kept.price = 30000.0
+        kept.save()
+        dropped_id = dropped.pk
+        dropped.delete()
+        added = Product.objects.create(name='P2 Indoor', description='', price=45000.0)
+        rows, next_watermark = self.pull(since=watermark)
+        self.assertEqual(
+            [(row['change'], row['id'], row.get('price')) for row in rows],
+            [('upsert', kept.pk, 30000.0), ('delete', dropped_id, None), ('upsert', added.pk, 45000.0)],
+        )
+        self.assertEqual(self.pull(since=next_watermark)[0], [])
+
+    def test_watermark_older_than_the_tombstone_window_needs_a_full_export(self):
+        since = (timezone.now() - timedelta(days=91)).isoformat()
+        response = self.client.get('/api/alexa/export-products/', {'format': 'jsonl', 'since': since})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('full export', response.json()['error'])
+
+    def test_expired_tombstones_are_pruned(self):
+        Product.objects.create(name='Old', description='', price=1.0).delete()
+        Product.objects.create(name='Recent', description='', price=1.0).delete()
+        ProductTombstone.objects.filter(name='Old').update(deleted_at=timezone.now() - timedelta(days=91))
+        prune()
+        self.assertEqual(list(ProductTombstone.objects.values_list('name', flat=True)), ['Recent'])
@@ -0,0 +1,172 @@
+"""
+Time-series analytics over arbitrary buckets.
+
+Counts are grouped in the database with ``date_trunc`` (Django ``Trunc``)
+in the requested timezone. A bucket that ended more than
+``settings.ANALYTICS_ROLLUP_LAG`` seconds ago can no longer change, so it
+is cached forever under a key naming its metric, size, timezone and start.
+Only the open bucket, and any closed bucket not yet cached, is queried on
+each request.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from .models import ChatLog, ChatMessage, ChatSession
+
+# metric -> (model, field broken down by or None)
+METRICS = {
+    'sessions': (ChatSession, None),
+    'messages': (ChatMessage, None),
+    'intents': (ChatLog, 'intent'),
+    'panels': (ChatLog, 'selected_panel'),
+    'purposes': (ChatLog, 'purpose'),
+}
+
+BUCKETS = ('hour', 'day', 'week', 'month')
+
+# Range used when no start is given
+DEFAULT_SPAN = {
+    'hour': timedelta(hours=48),
+    'day': timedelta(days=30),
+    'week': timedelta(weeks=26),
+    'month': timedelta(days=365),
+}
+
+MAX_BUCKETS = 1000
+
+
+def _local(moment, tz):
+    return timezone.localtime(moment, tz).replace(tzinfo=None)
+
+
+def _aware(naive, tz):
+    return timezone.make_aware(naive, tz)
+
+
+def bucket_floor(moment, bucket: str, tz):
+    """Start of the bucket containing ``moment``, as date_trunc computes it in ``tz``."""
+    local = _local(moment, tz)
+    if bucket == 'hour':
+        # In UTC: a local hour can repeat when clocks go back, so it cannot
+        # be turned back into one aware time
+        floored = moment.astimezone(dt_timezone.utc) - timedelta(
+            minutes=local.minute, seconds=local.second, microseconds=local.microsecond,
+        )
+        return floored.astimezone(tz)
+    local = local.replace(hour=0, minute=0, second=0, microsecond=0)
+    if bucket == 'week':
+        local -= timedelta(days=local.weekday())  # ISO weeks start on Monday
+    elif bucket == 'month':
+        local = local.replace(day=1)
+    return _aware(local, tz)
+
+
+def bucket_next(start, bucket: str, tz):
+    if bucket == 'hour':
+        # Step in absolute time so DST changes don't repeat or skip hours
+        # (aware + timedelta is wall-clock arithmetic)
+        return bucket_floor(start.astimezone(dt_timezone.utc) + timedelta(hours=1), bucket, tz)
+    local = _local(start, tz)
+    if bucket == 'day':
+        local += timedelta(days=1)
+    elif bucket == 'week':
+        local += timedelta(weeks=1)
+    else:
+        local = datetime(local.year + local.month // 12, local.month % 12 + 1, 1)
+    return _aware(local, tz)
+
+
+def bucket_starts(start, end, bucket: str, tz) -> list:
+    starts = []
+    current = bucket_floor(start, bucket, tz)
+    while current < end:
+        starts.append(current)
+        if len(starts) > MAX_BUCKETS:
+            raise ValueError(f"Range covers more than {MAX_BUCKETS} {bucket} buckets")
+        current = bucket_next(current, bucket, tz)
+    return starts
+
+
+def _query(metric: str, bucket: str, tz, start, end) -> dict:
+    """{bucket start timestamp: count or {value: count}} for [start, end)."""
+    model, field = METRICS[metric]
+    rows = (
+        model.objects.filter(created_at__gte=start, created_at__lt=end)
+        .annotate(bucket=Trunc('created_at', bucket, tzinfo=tz))
+        .order_by()
+    )
+    results = {}
+    if field is None:
+        for item in rows.values('bucket').annotate(count=Count('id')):
+            results[item['bucket'].timestamp()] = item['count']
+    else:
+        grouped = rows.exclude(**{f'{field}__isnull': True}).values('bucket', field).annotate(count=Count('id'))
+        for item in grouped:
+            results.setdefault(item['bucket'].timestamp(), {})[item[field]] = item['count']
+    return results
+
+
+def _cache_key(metric: str, bucket: str, tz, start) -> str:
+    return f"timeseries:{metric}:{bucket}:{tz}:{int(start.timestamp())}"
+
+
+def time_series(metric: str, bucket: str, tz, start, end) -> dict:
+    """
+    Points for every bucket overlapping [start, end), in order. Grouped
+    metrics give a per-value ``breakdown`` alongside the bucket total.
+    """
+    cache = caches[getattr(settings, 'TIMESERIES_CACHE', 'default')]
+    _, field = METRICS[metric]
+    empty = 0 if field is None else {}
+    settled = timezone.now() - timedelta(seconds=getattr(settings, 'ANALYTICS_ROLLUP_LAG', 5))
+
+    starts = bucket_starts(start, end, bucket, tz)
+    ends = [bucket_next(s, bucket, tz) for s in starts]
+    closed = [s for s, e in zip(starts, ends) if e <= settled]
+    open_ = [s for s, e in zip(starts, ends) if e > settled]
+
+    values = {}
+    cached = cache.get_many([_cache_key(metric, bucket, tz, s) for s in closed])
+    missing = []
+    for s in closed:
+        key = _cache_key(metric, bucket, tz, s)
+        if key in cached:
+            values[s] = cached[key]
+        else:
+            missing.append(s)
+
+    if missing:
+        # One query over the span of the uncached closed buckets
+        computed = _query(metric, bucket, tz, missing[0], bucket_next(missing[-1], bucket, tz))
+        fresh = {}
+        for s in missing:
+            values[s] = computed.get(s.timestamp(), empty)
+            fresh[_cache_key(metric, bucket, tz, s)] = values[s]
+        cache.set_many(fresh, timeout=None)
+
+    if open_:
+        computed = _query(metric, bucket, tz, open_[0], bucket_next(open_[-1], bucket, tz))
+        for s in open_:
+            values[s] = computed.get(s.timestamp(), empty)
+
+    points = []
+    for s in starts:
+        value = values[s]
+        point = {'bucket': timezone.localtime(s, tz).isoformat()}
+        if field is None:
+            point['count'] = value
+        else:
+            point['count'] = sum(value.values())
+            point['breakdown'] = value
+        points.append(point)
+
+    return {
+        'points': points,
+        'cached_buckets': len(closed) - len(missing),
+        'computed_buckets': len(missing) + len(open_),
+    }
@@ -0,0 +1,99 @@
+"""
+Space-Saving top-k (heavy hitter) counter.
+
+A summary keeps at most ``capacity`` items with a count and an error. An
+unseen item takes over the slot of the current minimum, inheriting its
+count as error, so every kept count over-estimates the true count by at
+most ``error``, and any item seen more than N / capacity times (N = total
+added) is guaranteed to be kept. ``count - error`` is a lower bound.
+
+Summaries merge (Agarwal et al., "Mergeable Summaries"): an item missing
+from a full summary may have been seen up to that summary's minimum count,
+so the minimum is added to its count and error before keeping the top
+``capacity``. Merged per-minute / per-worker summaries keep the same
+guarantee over the combined stream.
+"""
+import heapq
+
+DEFAULT_CAPACITY = 200
+
+
+class SpaceSaving:
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        if capacity < 1:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self.total = 0
+        self.counters = {}   # item -> [count, error]
+        self._heap = []      # lazy (count, item) entries; stale ones are skipped
+
+    def add(self, item: str, n: int = 1) -> None:
+        self.total += n
+        counter = self.counters.get(item)
+        if counter is None:
+            if len(self.counters) < self.capacity:
+                counter = self.counters[item] = [0, 0]
+            else:
+                _, evicted = self._pop_min()
+                floor = self.counters.pop(evicted)[0]
+                counter = self.counters[item] = [floor, floor]
+        counter[0] += n
+        self._push(item, counter[0])
+
+    def _push(self, item: str, count: int) -> None:
+        heapq.heappush(self._heap, (count, item))
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(counter[0], key) for key, counter in self.counters.items()]
+            heapq.heapify(self._heap)
+
+    def _pop_min(self) -> tuple:
+        while True:
+            count, item = heapq.heappop(self._heap)
+            counter = self.counters.get(item)
+            if counter is not None and counter[0] == count:
+                return count, item
+
+    def min_count(self) -> int:
+        """What an item not in a full summary may have been counted up to."""
+        if len(self.counters) < self.capacity:
+            return 0
+        return min(counter[0] for counter in self.counters.values())
+
+    def merge(self, other: 'SpaceSaving') -> 'SpaceSaving':
+        """Fold ``other`` into this summary (in place) and return self."""
+        own_floor, other_floor = self.min_count(), other.min_count()
+        merged = {}
+        for item in set(self.counters) | set(other.counters):
+            count, error = self.counters.get(item, (own_floor, own_floor))
+            other_count, other_error = other.counters.get(item, (other_floor, other_floor))
+            merged[item] = [count + other_count, error + other_error]
+        if len(merged) > self.capacity:
+            merged = dict(sorted(merged.items(), key=lambda kv: -kv[1][0])[:self.capacity])
+        self.counters = merged
+        self.total += other.total
+        self._heap = [(counter[0], key) for key, counter in merged.items()]
+        heapq.heapify(self._heap)
+        return self
+
+    def top(self, limit: int = 10) -> list:
+        ranked = sorted(self.counters.items(), key=lambda kv: (-kv[1][0], kv[0]))[:limit]
+        return [
+            {'value': item, 'count': count, 'guaranteed': count - error}
+            for item, (count, error) in ranked
+        ]
+
+    def to_dict(self) -> dict:
+        return {
+            'capacity': self.capacity,
+            'total': self.total,
+            'items': [[item, count, error] for item, (count, error) in self.counters.items()],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'SpaceSaving':
+        summary = cls(capacity=data['capacity'])
+        summary.total = data['total']
+        summary.counters = {item: [count, error] for item, count, error in data['items']}
+        summary._heap = [(counter[0], key) for key, counter in summary.counters.items()]
+        heapq.heapify(summary._heap)
+        return summary
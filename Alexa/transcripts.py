@@ -0,0 +1,57 @@
+"""
+Chat transcript rows for the 'transcripts' export (see exports.py).
+
+Rows come from ``.iterator(chunk_size=...)`` (a server-side cursor on
+Postgres), so memory use does not depend on the size of the date range.
+"""
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import ChatMessage
+
+COLUMNS = [
+    'session_id', 'session_created_at', 'message_id', 'sender',
+    'message', 'response', 'intent', 'created_at',
+]
+
+_FIELDS = {
+    'session_id': 'session__session_id',
+    'session_created_at': 'session__created_at',
+    'message_id': 'id',
+    'sender': 'sender',
+    'message': 'message',
+    'response': 'response',
+    'intent': 'intent',
+    'created_at': 'created_at',
+}
+
+
+def parse_bound(value: str, end: bool = False, tzinfo=None):
+    """
+    Aware datetime from 'YYYY-MM-DD' or an ISO timestamp (naive values are
+    read in ``tzinfo``, default the current timezone). A bare date used as
+    an end bound means the whole day is included. ValueError if invalid.
+    """
+    day = parse_date(value)
+    if day is not None:
+        moment = datetime.combine(day + timedelta(days=1) if end else day, time.min)
+    else:
+        moment = parse_datetime(value)
+        if moment is None:
+            raise ValueError(f"Invalid date: {value!r}")
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment, tzinfo)
+    return moment
+
+
+def iter_transcript_rows(start, end, chunk_size: int = 2000):
+    """One dict per message in [start, end), oldest first."""
+    rows = (
+        ChatMessage.objects.filter(created_at__gte=start, created_at__lt=end)
+        .order_by('created_at', 'id')
+        .values_list(*_FIELDS.values())
+    )
+    for values in rows.iterator(chunk_size=chunk_size):
+        yield dict(zip(COLUMNS, values))
@@ -0,0 +1,175 @@
+"""
+What is hot right now: Space-Saving top-k over sliding windows.
+
+``record_turn()`` is called by the chat path with what happened in the
+turn: a newly selected panel or purpose, a compared pair, or a message
+that fell through to the general fallback. Each worker keeps one
+``SpaceSaving`` summary per dimension and time slot: per minute (for the
+5 minute and 1 hour windows) and per hour (for the 1 day window). Slots
+older than their window are dropped, so a window is the merge of the
+slots it covers; the current, partial slot counts in full.
+
+Every ``settings.TRENDING_FLUSH_INTERVAL`` seconds a worker writes its
+slots to ``<TRENDING_DIR>/<host>-<pid>.json`` (atomic replace). ``trending()``
+merges the files of every worker with this worker's live slots, so any
+worker can answer for all of them. Files not touched for a day belong to
+dead workers and are removed.
+"""
+import atexit
+import json
+import logging
+import os
+import re
+import socket
+import threading
+import time
+
+from django.conf import settings
+
+from .topk import DEFAULT_CAPACITY, SpaceSaving
+
+logger = logging.getLogger(__name__)
+
+DIMENSIONS = ('panels', 'purposes', 'compared', 'unmatched')
+
+# window -> (slot kind, slot seconds, slots in the window)
+WINDOWS = {
+    '5m': ('minute', 60, 5),
+    '1h': ('minute', 60, 60),
+    '1d': ('hour', 3600, 24),
+}
+SLOT_SECONDS = {'minute': 60, 'hour': 3600}
+RETAIN_SLOTS = {'minute': 60, 'hour': 24}
+STALE_AFTER = 86400
+
+_slots = {}   # (dimension, slot kind, slot start) -> SpaceSaving
+_lock = threading.Lock()
+_last_flush = time.monotonic()
+_flush_at_exit = False
+
+
+def _slot_start(kind: str, now: float) -> int:
+    return int(now) // SLOT_SECONDS[kind] * SLOT_SECONDS[kind]
+
+
+def _capacity() -> int:
+    return getattr(settings, 'TRENDING_CAPACITY', DEFAULT_CAPACITY)
+
+
+def normalize_message(message: str) -> str:
+    """Group unmatched messages that differ only in case, spacing or trailing punctuation."""
+    return re.sub(r"\s+", " ", message.lower()).strip(" .,!?;:")[:120]
+
+
+def _prune(now: float) -> None:
+    oldest = {kind: _slot_start(kind, now) - (RETAIN_SLOTS[kind] - 1) * SLOT_SECONDS[kind] for kind in SLOT_SECONDS}
+    for key in [key for key in _slots if key[2] < oldest[key[1]]]:
+        del _slots[key]
+
+
+def record_turn(panel: str = None, purpose: str = None, compared: tuple = None, unmatched: str = None) -> None:
+    items = []
+    if panel:
+        items.append(('panels', panel[:100]))
+    if purpose:
+        items.append(('purposes', purpose[:100]))
+    if compared:
+        items.append(('compared', ' vs '.join(sorted(compared))))
+    if unmatched:
+        text = normalize_message(unmatched)
+        if text:
+            items.append(('unmatched', text))
+    if not items:
+        return
+
+    global _flush_at_exit
+    now = time.time()
+    with _lock:
+        if not _flush_at_exit:
+            # Only processes that recorded something leave a file behind
+            atexit.register(flush)
+            _flush_at_exit = True
+        for dimension, value in items:
+            for kind in SLOT_SECONDS:
+                key = (dimension, kind, _slot_start(kind, now))
+                summary = _slots.get(key)
+                if summary is None:
+                    summary = _slots[key] = SpaceSaving(_capacity())
+                summary.add(value)
+        due = time.monotonic() - _last_flush >= getattr(settings, 'TRENDING_FLUSH_INTERVAL', 5)
+    if due:
+        flush()
+
+
+def _worker_file() -> str:
+    # pid read at write time: workers forked after import each get their own file
+    return os.path.join(settings.TRENDING_DIR, f"{socket.gethostname()}-{os.getpid()}.json")
+
+
+def flush() -> None:
+    """Write this worker's slots to its file for the other workers to read."""
+    global _last_flush
+    with _lock:
+        _last_flush = time.monotonic()
+        _prune(time.time())
+        state = [[dimension, kind, start, summary.to_dict()] for (dimension, kind, start), summary in _slots.items()]
+    path = _worker_file()
+    if not state:
+        # Nothing in the window: no file, rather than an empty one per process
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return
+    tmp_path = f"{path}.tmp"
+    try:
+        os.makedirs(settings.TRENDING_DIR, exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"Could not write trending state {path}: {e}")
+
+
+def _worker_states(now: float):
+    """Slot lists from the other workers' files; stale files are removed."""
+    own = _worker_file()
+    try:
+        names = os.listdir(settings.TRENDING_DIR)
+    except FileNotFoundError:
+        return
+    for name in names:
+        path = os.path.join(settings.TRENDING_DIR, name)
+        if not name.endswith('.json') or path == own:
+            continue
+        try:
+            if now - os.path.getmtime(path) > STALE_AFTER:
+                os.remove(path)
+                continue
+            with open(path, encoding='utf-8') as f:
+                yield json.load(f)
+        except (OSError, ValueError):
+            # Replaced or removed while we looked; its worker writes again soon
+            continue
+
+
+def trending(windows=None, limit: int = 10) -> dict:
+    """window -> dimension -> top ``limit`` [{'value', 'count', 'guaranteed'}], merged over workers."""
+    windows = windows or list(WINDOWS)
+    now = time.time()
+    with _lock:
+        _prune(now)
+        slots = [(key, SpaceSaving.from_dict(summary.to_dict())) for key, summary in _slots.items()]
+    for state in _worker_states(now):
+        slots.extend(((dimension, kind, start), SpaceSaving.from_dict(data)) for dimension, kind, start, data in state)
+
+    result = {}
+    for window in windows:
+        kind, seconds, count = WINDOWS[window]
+        since = _slot_start(kind, now) - (count - 1) * seconds
+        merged = {dimension: SpaceSaving(_capacity()) for dimension in DIMENSIONS}
+        for (dimension, slot_kind, start), summary in slots:
+            if slot_kind == kind and start >= since and dimension in merged:
+                merged[dimension].merge(summary)
+        result[window] = {dimension: summary.top(limit) for dimension, summary in merged.items()}
+    return result
@@ -5,13 +5,32 @@ from rest_framework import status
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from .models import ChatLog, ChatSession, ChatMessage
-from django.db.models import Count
-from django.db.models.functions import TruncDate
+from .chatbot_logic import answer_knowledge_question
+from .coalesce import KNOWLEDGE_FLIGHT
+from .product_matcher import find_product_mentions
+from .resilience import DEGRADED_ANSWERS, LLM_BREAKER
+from .retrieval import retrieval_timings
+from .funnel import funnel_report, refresh_funnel, save_rate_trend
+from .hll import HyperLogLog
+from .live import publish as publish_live
+from .rollups import catch_up, daily_counts, top_values
+from .timeseries import BUCKETS, DEFAULT_SPAN, METRICS, time_series
+from .transcripts import parse_bound
+from .trending import WINDOWS as TRENDING_WINDOWS, record_turn as record_trending, trending
+from .uniques import count_uniques, flush as flush_uniques, record_turn, top_uniques
+from django.db.models import Count, OuterRef, Prefetch, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.conf import settings
 from django.utils import timezone
-from datetime import timedelta
+from datetime import datetime, timedelta
+import base64
+import binascii
+import json
+import os
 import re
 import uuid
 import logging
+import zoneinfo
 
 # ---------------------------
 # In-memory session store (prototype)
@@ -839,6 +858,8 @@ class EnhancedChatbot:
                 "conversation_ended": False
             }
         self.state = SESSIONS[session_id]
+        # (panel, panel) keys of a comparison answered this turn
+        self.last_comparison = None
 
     def get_reply(self, message: str) -> dict:
         if self.state.get('conversation_ended') and message.strip():
@@ -1069,7 +1090,9 @@ class EnhancedChatbot:
         if follow_up:
             return follow_up
 
-        # fallback general
+        # fallback general: free-form questions go to the knowledge pipeline
+        if message.strip():
+            return self._knowledge_fallback(message)
         response = self._wrap("Good afternoon. How can I assist you today? You can ask for 'indoor panels' or 'outdoor panels'.", "general")
         return response
 
@@ -1918,6 +1941,7 @@ class EnhancedChatbot:
         details_a = INDOOR_SPECS.get(a_key) or OUTDOOR_SPECS.get(a_key) or RENTAL_SPECS.get(a_key)
         details_b = INDOOR_SPECS.get(b_key) or OUTDOOR_SPECS.get(b_key) or RENTAL_SPECS.get(b_key)
         comp = self._format_comparison(a_key, details_a, b_key, details_b)
+        self.last_comparison = (a_key, b_key)
         return {
             "session_id": self.session_id,
             "reply": comp,
@@ -1938,6 +1962,8 @@ class EnhancedChatbot:
         if "software" in m:
             return self._wrap("We use software compatible with our LED controllers, such as NovaStar's LED Studio or Colorlight's software, for programming and controlling LED displays.", "knowledge")
         # fallback
+        if message.strip():
+            return self._knowledge_fallback(message)
         return self._wrap("Could you clarify your question? Ask about pixel pitch, manufacturer, cleaning, controllers, software, or a specific panel model.", "knowledge")
 
     # Handle price queries
@@ -2111,6 +2137,13 @@ class EnhancedChatbot:
     def _wrap(self, text: str, intent: str) -> dict:
         return {"session_id": self.session_id, "reply": text, "intent": intent}
 
+    def _knowledge_fallback(self, message: str) -> dict:
+        reply, answered = answer_knowledge_question(message)
+        response = self._wrap(reply, "knowledge")
+        # Nothing in the knowledge base either: an unmatched question (see trending)
+        response['unmatched'] = not answered
+        return response
+
     def _normalize_key(self, msg: str) -> str:
         # Accept variants: "p3mm", "P3mm", "p3.91mm", "p391", etc.
         s = msg.strip()
@@ -2255,29 +2288,170 @@ class AnalyticsAPIView(APIView):
         timestamp = timezone.now().isoformat()
         logger.info(f"Request received: {request.method} {request.path} | IP: {ip_address} | User-Agent: {user_agent} | Timestamp: {timestamp}")
 
+        # Fold in rows logged since the last request; bounded so a large
+        # backlog is spread over requests (or left to `rollup_analytics`)
+        catch_up(max_batches=getattr(settings, 'ANALYTICS_ROLLUP_MAX_BATCHES', 1))
+
         # Top searched panels
-        top_panels = ChatLog.objects.values('selected_panel').annotate(count=Count('selected_panel')).order_by('-count')[:10]
-        top_panels_data = [{'panel': item['selected_panel'] or 'Unknown', 'count': item['count']} for item in top_panels]
+        top_panels_data = [{'panel': item['value'], 'count': item['count']} for item in top_values('panel')]
 
         # Most common purposes
-        common_purposes = ChatLog.objects.values('purpose').annotate(count=Count('purpose')).order_by('-count')[:10]
-        purposes_data = [{'purpose': item['purpose'] or 'Unknown', 'count': item['count']} for item in common_purposes]
-
-        # Daily user count (unique sessions per day)
-        daily_users = ChatSession.objects.annotate(date=TruncDate('created_at')).values('date').annotate(count=Count('session_id', distinct=True)).order_by('date')
-        daily_users_data = [{'date': item['date'].isoformat(), 'count': item['count']} for item in daily_users]
+        purposes_data = [{'purpose': item['value'], 'count': item['count']} for item in top_values('purpose')]
+
+        # Daily user count (sessions started per day)
+        daily_users_data = [{'date': item['day'].isoformat(), 'count': item['count']} for item in daily_counts('sessions')]
+
+        # Unique sessions / visitors from merged HyperLogLog sketches
+        flush_uniques()
+        today = timezone.localdate()
+        periods = {
+            'today': today,
+            'week': today - timedelta(days=6),
+            'month': today.replace(day=1),
+            'year': today.replace(month=1, day=1),
+        }
+        uniques_data = {
+            'error_bound': round(HyperLogLog.error_bound(), 4),
+            'sessions': {name: count_uniques('sessions', start) for name, start in periods.items()},
+            'visitors': {name: count_uniques('visitors', start) for name, start in periods.items()},
+            'panels_this_month': top_uniques('panel', periods['month']),
+            'purposes_this_month': top_uniques('purpose', periods['month']),
+        }
 
         return Response({
             'top_panels': top_panels_data,
             'common_purposes': purposes_data,
-            'daily_users': daily_users_data
+            'daily_users': daily_users_data,
+            'uniques': uniques_data
+        }, status=status.HTTP_200_OK)
+
+# ---------------------------
+# Time-Series Analytics API View
+# ---------------------------
+@method_decorator(csrf_exempt, name='dispatch')
+class TimeSeriesAPIView(APIView):
+    def get(self, request):
+        # ?metric=sessions|messages|intents|panels|purposes&bucket=hour|day|week|month&tz=&start=&end=
+        metric = request.query_params.get('metric', 'sessions')
+        bucket = request.query_params.get('bucket', 'day')
+        if metric not in METRICS:
+            return Response({'error': f"Invalid metric. Use: {', '.join(METRICS)}"}, status=status.HTTP_400_BAD_REQUEST)
+        if bucket not in BUCKETS:
+            return Response({'error': f"Invalid bucket. Use: {', '.join(BUCKETS)}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            tz = zoneinfo.ZoneInfo(request.query_params.get('tz', settings.TIME_ZONE))
+        except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+            return Response({'error': 'Invalid timezone'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            end = request.query_params.get('end')
+            end = parse_bound(end, end=True, tzinfo=tz) if end else timezone.now()
+            start = request.query_params.get('start')
+            start = parse_bound(start, tzinfo=tz) if start else end - DEFAULT_SPAN[bucket]
+            series = time_series(metric, bucket, tz, start, end)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'metric': metric,
+            'bucket': bucket,
+            'tz': str(tz),
+            'start': timezone.localtime(start, tz).isoformat(),
+            'end': timezone.localtime(end, tz).isoformat(),
+            **series,
+        }, status=status.HTTP_200_OK)
+
+# ---------------------------
+# Conversation Funnel API View
+# ---------------------------
+@method_decorator(csrf_exempt, name='dispatch')
+class FunnelAPIView(APIView):
+    def get(self, request):
+        # ?days=30 (window for both parts); ?trend_only=1 for cheap dashboard polling
+        try:
+            days = max(1, min(int(request.query_params.get('days', 30)), 366))
+        except ValueError:
+            return Response({'error': 'days must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+        refresh_funnel(max_batches=getattr(settings, 'ANALYTICS_ROLLUP_MAX_BATCHES', 1))
+
+        data = {'days': days, 'save_rate_trend': save_rate_trend(days)}
+        if request.query_params.get('trend_only', '').lower() not in ('1', 'true', 'yes'):
+            data['steps'] = funnel_report(since=timezone.now() - timedelta(days=days))
+        return Response(data, status=status.HTTP_200_OK)
+
+# ---------------------------
+# Trending API View (heavy hitters, merged across workers)
+# ---------------------------
+@method_decorator(csrf_exempt, name='dispatch')
+class TrendingAPIView(APIView):
+    def get(self, request):
+        # ?window=5m|1h|1d (default: all three); ?limit=10
+        window = request.query_params.get('window')
+        if window and window not in TRENDING_WINDOWS:
+            return Response({'error': f"Unknown window {window!r}. Use: {', '.join(TRENDING_WINDOWS)}"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 10)), 100))
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'generated_at': timezone.now(),
+            'windows': trending([window] if window else None, limit=limit),
+        }, status=status.HTTP_200_OK)
+
+# ---------------------------
+# Chatbot Metrics API View (per worker process)
+# ---------------------------
+@method_decorator(csrf_exempt, name='dispatch')
+class ChatbotMetricsAPIView(APIView):
+    def get(self, request):
+        return Response({
+            'pid': os.getpid(),
+            'llm_circuit_breaker': LLM_BREAKER.snapshot(),
+            'degraded_answers': DEGRADED_ANSWERS.snapshot(),
+            'knowledge_coalescing': KNOWLEDGE_FLIGHT.counters.snapshot(),
+            'retrieval_timings': retrieval_timings(),
         }, status=status.HTTP_200_OK)
 
 # ---------------------------
 # Chat Sessions and Messages API View with Filters
 # ---------------------------
+def window_messages_count(start_date):
+    """
+    Per-session count of messages since ``start_date``, as a correlated
+    subquery: it runs only for the sessions on the page, through the
+    (session, created_at) index, instead of joining every message first.
+    """
+    counts = (
+        ChatMessage.objects.filter(session=OuterRef('pk'), created_at__gte=start_date)
+        .order_by().values('session').annotate(count=Count('id')).values('count')
+    )
+    return Coalesce(Subquery(counts), 0)
+
+
+def encode_cursor(created_at, pk) -> str:
+    raw = json.dumps([created_at.isoformat(), pk]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor: str):
+    """(created_at, id) of the last session on the previous page; ValueError if malformed."""
+    try:
+        created_at, pk = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        created_at = datetime.fromisoformat(created_at)
+        return created_at, int(pk)
+    except (TypeError, ValueError, binascii.Error, UnicodeError) as e:
+        raise ValueError('invalid cursor') from e
+
+
 @method_decorator(csrf_exempt, name='dispatch')
 class ChatDataAPIView(APIView):
+    default_page_size = 50
+    max_page_size = 200
+    session_fields = ('session_id', 'created_at', 'messages_count', 'messages')
+
     def get_client_ip(self, request):
         x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
         if x_forwarded_for:
@@ -2310,32 +2484,73 @@ class ChatDataAPIView(APIView):
         else:
             return Response({'error': 'Invalid filter type. Use: today, week, month, year'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Filter chat sessions
-        sessions = ChatSession.objects.filter(created_at__gte=start_date).order_by('-created_at')
+        try:
+            page_size = min(int(request.query_params.get('page_size', self.default_page_size)), self.max_page_size)
+            if page_size < 1:
+                raise ValueError
+        except ValueError:
+            return Response({'error': 'page_size must be a positive integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+        fields = request.query_params.get('fields')
+        fields = [f.strip() for f in fields.split(',') if f.strip()] if fields else list(self.session_fields)
+        unknown = [f for f in fields if f not in self.session_fields]
+        if unknown:
+            return Response({'error': f"Unknown fields: {', '.join(unknown)}. Use: {', '.join(self.session_fields)}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Filter chat sessions; messages_count and messages come from one
+        # aggregate and one prefetch query for the whole page
+        window = ChatSession.objects.filter(created_at__gte=start_date)
+        sessions = window.order_by('-created_at', '-id')
+        if 'messages_count' in fields:
+            sessions = sessions.annotate(messages_count=window_messages_count(start_date))
+        if 'messages' in fields:
+            sessions = sessions.prefetch_related(Prefetch(
+                'messages',
+                queryset=ChatMessage.objects.filter(created_at__gte=start_date)
+                .only('id', 'session_id', 'message', 'response', 'intent', 'created_at')
+                .order_by('created_at', 'id'),
+                to_attr='window_messages',
+            ))
+
+        cursor = request.query_params.get('cursor')
+        if cursor:
+            try:
+                created_at, session_pk = decode_cursor(cursor)
+            except ValueError:
+                return Response({'error': 'Invalid cursor'}, status=status.HTTP_400_BAD_REQUEST)
+            # Keyset pagination: strictly after the last row of the previous page
+            sessions = sessions.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=session_pk))
+
+        page = list(sessions[:page_size + 1])
+        has_more = len(page) > page_size
+        page = page[:page_size]
+
         sessions_data = []
-        for session in sessions:
-            # Get messages for this session
-            messages = ChatMessage.objects.filter(session=session, created_at__gte=start_date).order_by('created_at')
-            messages_data = [
-                {
-                    'id': msg.id,
-                    'message': msg.message,
-                    'response': msg.response,
-                    'intent': msg.intent,
-                    'created_at': msg.created_at.isoformat()
-                } for msg in messages
-            ]
-
-            sessions_data.append({
-                'session_id': session.session_id,
-                'created_at': session.created_at.isoformat(),
-                'messages_count': messages.count(),
-                'messages': messages_data
-            })
+        for session in page:
+            item = {}
+            if 'session_id' in fields:
+                item['session_id'] = session.session_id
+            if 'created_at' in fields:
+                item['created_at'] = session.created_at.isoformat()
+            if 'messages_count' in fields:
+                item['messages_count'] = session.messages_count
+            if 'messages' in fields:
+                item['messages'] = [
+                    {
+                        'id': msg.id,
+                        'message': msg.message,
+                        'response': msg.response,
+                        'intent': msg.intent,
+                        'created_at': msg.created_at.isoformat()
+                    } for msg in session.window_messages
+                ]
+            sessions_data.append(item)
 
         return Response({
             'filter': filter_type,
-            'total_sessions': len(sessions_data),
+            'total_sessions': window.count(),
+            'page_size': page_size,
+            'next_cursor': encode_cursor(page[-1].created_at, page[-1].id) if has_more else None,
             'sessions': sessions_data
         }, status=status.HTTP_200_OK)
 
@@ -2523,8 +2738,43 @@ class AlexaChatAPIView(APIView):
         session_obj, created = ChatSession.objects.get_or_create(session_id=session_id)
 
         bot = EnhancedChatbot(session_id=session_id)
+        collected = bot.state.get('collected', {})
+        panel_before = (collected.get('selected_panel') or {}).get('model')
+        purpose_before = collected.get('purpose')
+        saved_before = collected.get('saved')
         response = bot.get_reply(message)
 
+        # Unique session / visitor / interest sketches
+        collected = bot.state.get('collected', {})
+        record_turn(
+            session_id,
+            ip_address=ip_address,
+            panel=(collected.get('selected_panel') or {}).get('model'),
+            purpose=collected.get('purpose'),
+        )
+
+        # Heavy hitters: only what changed this turn, so long sessions don't dominate
+        panel = (collected.get('selected_panel') or {}).get('model')
+        record_trending(
+            panel=panel if panel != panel_before else None,
+            purpose=collected.get('purpose') if collected.get('purpose') != purpose_before else None,
+            compared=bot.last_comparison,
+            unmatched=message if response.pop('unmatched', False) else None,
+        )
+
+        # Live dashboard feed
+        publish_live(
+            new_session=created,
+            intent=response.get('intent'),
+            panel=panel if panel != panel_before else None,
+            saved=bool(collected.get('saved')) and not saved_before,
+        )
+
+        # Product cards for every catalogue product named in the message
+        mentioned_products = find_product_mentions(message)
+        if mentioned_products:
+            response['products'] = mentioned_products
+
         # Save user message only if not empty
         if message:
             ChatMessage.objects.create(
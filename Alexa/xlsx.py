@@ -0,0 +1,88 @@
+"""
+Constant-memory XLSX exports.
+
+Workbooks are created in openpyxl's write-only mode: each appended row is
+serialised to the sheet's temp file straight away, so nothing grows with
+the row count. Column widths are part of the sheet header, which
+write-only mode emits before the first row, so ``SheetWriter`` holds back
+the first ``sample_rows`` rows, sizes the columns from them (plus the
+headers), and then streams everything else. Workbooks are built by the
+'xlsx' writer in exports.py.
+"""
+import openpyxl
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Font
+from openpyxl.utils import get_column_letter
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def new_workbook():
+    return openpyxl.Workbook(write_only=True)
+
+
+class SheetWriter:
+    def __init__(self, workbook, title: str, headers: list, bold_headers: bool = False,
+                 wrap_columns=(), sample_rows: int = 1000, max_width: int = 50):
+        self.ws = workbook.create_sheet(title=title)
+        self.headers = headers
+        self.bold_headers = bold_headers
+        self.wrap_columns = set(wrap_columns)     # 1-based, like openpyxl
+        self.sample_rows = sample_rows
+        self.max_width = max_width
+        self.widths = [len(str(header)) for header in headers]
+        self.pending = []
+        self.rows = 0
+        self._wrap = Alignment(wrap_text=True)
+
+    def _measure(self, row) -> None:
+        for index, value in enumerate(row):
+            if value is None:
+                continue
+            longest = max((len(line) for line in str(value).split('\n')), default=0)
+            if index >= len(self.widths):
+                self.widths.append(longest)
+            elif longest > self.widths[index]:
+                self.widths[index] = longest
+
+    def _cells(self, row) -> list:
+        if not self.wrap_columns:
+            return row
+        cells = []
+        for column, value in enumerate(row, 1):
+            if column in self.wrap_columns:
+                value = WriteOnlyCell(self.ws, value=value)
+                value.alignment = self._wrap
+            cells.append(value)
+        return cells
+
+    def _start(self) -> None:
+        for column, width in enumerate(self.widths, 1):
+            self.ws.column_dimensions[get_column_letter(column)].width = min(width + 2, self.max_width)
+        if self.bold_headers:
+            header_cells = []
+            for header in self.headers:
+                cell = WriteOnlyCell(self.ws, value=header)
+                cell.font = Font(bold=True)
+                cell.alignment = Alignment(horizontal='center')
+                header_cells.append(cell)
+            self.ws.append(header_cells)
+        else:
+            self.ws.append(self.headers)
+        for row in self.pending:
+            self.ws.append(self._cells(row))
+        self.pending = None
+
+    def append(self, row: list) -> None:
+        self.rows += 1
+        if self.pending is None:
+            self.ws.append(self._cells(row))
+            return
+        self._measure(row)
+        self.pending.append(row)
+        if len(self.pending) >= self.sample_rows:
+            self._start()
+
+    def close(self) -> None:
+        if self.pending is not None:
+            self._start()
@@ -133,6 +133,100 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # OpenAI API Key - Load from environment variable
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
+# AI knowledgebase: 'openai', or 'local' for the offline deterministic backend
+CHATBOT_MODEL_BACKEND = os.getenv("CHATBOT_MODEL_BACKEND", "openai")
+CHATBOT_LOCAL_EMBEDDING_DIM = 512
+KB_VECTORS_DIR = os.getenv("KB_VECTORS_DIR", str(BASE_DIR / 'kb_vectors'))
+# Chunks sent to the model after lexical + vector rank fusion
+CHATBOT_RETRIEVAL_K = 3
+# Latency budget (seconds) per knowledgebase turn, retrieval + generation;
+# past it the best retrieved chunk / KnowledgeBase match is returned
+CHATBOT_TURN_BUDGET = 4.0
+CHATBOT_MIN_GENERATION_TIME = 0.5
+# Threads for retrieval calls and, separately, for LLM calls (a slow LLM cannot starve retrieval)
+CHATBOT_MODEL_WORKERS = 16
+CHATBOT_LLM_WORKERS = 4
+# Skip the LLM for COOLDOWN seconds after THRESHOLD consecutive failures/timeouts
+CHATBOT_LLM_BREAKER_THRESHOLD = 3
+CHATBOT_LLM_BREAKER_COOLDOWN = 30
+# Identical concurrent knowledge questions share one pipeline run per process;
+# set a directory to coalesce across worker processes too (file locks)
+CHATBOT_COALESCE_LOCK_DIR = os.getenv("CHATBOT_COALESCE_LOCK_DIR")
+CHATBOT_COALESCE_RESULT_TTL = 5
+
+# Max age (seconds) of the in-memory BM25 search index used when not on Postgres
+SEARCH_INDEX_TTL = 300
+
+# Analytics rollups: rows younger than ANALYTICS_ROLLUP_LAG seconds wait for the
+# next catch-up; each analytics request folds in at most this many batches
+ANALYTICS_ROLLUP_LAG = 5
+ANALYTICS_ROLLUP_MAX_BATCHES = 1
+
+# Closed time-series buckets are cached forever; per-process unless a shared
+# backend (e.g. Redis) is configured here
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    }
+}
+TIMESERIES_CACHE = 'default'
+
+# Seconds between flushes of a worker's in-memory HyperLogLog sketches
+UNIQUES_FLUSH_INTERVAL = 10
+
+# Live heavy hitters (Alexa/trending.py): items kept per top-k summary, and how
+# often each worker writes its summaries to TRENDING_DIR for the others to merge
+TRENDING_CAPACITY = 200
+TRENDING_FLUSH_INTERVAL = 5
+TRENDING_DIR = os.getenv("TRENDING_DIR", str(BASE_DIR / 'trending'))
+
+# Live analytics feed (/api/alexa/analytics/stream/): deltas are coalesced per
+# LIVE_FRAME_SECONDS; every stream gets a full snapshot each LIVE_SNAPSHOT_INTERVAL
+# seconds and is closed after LIVE_MAX_STREAM_SECONDS (EventSource reconnects)
+LIVE_FRAME_SECONDS = 1
+LIVE_SNAPSHOT_INTERVAL = 60
+LIVE_HEARTBEAT_SECONDS = 15
+LIVE_MAX_STREAM_SECONDS = 1800
+# Under WSGI each open stream holds a worker thread, so each process serves at
+# most this many (503 beyond); run myassistant.asgi (e.g. uvicorn) for dashboards
+LIVE_MAX_WSGI_STREAMS = 4
+
+# XLSX exports are built in a temp file that stays in memory up to this size
+EXPORT_SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+# Background exports (/api/alexa/export-jobs/): 'thread' runs them in a pool of
+# EXPORT_JOB_WORKERS threads per web process, 'command' leaves them for
+# `manage.py run_export_jobs`. Finished files are cached in EXPORT_CACHE_DIR by
+# dataset, format, filters and data version (also the ETag of the export views,
+# which serve the same files) and pruned after
+# EXPORT_CACHE_MAX_AGE seconds; a job running longer than EXPORT_JOB_TIMEOUT is dead
+EXPORT_JOB_RUNNER = os.getenv("EXPORT_JOB_RUNNER", "thread")
+EXPORT_JOB_WORKERS = 2
+EXPORT_JOB_TIMEOUT = 3600
+EXPORT_CACHE_DIR = os.getenv("EXPORT_CACHE_DIR", str(BASE_DIR / 'export_cache'))
+EXPORT_CACHE_MAX_AGE = 7 * 86400
+# Web processes also prune the cache and fail dead jobs this often (seconds)
+EXPORT_HOUSEKEEPING_INTERVAL = 3600
+# Delta exports (product_changes, /export-products/?since=) stop this many seconds
+# before now so rows still being committed land in the next pull
+EXPORT_DELTA_LAG = 5
+# Deleted-product tombstones are pruned after this many days; a delta pull
+# with an older ?since= is refused and the client must do a full export
+PRODUCT_TOMBSTONE_RETENTION_DAYS = 90
+
+# Processes validating rows for uploads to /api/alexa/import/ (1 = in the
+# request thread); `manage.py import_catalog --workers` sets its own
+IMPORT_WORKERS = 1
+
+# Chat messages/logs older than this many whole months are moved to gzip JSONL
+# files in CHAT_ARCHIVE_DIR by `manage.py archive_chat_history`
+CHAT_RETENTION_MONTHS = 12
+CHAT_ARCHIVE_DIR = os.getenv("CHAT_ARCHIVE_DIR", str(BASE_DIR / 'chat_archive'))
+
+# Columnar (.npy) snapshot written by `manage.py snapshot_analytics`
+ANALYTICS_SNAPSHOT_DIR = os.getenv("ANALYTICS_SNAPSHOT_DIR", str(BASE_DIR / 'analytics_snapshot'))
+
 # CORS settings
 CORS_ALLOWED_ORIGINS = [
     'http://localhost:5173',